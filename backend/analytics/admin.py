@@ -1,9 +1,20 @@
 
 # Register your models here.
 from django.contrib import admin
-from .models import DimCustomer, DimProduct, DimTime, FactOrder
+from .models import (
+    AggDailyProductSales,
+    AggDailySales,
+    CustomerRfmState,
+    DimCustomer,
+    DimProduct,
+    DimTime,
+    FactOrder,
+)
 
 admin.site.register(DimCustomer)
 admin.site.register(DimProduct)
 admin.site.register(DimTime)
 admin.site.register(FactOrder)
+admin.site.register(AggDailySales)
+admin.site.register(AggDailyProductSales)
+admin.site.register(CustomerRfmState)
@@ -0,0 +1,112 @@
+"""
+Async execution of the analytics queries (analytics.queries) for the ASGI views.
+
+Connections come from one psycopg 3 AsyncConnectionPool per process, opened on the event
+loop of the ASGI server at lifespan startup and closed at shutdown (config.asgi), and
+configured like Django's default database: same database, session time zone and, as
+analytics.queries.query_cursor, server-side parameter binding with the statements
+prepared by each connection (OPTIONS["prepare_threshold"]). Every query holds its own
+pooled connection, so independent queries run concurrently with asyncio.gather.
+"""
+
+import asyncio
+
+from django.conf import settings
+from django.db import connections
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+from analytics.queries import QuerySteps
+from config.postgresql_pool.base import pool_counters
+
+# Django settings OPTIONS that are not libpq connection parameters
+DJANGO_ONLY_OPTIONS = {
+    "isolation_level",
+    "server_side_binding",
+    "assume_role",
+    "cursor_factory",
+    "prepare_threshold",
+    "pool",
+}
+
+_pool: AsyncConnectionPool | None = None
+_pool_loop: asyncio.AbstractEventLoop | None = None
+
+
+async def run_query_async(steps: QuerySteps):
+    """
+    Like analytics.queries.run_query, on a pooled async connection.
+    """
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            statement = next(steps)
+            while True:
+                await cursor.execute(*statement)
+                statement = steps.send(await cursor.fetchall())
+        except StopIteration as done:
+            return done.value
+
+
+async def get_pool() -> AsyncConnectionPool:
+    """
+    The pool of the process, opened on the running event loop if it is not open yet (ASGI
+    servers without lifespan events, tests).
+    """
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            conninfo(),
+            min_size=settings.ANALYTICS_ASYNC_POOL_MIN_SIZE,
+            max_size=settings.ANALYTICS_ASYNC_POOL_MAX_SIZE,
+            kwargs={
+                "autocommit": True,
+                "prepare_threshold": settings.DATABASES["default"]["OPTIONS"].get(
+                    "prepare_threshold"
+                ),
+            },
+            name="analytics",
+            open=False,
+        )
+        _pool_loop = loop
+    elif _pool_loop is not loop:
+        # e.g. async_to_sync under WSGI, which runs every request on a new loop
+        raise RuntimeError("The async pool is open on another event loop; serve over ASGI.")
+    await _pool.open()  # no-op once open
+    return _pool
+
+
+def pool_stats() -> list[dict]:
+    """
+    pool_counters() of the async pool of the process, if it is open.
+    """
+    pool = _pool
+    return [pool_counters(pool)] if pool is not None else []
+
+
+async def close_pool() -> None:
+    global _pool, _pool_loop
+    pool, _pool, _pool_loop = _pool, None, None
+    if pool is not None:
+        await pool.close()
+
+
+def conninfo() -> str:
+    connection = connections["default"]
+    settings_dict = connection.settings_dict
+    params = {
+        "dbname": settings_dict["NAME"],
+        "user": settings_dict["USER"],
+        "password": settings_dict["PASSWORD"],
+        "host": settings_dict["HOST"],
+        "port": settings_dict["PORT"],
+        "options": f"-c TimeZone={connection.timezone_name}",
+        **{
+            key: value
+            for key, value in settings_dict["OPTIONS"].items()
+            if key not in DJANGO_ONLY_OPTIONS
+        },
+    }
+    return make_conninfo(**{key: value for key, value in params.items() if value})
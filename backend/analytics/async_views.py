@@ -0,0 +1,170 @@
+"""
+Async variants of the analytics endpoints, under /api/v1/async/, for ASGI deployments
+(config.asgi, e.g. `uvicorn config.asgi:application`). Under WSGI they answer 404: Django
+would run every request on a new event loop, which cannot share the process pool.
+
+They run the queries of analytics.queries on the async pool of analytics.async_queries
+instead of blocking a worker thread per request, and /api/v1/async/overview/ runs its
+sections concurrently. They share the cache of the synchronous endpoints (same keys and
+envelopes, see analytics.cache.cached_fetch_many_async), so their responses are the same,
+"cache" field included.
+"""
+
+from datetime import date
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
+from django.views import View
+
+from analytics import sections
+from analytics.async_queries import run_query_async
+from analytics.cache import render_json, with_cache_meta
+from analytics.queries import (
+    kpis_query,
+    revenue_trends_query,
+    rfm_segments_query,
+    top_products_query,
+)
+from analytics.views import bundle_body, parse_bool, parse_date
+
+
+def json_response(data: dict, status: int = 200) -> HttpResponse:
+    return HttpResponse(render_json(data), status=status, content_type="application/json")
+
+
+async def cached_response(section: sections.Section, compute) -> HttpResponse:
+    [(body, meta)] = await sections.fetch_async([section], [compute])
+    return HttpResponse(with_cache_meta(body, meta), content_type="application/json")
+
+
+def parse_range(request) -> tuple[date, date]:
+    date_from_default, date_to_default = sections.default_range()
+    date_from = parse_date(request.GET.get("date_from"), date_from_default)
+    date_to = parse_date(request.GET.get("date_to"), date_to_default)
+    if date_from > date_to:
+        raise ValueError("date_from must be <= date_to")
+    return date_from, date_to
+
+
+def parse_limit(request) -> int:
+    try:
+        return int(request.GET.get("limit", "10"))
+    except ValueError as e:
+        raise ValueError("limit must be an integer") from e
+
+
+class AsyncAnalyticsView(View):
+    async def dispatch(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return json_response({"error": "Async endpoints are only served over ASGI."}, 404)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+async def revenue_trends(date_from: date, date_to: date, granularity: str, approx: bool) -> dict:
+    points = await run_query_async(revenue_trends_query(date_from, date_to, granularity, approx))
+    return sections.revenue_trends_payload(date_from, date_to, granularity, approx, points)
+
+
+class AsyncKPIView(AsyncAnalyticsView):
+    """
+    GET /api/v1/async/kpis/ (parameters of /api/v1/kpis/)
+    """
+
+    async def get(self, request):
+        try:
+            date_from, date_to = parse_range(request)
+            approx = parse_bool(request.GET.get("approx"))
+            return await cached_response(
+                sections.kpis(date_from, date_to, approx),
+                lambda: run_query_async(kpis_query(date_from, date_to, approx)),
+            )
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+
+class AsyncRevenueTrendsView(AsyncAnalyticsView):
+    """
+    GET /api/v1/async/revenue/trends/ (parameters of /api/v1/revenue/trends/)
+    """
+
+    async def get(self, request):
+        try:
+            date_from, date_to = parse_range(request)
+            granularity = (request.GET.get("granularity") or "daily").lower()
+            approx = parse_bool(request.GET.get("approx"))
+            return await cached_response(
+                sections.revenue_trends(date_from, date_to, granularity, approx),
+                lambda: revenue_trends(date_from, date_to, granularity, approx),
+            )
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+
+class AsyncCustomerSegmentsView(AsyncAnalyticsView):
+    """
+    GET /api/v1/async/customers/segments/ (parameters of /api/v1/customers/segments/)
+    """
+
+    async def get(self, request):
+        try:
+            date_from, date_to = parse_range(request)
+            return await cached_response(
+                sections.rfm_segments(date_from, date_to),
+                lambda: run_query_async(rfm_segments_query(date_from, date_to)),
+            )
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+
+class AsyncTopProductsView(AsyncAnalyticsView):
+    """
+    GET /api/v1/async/products/top-sellers/ (parameters of /api/v1/products/top-sellers/)
+    """
+
+    async def get(self, request):
+        try:
+            date_from, date_to = parse_range(request)
+            metric = (request.GET.get("metric") or "revenue").lower()
+            limit = parse_limit(request)
+            return await cached_response(
+                sections.top_products(date_from, date_to, metric, limit),
+                lambda: run_query_async(top_products_query(date_from, date_to, metric, limit)),
+            )
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+
+class AsyncOverviewView(AsyncAnalyticsView):
+    """
+    GET /api/v1/async/overview/ (parameters of /api/v1/overview/)
+    The sections missing from the cache are queried concurrently, each on its own pooled
+    connection.
+    """
+
+    async def get(self, request):
+        try:
+            date_from, date_to = parse_range(request)
+            granularity = (request.GET.get("granularity") or "daily").lower()
+            metric = (request.GET.get("metric") or "revenue").lower()
+            approx = parse_bool(request.GET.get("approx"))
+            limit = parse_limit(request)
+            bundle = {
+                "kpis": (
+                    sections.kpis(date_from, date_to, approx),
+                    lambda: run_query_async(kpis_query(date_from, date_to, approx)),
+                ),
+                "revenue_trends": (
+                    sections.revenue_trends(date_from, date_to, granularity, approx),
+                    lambda: revenue_trends(date_from, date_to, granularity, approx),
+                ),
+                "top_products": (
+                    sections.top_products(date_from, date_to, metric, limit),
+                    lambda: run_query_async(top_products_query(date_from, date_to, metric, limit)),
+                ),
+            }
+            results = await sections.fetch_async(*map(list, zip(*bundle.values())))
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+        body = bundle_body(date_from, date_to, dict(zip(bundle, results)))
+        return HttpResponse(body, content_type="application/json")
@@ -0,0 +1,32 @@
+"""
+Exact sets of customers as bitmaps, for distinct counts over date ranges.
+
+Bit k of a bitmap is set when customer_key k is in the set (little-endian bit order), and
+the bitmap is stored zlib-compressed. agg_daily_sales.customers_bitmap holds the bitmap of
+each day's customers: the customers of a range are the bitwise OR of its days, so unique
+customers are counted exactly from the rollup instead of COUNT(DISTINCT) on fact_orders.
+customer_key is a dense serial, so a day of 1,000 customers among 1M keys is a 125 KB
+bitmap that compresses to a few KB.
+"""
+
+import zlib
+
+import numpy as np
+
+
+def to_bytes(keys) -> bytes:
+    keys = np.fromiter(keys, dtype=np.int64)
+    bits = np.zeros(int(keys.max()) + 1 if len(keys) else 0, dtype=bool)
+    bits[keys] = True
+    return zlib.compress(np.packbits(bits, bitorder="little").tobytes())
+
+
+def union_count(blobs) -> int:
+    """
+    The number of keys in the union of the stored bitmaps.
+    """
+    union = 0
+    for blob in blobs:
+        if blob is not None:
+            union |= int.from_bytes(zlib.decompress(bytes(blob)), "little")
+    return union.bit_count()
@@ -0,0 +1,541 @@
+"""
+Cache layer of the analytics views.
+
+Values are stored pre-rendered: the JSON body (zlib-compressed from
+ANALYTICS_CACHE_COMPRESS_MIN_BYTES on) in an envelope {"body", "zlib", "expires_at",
+"delta"}, so a hit is returned as bytes without building and rendering dicts again (see
+with_cache_meta). Envelopes are kept in the cache for ttl plus a stale window:
+
+- fresh entries are served, and refreshed early with probability growing towards expiry
+  (XFetch: refresh when now - delta * beta * ln(rand) >= expires_at, delta being how long
+  the value took to compute),
+- stale entries (past expires_at, inside the stale window) are served while one refresh
+  runs in the background,
+- on a miss a single request computes the value (lock: SET NX in Redis, holding a token
+  the holder compares before deleting it) while the others wait for it instead of running
+  the same query.
+
+Values of a date range are stored under a versioned key: every month has a version number
+that invalidate_dates bumps when a load changes one of its days (analytics.rollups calls it
+once the refresh commits), so only the ranges overlapping changed months are recomputed.
+
+Counters are kept in the cache too, so they add up across workers (see cache_stats). Each
+process batches its counts and adds them every ANALYTICS_CACHE_STATS_FLUSH_SECONDS, in one
+round trip, instead of an INCR per event. An optional per-process L1
+(analytics.local_cache) answers hot keys before the shared cache.
+
+The async views use cached_fetch_many_async: the same entries, read and written from a
+worker thread, with misses computed on the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.utils.encoders import JSONEncoder
+
+from analytics.local_cache import local_cache, publish_invalidation, redis_client
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30  # seconds, upper bound of a computation holding the lock
+LOCK_WAIT = 5  # seconds a request waits for another one's computation
+LOCK_POLL = 0.05
+STATS_PREFIX = "analytics_cache:stats:"
+VERSION_PREFIX = "analytics_cache:version:"
+EPOCH_KEY = VERSION_PREFIX + "epoch"
+# deletes the lock only if it still holds the caller's token: a computation that outlived
+# LOCK_TIMEOUT must not release the lock another request has taken since
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+# bumps the version of each month key, or starts it at ARGV[1] (a new epoch) when missing
+BUMP_VERSIONS_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call("exists", key) == 1 then
+        redis.call("incr", key)
+    else
+        redis.call("set", key, ARGV[1])
+    end
+end
+return 0
+"""
+COUNTERS = (
+    "hits",
+    "stale_hits",
+    "misses",
+    "lock_waits",
+    "early_refreshes",
+    "refreshes",
+    "invalidated_months",
+)
+
+# counts of this process not added to the shared counters yet, see _count
+_pending_counts = Counter()
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="analytics-cache")
+
+
+def cached_fetch(
+    key: str, ttl: int, compute, date_range: tuple[date, date] | None = None
+) -> tuple[bytes, dict]:
+    """
+    Returns (JSON body, cache metadata) for key, calling compute() when it has to. With
+    date_range, the entry is dropped as soon as one of its days is invalidated. The
+    per-process L1 (analytics.local_cache), when enabled, is asked first.
+    """
+    local = local_cache()
+    if local is not None:
+        entry = local.get(key)
+        if entry is not None:
+            body, meta = entry
+            return body, {**meta, "hit": True, "stale": False, "local": True}
+
+    body, meta = _fetch_shared(key, ttl, compute, date_range)
+    if local is not None and not meta["stale"]:
+        local.put(key, (body, meta), len(body))
+    return body, {**meta, "local": False}
+
+
+def cached_fetch_many(requests: list[tuple]) -> list[tuple[bytes, dict] | None]:
+    """
+    The cached answers of several cached_fetch requests (key, ttl, compute, date_range),
+    without computing any: the L1 first, then one get_many for the month versions of all
+    ranges and one for the entries. Hits (stale ones too, refreshed as by cached_fetch)
+    are returned as (JSON body, cache metadata), misses as None for the caller to
+    cached_fetch.
+    """
+    return _lookup_many(requests)[0]
+
+
+async def cached_fetch_many_async(requests: list[tuple], computes: list) -> list[tuple]:
+    """
+    cached_fetch of several requests (key, ttl, compute, date_range) for async views: the
+    lookups of cached_fetch_many run in a worker thread, and the misses are computed
+    concurrently by the coroutine functions in computes, then stored as cached_fetch
+    would (stale hits are refreshed in the background with compute). Returns
+    (JSON body, cache metadata) per request.
+    """
+    results, misses = await sync_to_async(_lookup_many, thread_sensitive=False)(requests)
+    computed = await asyncio.gather(
+        *(_fetch_missing_async(requests[i][0], *misses[i], computes[i]) for i in misses)
+    )
+    for i, result in zip(misses, computed):
+        results[i] = result
+    return results
+
+
+def _lookup_many(requests: list[tuple]) -> tuple[list, dict]:
+    """
+    cached_fetch_many, plus (versioned key, metadata) of the misses by request index.
+    """
+    results = [None] * len(requests)
+    local = local_cache()
+    pending = []
+    for i, (key, *_) in enumerate(requests):
+        entry = local.get(key) if local is not None else None
+        if entry is None:
+            pending.append(i)
+            continue
+        body, meta = entry
+        results[i] = body, {**meta, "hit": True, "stale": False, "local": True}
+    if not pending:
+        return results, {}
+
+    ranges = [requests[i][3] for i in pending if requests[i][3] is not None]
+    versions = iter(range_versions(ranges))
+    shared = {}
+    for i in pending:
+        key, ttl, _, date_range = requests[i]
+        shared[i] = _versioned(key, ttl, next(versions) if date_range is not None else None)
+    envelopes = cache.get_many([versioned_key for versioned_key, _ in shared.values()])
+
+    now = time.time()
+    misses = {}
+    for i, (versioned_key, meta) in shared.items():
+        envelope = _envelope(envelopes.get(versioned_key))
+        if envelope is None:
+            misses[i] = versioned_key, meta
+            continue
+        key, ttl, compute, _ = requests[i]
+        body, meta = _serve(versioned_key, ttl, compute, envelope, meta, now)
+        if local is not None and not meta["stale"]:
+            local.put(key, (body, meta), len(body))
+        results[i] = body, {**meta, "local": False}
+    return results, misses
+
+
+async def _fetch_missing_async(key: str, versioned_key: str, meta: dict, compute_async):
+    """
+    The miss path of _fetch_shared on the event loop: the cache calls run in a worker
+    thread, the computation is awaited.
+    """
+    in_thread = partial(sync_to_async, thread_sensitive=False)
+    ttl = meta["ttl_seconds"]
+    token = await in_thread(_claim)(versioned_key)
+    if token is None:
+        envelope = await _wait_for_async(versioned_key)
+        if envelope is not None:
+            return _body(envelope), {"hit": True, "stale": False, **meta, "local": False}
+        # the other computation is taking too long (or failed): compute without the lock
+
+    try:
+        started = time.time()
+        body = render_json(await compute_async())
+        await in_thread(_put)(versioned_key, ttl, body, started, time.time())
+    finally:
+        if token is not None:
+            await in_thread(_release)(versioned_key, token)
+
+    meta = {"hit": False, "stale": False, **meta}
+    local = local_cache()
+    if local is not None:
+        local.put(key, (body, meta), len(body))
+    return body, {**meta, "local": False}
+
+
+def _fetch_shared(key: str, ttl: int, compute, date_range) -> tuple[bytes, dict]:
+    version = range_version(*date_range) if date_range is not None else None
+    key, meta = _versioned(key, ttl, version)
+
+    envelope = _get(key)
+    if envelope is not None:
+        return _serve(key, ttl, compute, envelope, meta, time.time())
+
+    token = _claim(key)
+    if token is None:
+        envelope = _wait_for(key)
+        if envelope is not None:
+            return _body(envelope), {"hit": True, "stale": False, **meta}
+        # the other computation is taking too long (or failed): compute without the lock
+        return _store(key, ttl, compute), {"hit": False, "stale": False, **meta}
+
+    try:
+        return _store(key, ttl, compute), {"hit": False, "stale": False, **meta}
+    finally:
+        _release(key, token)
+
+
+def _versioned(key: str, ttl: int, version: str | None) -> tuple[str, dict]:
+    """
+    The shared cache key of key at a range version, and the metadata it is served with.
+    """
+    meta = {"key": key, "ttl_seconds": ttl}
+    if version is None:
+        return key, meta
+    meta["version"] = version
+    return f"{key}@{version}", meta
+
+
+def _serve(key: str, ttl: int, compute, envelope: dict, meta: dict, now: float):
+    """
+    A hit: stale entries are refreshed in the background, fresh ones sometimes early.
+    """
+    stale = now >= envelope["expires_at"]
+    if stale:
+        _count("stale_hits")
+        _refresh(key, ttl, compute)
+    else:
+        _count("hits")
+        if _should_refresh_early(envelope, now):
+            _count("early_refreshes")
+            _refresh(key, ttl, compute)
+    return _body(envelope), {"hit": True, "stale": stale, **meta}
+
+
+def range_version(date_from: date, date_to: date) -> str:
+    """
+    Digest of the versions of the months overlapping [date_from, date_to]. Months that were
+    never invalidated share the epoch version.
+    """
+    return range_versions([(date_from, date_to)])[0]
+
+
+def range_versions(ranges: list[tuple[date, date]]) -> list[str]:
+    """
+    range_version of each range, with one get_many for all of them.
+    """
+    if not ranges:
+        return []
+    months = [[VERSION_PREFIX + f"{m:%Y-%m}" for m in _months(*r)] for r in ranges]
+    versions = cache.get_many([EPOCH_KEY, *{key for keys in months for key in keys}])
+    epoch = versions.get(EPOCH_KEY)
+    if epoch is None:
+        # a new (or evicted) epoch never repeats an old one
+        cache.add(EPOCH_KEY, time.time_ns(), timeout=None)
+        epoch = cache.get(EPOCH_KEY)
+    digests = []
+    for keys in months:
+        digest = hashlib.md5(",".join(str(versions.get(key, epoch)) for key in keys).encode())
+        digests.append(digest.hexdigest()[:12])
+    return digests
+
+
+def invalidate_dates(dates) -> None:
+    """
+    Bumps the version of every month containing one of dates.
+    """
+    months = {date(d.year, d.month, 1) for d in dates}
+    keys = [VERSION_PREFIX + f"{month:%Y-%m}" for month in sorted(months)]
+    client = redis_client()
+    if client is not None:
+        if keys:  # one round trip for all the months
+            client.eval(BUMP_VERSIONS_SCRIPT, len(keys), *map(cache.make_key, keys), time.time_ns())
+    else:
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+    if months:
+        _count("invalidated_months", len(months))
+        publish_invalidation()
+
+
+def render_json(value) -> bytes:
+    """
+    Renders value like DRF's JSONRenderer (compact, UTF-8).
+    """
+    return json.dumps(
+        value, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode()
+
+
+def with_cache_meta(body: bytes, meta: dict) -> bytes:
+    """
+    Adds "cache": meta to a rendered JSON object without parsing it.
+    """
+    cache_field = b'"cache":' + render_json(meta)
+    if body == b"{}":
+        return b"{" + cache_field + b"}"
+    return body[:-1] + b"," + cache_field + b"}"
+
+
+def cache_stats() -> dict:
+    """
+    Shared counters (all processes) plus the L1 stats of this process under "local". The
+    counts of this process are flushed first; other processes' may lag by up to
+    ANALYTICS_CACHE_STATS_FLUSH_SECONDS.
+    """
+    flush_cache_stats()
+    values = cache.get_many([STATS_PREFIX + name for name in COUNTERS])
+    stats = {name: int(values.get(STATS_PREFIX + name, 0)) for name in COUNTERS}
+    local = local_cache()
+    stats["local"] = local.stats() if local is not None else None
+    return stats
+
+
+def reset_cache_stats() -> None:
+    with _pending_lock:
+        _pending_counts.clear()
+    cache.delete_many([STATS_PREFIX + name for name in COUNTERS])
+
+
+def flush_cache_stats() -> None:
+    """
+    Adds the counts batched in this process to the shared counters: one pipeline of
+    INCRBY in Redis.
+    """
+    global _last_flush
+    with _pending_lock:
+        counts = {name: delta for name, delta in _pending_counts.items() if delta}
+        _pending_counts.clear()
+        _last_flush = time.monotonic()
+    if not counts:
+        return
+
+    client = redis_client()
+    if client is not None:
+        pipeline = client.pipeline(transaction=False)
+        for name, delta in counts.items():
+            pipeline.incrby(cache.make_key(STATS_PREFIX + name), delta)
+        pipeline.execute()
+        return
+    for name, delta in counts.items():
+        key = STATS_PREFIX + name
+        try:
+            cache.incr(key, delta)
+        except ValueError:  # first count (or evicted)
+            cache.add(key, delta, timeout=None)
+
+
+def _get(key: str) -> dict | None:
+    return _envelope(cache.get(key))
+
+
+def _envelope(value) -> dict | None:
+    # values cached in an older format count as misses
+    if not isinstance(value, dict) or "body" not in value:
+        return None
+    return value
+
+
+def _store(key: str, ttl: int, compute) -> bytes:
+    started = time.time()
+    body = render_json(compute())
+    _put(key, ttl, body, started, time.time())
+    return body
+
+
+def _put(key: str, ttl: int, body: bytes, started: float, finished: float) -> None:
+    compress = len(body) >= settings.ANALYTICS_CACHE_COMPRESS_MIN_BYTES
+    envelope = {
+        "body": zlib.compress(body) if compress else body,
+        "zlib": compress,
+        "expires_at": finished + ttl,
+        "delta": finished - started,
+    }
+    cache.set(key, envelope, timeout=ttl + settings.ANALYTICS_CACHE_STALE_SECONDS)
+
+
+def _body(envelope: dict) -> bytes:
+    return zlib.decompress(envelope["body"]) if envelope["zlib"] else envelope["body"]
+
+
+def _should_refresh_early(envelope: dict, now: float) -> bool:
+    beta = settings.ANALYTICS_CACHE_XFETCH_BETA
+    # 1 - random() lies in (0, 1], so the log is defined (and <= 0)
+    gap = -envelope["delta"] * beta * math.log(1 - random.random())
+    return now + gap >= envelope["expires_at"]
+
+
+def _refresh(key: str, ttl: int, compute) -> None:
+    """
+    Recomputes key unless a refresh is already running; in the background by default.
+    """
+    token = _acquire(key)
+    if token is None:
+        return
+
+    def refresh():
+        try:
+            _store(key, ttl, compute)
+            _count("refreshes")
+        except Exception:
+            logger.exception("Refreshing cache key %s failed", key)
+        finally:
+            _release(key, token)
+
+    if not settings.ANALYTICS_CACHE_BACKGROUND_REFRESH:
+        refresh()
+        return
+
+    def refresh_in_thread():
+        try:
+            refresh()
+        finally:
+            connection.close()
+
+    _refresher.submit(refresh_in_thread)
+
+
+def _wait_for(key: str) -> dict | None:
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        envelope = _get(key)
+        if envelope is not None:
+            return envelope
+        if not _locked(key):
+            break  # the computation failed and released the lock
+    return None
+
+
+async def _wait_for_async(key: str) -> dict | None:
+    in_thread = partial(sync_to_async, thread_sensitive=False)
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL)
+        envelope = await in_thread(_get)(key)
+        if envelope is not None:
+            return envelope
+        if not await in_thread(_locked)(key):
+            break
+    return None
+
+
+def _claim(key: str) -> str | None:
+    """
+    Counts a miss and takes the computation lock of key (None: someone else holds it).
+    """
+    _count("misses")
+    token = _acquire(key)
+    if token is None:
+        _count("lock_waits")
+    return token
+
+
+def _acquire(key: str) -> str | None:
+    """
+    Takes the computation lock of key; returns its token, or None if it is held already.
+    """
+    token = uuid.uuid4().hex
+    client = redis_client()
+    if client is None:
+        acquired = cache.add(_lock_key(key), token, timeout=LOCK_TIMEOUT)
+    else:
+        acquired = client.set(_redis_lock_key(key), token, nx=True, ex=LOCK_TIMEOUT)
+    return token if acquired else None
+
+
+def _release(key: str, token: str) -> None:
+    client = redis_client()
+    if client is None:
+        # not atomic, but caches other than Redis are per process (dev / tests)
+        if cache.get(_lock_key(key)) == token:
+            cache.delete(_lock_key(key))
+        return
+    client.eval(RELEASE_LOCK_SCRIPT, 1, _redis_lock_key(key), token)
+
+
+def _locked(key: str) -> bool:
+    client = redis_client()
+    if client is None:
+        return cache.get(_lock_key(key)) is not None
+    return bool(client.exists(_redis_lock_key(key)))
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def _redis_lock_key(key: str) -> str:
+    # the lock is set with the raw client (plain token, no pickling), under the cache's key
+    return cache.make_key(_lock_key(key))
+
+
+def _count(name: str, delta: int = 1) -> None:
+    with _pending_lock:
+        _pending_counts[name] += delta
+        due = time.monotonic() - _last_flush >= settings.ANALYTICS_CACHE_STATS_FLUSH_SECONDS
+    if due:
+        flush_cache_stats()
+
+
+def _months(date_from: date, date_to: date) -> list[date]:
+    months = []
+    month = date(date_from.year, date_from.month, 1)
+    while month <= date_to:
+        months.append(month)
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return months
@@ -0,0 +1,96 @@
+"""
+The dim_time calendar.
+
+Calendar rows are generated ahead of time for whole date ranges with a single
+INSERT ... SELECT FROM generate_series (analytics.tasks.extend_calendar_task), so loaders
+only have to map dates to time_keys. Dates outside the calendar are added one by one, not
+as the range up to them.
+"""
+
+import os
+from datetime import date
+
+from django.db import connection
+
+from analytics.models import DimTime
+
+CALENDAR_START = os.getenv("DIM_TIME_START", "2015-01-01")
+CALENDAR_YEARS_AHEAD = int(os.getenv("DIM_TIME_YEARS_AHEAD", "2"))
+
+CALENDAR_SQL = """
+    INSERT INTO dim_time (
+        date, year, month, day, week, iso_week, quarter, day_of_week, is_weekend
+    )
+    SELECT
+        d,
+        EXTRACT(YEAR FROM d)::int,
+        EXTRACT(MONTH FROM d)::int,
+        EXTRACT(DAY FROM d)::int,
+        -- Monday-based week number, same as strftime("%%W")
+        (EXTRACT(DOY FROM d)::int + 7 - EXTRACT(ISODOW FROM d)::int) / 7,
+        EXTRACT(WEEK FROM d)::int,
+        EXTRACT(QUARTER FROM d)::int,
+        EXTRACT(ISODOW FROM d)::int,
+        EXTRACT(ISODOW FROM d) >= 6
+    FROM ({days}) AS calendar(d)
+    ORDER BY d
+    ON CONFLICT (date) DO NOTHING
+"""
+DAY_RANGE_SQL = "SELECT generate_series(%s::date, %s::date, INTERVAL '1 day')::date"
+DAY_LIST_SQL = "SELECT DISTINCT unnest(%s::date[])"
+
+
+def default_calendar_range() -> tuple[date, date]:
+    """
+    DIM_TIME_START until the end of the year DIM_TIME_YEARS_AHEAD years from now.
+    """
+    end = date(date.today().year + CALENDAR_YEARS_AHEAD, 12, 31)
+    return date.fromisoformat(CALENDAR_START), end
+
+
+def generate_calendar(start: date, end: date) -> int:
+    """
+    Inserts every missing day between start and end (inclusive); returns how many.
+    """
+    if start > end:
+        raise ValueError("start must be <= end")
+    with connection.cursor() as cursor:
+        cursor.execute(CALENDAR_SQL.format(days=DAY_RANGE_SQL), [start, end])
+        return cursor.rowcount
+
+
+def add_calendar_days(dates) -> int:
+    """
+    Inserts the given days that are missing, and only those; returns how many.
+    """
+    dates = list(dates)
+    if not dates:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(CALENDAR_SQL.format(days=DAY_LIST_SQL), [dates])
+        return cursor.rowcount
+
+
+def calendar_keys(start: date | None = None, end: date | None = None) -> dict[date, int]:
+    qs = DimTime.objects.all()
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    return dict(qs.values_list("date", "time_key"))
+
+
+def time_keys_for(dates) -> dict[date, int]:
+    """
+    date -> time_key for dates, adding the missing ones (e.g. dates outside the pre-generated
+    range) to the calendar first.
+    """
+    dates = set(dates)
+    if not dates:
+        return {}
+    keys = dict(DimTime.objects.filter(date__in=dates).values_list("date", "time_key"))
+    missing = dates - keys.keys()
+    if missing:
+        add_calendar_days(missing)
+        keys.update(DimTime.objects.filter(date__in=missing).values_list("date", "time_key"))
+    return keys
@@ -0,0 +1,276 @@
+"""
+Streaming export of fact_orders joined to its dimensions (/api/v1/orders/export/).
+
+Rows are read through a server-side cursor FETCH_ROWS at a time, in the order of
+fact_orders_created_key_idx (no sort), and each batch is encoded, optionally compressed
+and handed to the StreamingHttpResponse before the next one is fetched: memory stays
+constant however many rows are exported. Parquet files get one row group per batch and
+use the compression as their column codec.
+
+Under ASGI the chunks are handed over through AsyncChunks: Django 4.2 reads a synchronous
+streaming iterator into a list before sending any of it there.
+"""
+
+import csv
+import io
+import uuid
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+
+from analytics.cache import render_json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+try:
+    import zstandard
+except ImportError:  # so is zstd compression of CSV / NDJSON
+    zstandard = None
+
+FETCH_ROWS = 10_000
+
+# file_format -> (content type, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+COMPRESSIONS = {"gzip": ("application/gzip", "gz"), "zstd": ("application/zstd", "zst")}
+
+COLUMNS = (
+    "order_id",
+    "created_at",
+    "order_amount",
+    "quantity",
+    "discount_amount",
+    "customer_id",
+    "customer_country",
+    "customer_city",
+    "product_id",
+    "product_name",
+    "product_category",
+)
+DECIMAL_COLUMNS = (COLUMNS.index("order_amount"), COLUMNS.index("discount_amount"))
+CREATED_AT = COLUMNS.index("created_at")
+
+EXPORT_SQL = """
+    SELECT f.order_id, f.created_at, f.order_amount, f.quantity, f.discount_amount,
+           c.customer_id, c.country, c.city,
+           p.product_id, p.name, p.category
+    FROM fact_orders f
+    JOIN dim_customers c ON c.customer_key = f.customer_key
+    JOIN dim_products p ON p.product_key = f.product_key
+    WHERE f.created_at >= %(start)s AND f.created_at < %(end)s
+      AND (%(customer_id)s::text IS NULL OR c.customer_id = %(customer_id)s)
+    ORDER BY f.created_at, f.order_key
+"""
+
+
+def export_orders(
+    start: datetime,
+    end: datetime,
+    file_format: str,
+    compression: str | None = None,
+    customer_id: str | None = None,
+) -> Iterator[bytes]:
+    """
+    The export of orders created in [start, end) as an iterator of byte chunks. Arguments
+    are checked here, before anything is streamed (ValueError / ImportError).
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"file_format must be one of: {', '.join(FORMATS)}")
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of: {', '.join(COMPRESSIONS)}")
+    if file_format == "parquet" and pa is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+    if compression == "zstd" and file_format != "parquet" and zstandard is None:
+        raise ImportError("zstd compression requires zstandard (pip install zstandard)")
+
+    batches = _fetch_batches({"start": start, "end": end, "customer_id": customer_id})
+    if file_format == "parquet":
+        return _parquet_chunks(batches, compression)
+
+    chunks = _csv_chunks(batches) if file_format == "csv" else _ndjson_chunks(batches)
+    if compression == "gzip":
+        return _gzip_chunks(chunks)
+    if compression == "zstd":
+        return _zstd_chunks(chunks)
+    return chunks
+
+
+def export_content_type(file_format: str, compression: str | None) -> str:
+    if compression is not None and file_format != "parquet":
+        return COMPRESSIONS[compression][0]
+    return FORMATS[file_format][0]
+
+
+def export_filename(name: str, file_format: str, compression: str | None) -> str:
+    filename = f"{name}.{FORMATS[file_format][1]}"
+    if compression is not None and file_format != "parquet":
+        filename += "." + COMPRESSIONS[compression][1]
+    return filename
+
+
+class AsyncChunks:
+    """
+    The chunks of export_orders as an async iterator, for StreamingHttpResponse under ASGI.
+    Each chunk is produced by a thread-sensitive sync_to_async call, i.e. in the request's
+    thread, so the transaction and named cursor of _fetch_batches stay on its connection.
+    The response registers close(), which Django's ASGI handler runs in that thread too.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+
+    async def __aiter__(self):
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        while (chunk := await next_chunk(self._chunks, None)) is not None:
+            yield chunk
+
+    def close(self) -> None:
+        self._chunks.close()
+
+
+def _fetch_batches(params: dict) -> Iterator[list[tuple]]:
+    # A named (server-side) cursor of its own: chunked_cursor() would fall back to a client
+    # cursor, which reads the whole result, under DISABLE_SERVER_SIDE_CURSORS
+    # (settings.DB_PGBOUNCER). Inside a transaction the cursor is not declared WITH HOLD,
+    # so rows are produced lazily, and a pgbouncer in transaction mode keeps the server
+    # connection until it commits.
+    with transaction.atomic():
+        connection.ensure_connection()
+        raw_cursor = connection.create_cursor(name=f"orders_export_{uuid.uuid4().hex}")
+        if connection.queries_logged:
+            cursor = connection.make_debug_cursor(raw_cursor)
+        else:
+            cursor = connection.make_cursor(raw_cursor)
+        with cursor:
+            cursor.execute(EXPORT_SQL, params)
+            while rows := cursor.fetchmany(FETCH_ROWS):
+                yield rows
+
+
+def _text_row(row: tuple) -> list:
+    """
+    Values as the orders API writes them: decimals as strings, UTC datetimes ending in Z.
+    """
+    values = list(row)
+    for i in DECIMAL_COLUMNS:
+        values[i] = f"{values[i]:f}"
+    created_at = values[CREATED_AT].isoformat()
+    if created_at.endswith("+00:00"):
+        created_at = created_at[:-6] + "Z"
+    values[CREATED_AT] = created_at
+    return values
+
+
+def _csv_chunks(batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        writer.writerows(_text_row(row) for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # header only: no orders
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    for rows in batches:
+        yield b"".join(render_json(dict(zip(COLUMNS, _text_row(row)))) + b"\n" for row in rows)
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+def _zstd_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zstandard.ZstdCompressor().compressobj()
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+class _ParquetSink:
+    """
+    Write-only file for ParquetWriter that hands out what was written since the last drain.
+    tell() keeps counting, as the file offsets in the Parquet footer are taken from it.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pa.schema(
+        [
+            ("order_id", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("order_amount", pa.decimal128(10, 2)),
+            ("quantity", pa.int32()),
+            ("discount_amount", pa.decimal128(10, 2)),
+            ("customer_id", pa.string()),
+            ("customer_country", pa.string()),
+            ("customer_city", pa.string()),
+            ("product_id", pa.string()),
+            ("product_name", pa.string()),
+            ("product_category", pa.string()),
+        ]
+    )
+
+
+def _parquet_chunks(batches: Iterable[list[tuple]], compression: str | None) -> Iterator[bytes]:
+    schema = _parquet_schema()
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression or "snappy")
+    try:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_batch(
+                pa.record_batch(
+                    [pa.array(values, field.type) for values, field in zip(columns, schema)],
+                    schema=schema,
+                )
+            )
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,78 @@
+"""
+HyperLogLog sketches for approximate distinct counts (unique customers).
+
+Precision P = 14 gives M = 16384 one-byte registers and a relative standard error of
+1.04 / sqrt(M) ~= 0.81%: about 68% of estimates are within 0.81% of the true count, 95%
+within 1.6% and 99.7% within 2.4%. Small cardinalities use linear counting and are
+practically exact.
+
+Sketches are mergeable (register-wise max), so daily sketches stored in agg_daily_sales
+combine into the sketch of any date range. Values are hashed with the first 64 bits of
+MD5(str(value)), the same hash analytics.rollups computes in SQL.
+"""
+
+import hashlib
+import math
+import zlib
+
+import numpy as np
+
+P = 14
+M = 1 << P
+RANK_BITS = 64 - P
+STANDARD_ERROR = 1.04 / math.sqrt(M)
+ALPHA = 0.7213 / (1 + 1.079 / M)
+
+
+def hash64(value) -> int:
+    return int(hashlib.md5(str(value).encode()).hexdigest()[:16], 16)
+
+
+class HyperLogLog:
+    def __init__(self, registers: np.ndarray | None = None):
+        self.registers = np.zeros(M, dtype=np.uint8) if registers is None else registers
+
+    def add(self, value) -> None:
+        h = hash64(value)
+        index = h >> RANK_BITS
+        rank = RANK_BITS - (h & ((1 << RANK_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        estimate = ALPHA * M * M / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * M and zeros:
+            estimate = M * math.log(M / zeros)  # linear counting
+        return int(round(estimate))
+
+    @classmethod
+    def from_registers(cls, pairs) -> "HyperLogLog":
+        """
+        Builds a sketch from (register index, rank) pairs, as produced by SQL.
+        """
+        sketch = cls()
+        for index, rank in pairs:
+            if rank > sketch.registers[index]:
+                sketch.registers[index] = rank
+        return sketch
+
+    def to_bytes(self) -> bytes:
+        # mostly-empty daily sketches compress to a few hundred bytes
+        return zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(np.frombuffer(zlib.decompress(data), dtype=np.uint8).copy())
+
+
+def merge_all(blobs) -> HyperLogLog:
+    merged = HyperLogLog()
+    for blob in blobs:
+        if blob is not None:
+            merged.merge(HyperLogLog.from_bytes(bytes(blob)))
+    return merged
@@ -0,0 +1,149 @@
+"""
+Per-process L1 cache in front of the shared (Redis) cache of analytics.cache.
+
+Hot keys (the default dashboard ranges) are answered from process memory without a network
+hop. Entries live at most ANALYTICS_L1_TTL_SECONDS and the cache is an LRU bounded to
+ANALYTICS_L1_MAX_BYTES of cached bodies. When a load invalidates cached months,
+analytics.cache publishes on INVALIDATION_CHANNEL and every process clears its L1; the
+short TTL bounds staleness if a message is missed.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "analytics_cache:invalidate"
+ENTRY_OVERHEAD = 200  # bytes per entry besides the body (key, tuple, meta dict)
+
+
+class LocalCache:
+    """
+    Thread-safe LRU of key -> value with a TTL per entry and a bound on the summed sizes.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be >= 1")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key, value, size: int) -> None:
+        size += ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+
+_local = None
+_local_lock = threading.Lock()
+
+
+def local_cache() -> LocalCache | None:
+    """
+    The process-wide L1 cache, or None when ANALYTICS_L1_TTL_SECONDS is 0 (disabled).
+    The invalidation listener is started with it.
+    """
+    global _local
+    if settings.ANALYTICS_L1_TTL_SECONDS <= 0:
+        return None
+    if _local is None:
+        with _local_lock:
+            if _local is None:
+                _local = LocalCache(
+                    settings.ANALYTICS_L1_MAX_BYTES, settings.ANALYTICS_L1_TTL_SECONDS
+                )
+                _start_listener(_local)
+    return _local
+
+
+def publish_invalidation() -> None:
+    """
+    Clears the L1 of this process and tells the other processes to clear theirs.
+    """
+    if _local is not None:
+        _local.clear()
+    client = redis_client()
+    if client is not None:
+        client.publish(INVALIDATION_CHANNEL, b"1")
+
+
+def redis_client():
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except (ImportError, NotImplementedError):
+        return None  # the default cache is not Redis: single process (dev / tests)
+
+
+def _start_listener(local: LocalCache) -> None:
+    client = redis_client()
+    if client is None:
+        return
+
+    def listen():
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                local.clear()  # messages may have been missed while (re)connecting
+                for _ in pubsub.listen():
+                    local.clear()
+            except Exception:
+                logger.exception("L1 invalidation listener lost its connection")
+                time.sleep(1)
+
+    threading.Thread(target=listen, name="analytics-l1-invalidation", daemon=True).start()
@@ -0,0 +1,88 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from analytics.cache import cached_fetch, with_cache_meta
+
+
+def sample_payload(points: int, products: int) -> dict:
+    start = date(2025, 1, 1)
+    return {
+        "granularity": "daily",
+        "date_from": str(start),
+        "date_to": str(start + timedelta(days=points - 1)),
+        "points": [
+            {
+                "bucket": str(start + timedelta(days=i)),
+                "revenue": round(1234.56 + i * 7.31, 2),
+                "orders": 40 + i % 17,
+                "unique_customers": 30 + i % 13,
+            }
+            for i in range(points)
+        ],
+        "items": [
+            {
+                "product_id": f"PROD-{i:05d}",
+                "name": f"Product {i}",
+                "category": "Electronics",
+                "revenue": round(999.99 - i, 2),
+                "quantity": 100 - i % 50,
+            }
+            for i in range(products)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare cache hit latency of the old layout (pickled dict, rendered by DRF on every "
+        "hit) with pre-rendered (compressed) JSON bodies, against the configured cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=365, help="Trend points in payload")
+        parser.add_argument("--products", type=int, default=100, help="Products in payload")
+        parser.add_argument("--iterations", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        payload = sample_payload(options["points"], options["products"])
+        iterations = options["iterations"]
+        meta = {"hit": True, "stale": False, "key": "bench", "ttl_seconds": 300}
+        renderer = JSONRenderer()
+
+        dict_key, body_key = "benchmark:cache_hits:dict", "benchmark:cache_hits:body"
+        cache.set(dict_key, payload, timeout=600)
+        cached_fetch(body_key, 300, lambda: payload)  # miss: stores the rendered body
+
+        def dict_hit() -> bytes:
+            data = cache.get(dict_key)
+            data["cache"] = meta
+            return renderer.render(data)
+
+        def body_hit() -> bytes:
+            body, cache_meta = cached_fetch(body_key, 300, lambda: payload)
+            return with_cache_meta(body, cache_meta)
+
+        try:
+            for name, hit in (("pickled dict + DRF render", dict_hit), ("rendered body", body_hit)):
+                timings = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    hit()
+                    timings.append((time.perf_counter() - started) * 1e6)
+                timings.sort()
+                self.stdout.write(
+                    f"{name:<28} mean={statistics.fmean(timings):8.1f}us "
+                    f"p50={timings[len(timings) // 2]:8.1f}us "
+                    f"p95={timings[int(len(timings) * 0.95)]:8.1f}us"
+                )
+            self.stdout.write(
+                f"response size: {len(dict_hit())} bytes, stored body: "
+                f"{len(cache.get(body_key)['body'])} bytes"
+            )
+        finally:
+            cache.delete_many([dict_key, body_key])
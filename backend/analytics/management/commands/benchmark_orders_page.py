@@ -0,0 +1,62 @@
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from analytics.models import FactOrder
+from analytics.serializers import FactOrderSerializer, order_list_rows, serialize_order_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare one page of /api/v1/orders/ built from model instances (select_related + "
+        "FactOrderSerializer) with the column-projected rows of the view: latency (query, "
+        "serialization and JSON rendering) and peak memory allocated per page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=25)
+        parser.add_argument("--offset", type=int, default=0, help="Orders skipped (page depth)")
+        parser.add_argument("--iterations", type=int, default=500)
+
+    def handle(self, *args, **options):
+        page_size, offset = options["page_size"], options["offset"]
+        if FactOrder.objects.count() < offset + page_size:
+            raise CommandError("Not enough orders for one page; run `manage.py seed` first.")
+
+        orders = FactOrder.objects.order_by("-created_at", "-order_key")
+        page = slice(offset, offset + page_size)
+        renderer = JSONRenderer()
+
+        def model_page() -> bytes:
+            qs = orders.select_related("customer", "product", "time")[page]
+            return renderer.render(FactOrderSerializer(qs, many=True).data)
+
+        def lean_page() -> bytes:
+            return renderer.render(serialize_order_rows(order_list_rows(orders)[page]))
+
+        if model_page() != lean_page():
+            raise CommandError("The two paths render different pages.")
+
+        paths = (("select_related + serializer", model_page), ("values rows", lean_page))
+        for name, build in paths:
+            timings = []
+            for _ in range(options["iterations"]):
+                started = time.perf_counter()
+                build()
+                timings.append((time.perf_counter() - started) * 1e3)
+            timings.sort()
+
+            tracemalloc.start()
+            build()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f"{name:<28} mean={statistics.fmean(timings):7.2f}ms "
+                f"p50={timings[len(timings) // 2]:7.2f}ms "
+                f"p95={timings[int(len(timings) * 0.95)]:7.2f}ms "
+                f"peak alloc={peak / 1024:8.1f}KiB"
+            )
@@ -0,0 +1,111 @@
+import http.client
+import random
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a running server with concurrent keep-alive clients and report requests/sec "
+        "and latency, e.g. gunicorn (WSGI, /api/v1/overview/) against uvicorn (ASGI, "
+        "/api/v1/async/overview/) with one process each. Every request asks for a random "
+        "date range, so the cached endpoints query too. With --asgi, the async variant of "
+        "the endpoint on an ASGI server is loaded the same way afterwards, for comparison."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="e.g. http://127.0.0.1:8000/api/v1/async/overview/")
+        parser.add_argument(
+            "--asgi",
+            metavar="HOST:PORT",
+            help="Also load /api/v1/async/<endpoint>/ of url on this ASGI server",
+        )
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+        parser.add_argument(
+            "--days", type=int, default=365, help="Random ranges fall in the last N days"
+        )
+        parser.add_argument("--timeout", type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http":
+            raise CommandError("Only http:// URLs are supported.")
+        targets = [url]
+        if options["asgi"]:
+            if not url.path.startswith("/api/v1/") or url.path.startswith("/api/v1/async/"):
+                raise CommandError("--asgi needs the url of a synchronous /api/v1/ endpoint.")
+            path = url.path.replace("/api/v1/", "/api/v1/async/", 1)
+            targets.append(url._replace(netloc=options["asgi"], path=path))
+
+        rates = []
+        for target in targets:
+            latencies, errors, elapsed = load(target, options)
+            if not latencies:
+                raise CommandError(f"No successful requests ({len(errors)} errors: {errors[:5]})")
+            latencies.sort()
+            rates.append(len(latencies) / elapsed)
+            self.stdout.write(
+                f"{target.netloc}{target.path}  {rates[-1]:8.1f} req/s  "
+                f"mean={statistics.fmean(latencies):7.1f}ms "
+                f"p50={latencies[len(latencies) // 2]:7.1f}ms "
+                f"p95={latencies[int(len(latencies) * 0.95)]:7.1f}ms  "
+                f"requests={len(latencies)} errors={len(errors)}"
+            )
+        if len(rates) == 2:
+            self.stdout.write(f"ASGI/WSGI requests/sec: {rates[1] / rates[0]:.2f}x")
+
+
+def load(url, options) -> tuple[list[float], list, float]:
+    """
+    Run options["concurrency"] keep-alive clients against url for options["duration"]
+    seconds: the latencies (ms) of the successful requests, the errors and the time taken.
+    """
+    query = dict(parse_qsl(url.query))
+    deadline = time.monotonic() + options["duration"]
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection(url.netloc, timeout=options["timeout"])
+        own_latencies, own_errors = [], []
+        while time.monotonic() < deadline:
+            params = {**query, **random_range(options["days"])}
+            path = f"{url.path}?{urlencode(params)}"
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    own_errors.append(response.status)
+                    continue
+            except (OSError, http.client.HTTPException) as e:
+                own_errors.append(type(e).__name__)
+                conn.close()
+                continue
+            own_latencies.append((time.perf_counter() - started) * 1e3)
+        conn.close()
+        with lock:
+            latencies.extend(own_latencies)
+            errors.extend(own_errors)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client) for _ in range(options["concurrency"])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - started
+
+
+def random_range(days: int) -> dict:
+    today = date.today()
+    date_from = today - timedelta(days=random.randrange(days))
+    date_to = date_from + timedelta(days=random.randrange((today - date_from).days + 1))
+    return {"date_from": str(date_from), "date_to": str(date_to)}
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from analytics.dim_time import default_calendar_range, generate_calendar
+
+
+class Command(BaseCommand):
+    help = "Generate the dim_time calendar for a date range (one INSERT ... generate_series)."
+
+    def add_arguments(self, parser):
+        default_start, default_end = default_calendar_range()
+        parser.add_argument("--start", type=date.fromisoformat, default=default_start)
+        parser.add_argument("--end", type=date.fromisoformat, default=default_end)
+
+    def handle(self, *args, **options):
+        created = generate_calendar(options["start"], options["end"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Calendar {options['start']}..{options['end']} ready. Created {created} days."
+            )
+        )
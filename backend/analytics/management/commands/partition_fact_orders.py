@@ -0,0 +1,62 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.partitions import (
+    convert_to_partitioned,
+    detach_partitions,
+    ensure_partitions,
+    install_triggers,
+    is_partitioned,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain monthly partitions of fact_orders: convert the table once, create future "
+        "partitions ahead of time and detach (archive or drop) old ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Rebuild fact_orders as a partitioned table if it is not one yet",
+        )
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Months after the current one that must have a partition",
+        )
+        parser.add_argument(
+            "--detach-before",
+            type=date.fromisoformat,
+            default=None,
+            help="Detach monthly partitions that end on or before this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop detached partitions instead of moving them to the archive schema",
+        )
+
+    def handle(self, *args, **options):
+        if options["ahead"] < 0:
+            raise CommandError("--ahead must be >= 0")
+
+        if not is_partitioned():
+            if not options["convert"]:
+                raise CommandError("fact_orders is not partitioned yet, run with --convert")
+            convert_to_partitioned(options["ahead"])
+            self.stdout.write(self.style.SUCCESS("✅ fact_orders converted to monthly partitions."))
+        else:
+            install_triggers()  # tables converted by older versions get the current triggers
+
+        created = ensure_partitions(options["ahead"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Partitions created: {created or 'none'}"))
+
+        if options["detach_before"]:
+            detached = detach_partitions(options["detach_before"], drop=options["drop"])
+            action = "Dropped" if options["drop"] else "Archived"
+            self.stdout.write(self.style.SUCCESS(f"✅ {action}: {detached or 'none'}"))
@@ -7,7 +7,9 @@ from django.db import transaction
 from django.utils import timezone
 from faker import Faker
 
-from analytics.models import DimCustomer, DimProduct, DimTime, FactOrder
+from analytics.dim_time import calendar_keys, generate_calendar
+from analytics.models import DimCustomer, DimProduct, FactOrder
+from analytics.rollups import refresh_daily_rollups, rollup_dates
 
 
 class Command(BaseCommand):
@@ -30,19 +32,10 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.WARNING("Seeding started..."))
 
-        # 1) DimTime: create last N days (idempotent via get_or_create)
+        # 1) DimTime: make sure the last N days are in the calendar (idempotent, one statement)
         start = date.today() - timedelta(days=n_days)
-        for i in range(n_days + 1):
-            d = start + timedelta(days=i)
-            DimTime.objects.get_or_create(
-                date=d,
-                defaults={
-                    "year": d.year,
-                    "month": d.month,
-                    "day": d.day,
-                    "week": int(d.strftime("%W")),
-                },
-            )
+        generate_calendar(start, date.today())
+        time_keys = calendar_keys(start, date.today())
 
         # 2) Customers (idempotent by customer_id unique)
         customers = []
@@ -76,7 +69,7 @@ class Command(BaseCommand):
 
         # 4) Orders (idempotent by order_id unique)
         # Create orders across the last N days.
-        all_dates = list(DimTime.objects.order_by("date").values_list("date", flat=True))
+        all_dates = sorted(time_keys)
         created_count = 0
 
         for i in range(n_orders):
@@ -96,8 +89,6 @@ class Command(BaseCommand):
                 )
             )
 
-            time_dim = DimTime.objects.get(date=d)
-
             qty = random.randint(1, 5)
             base_price = prod.price or Decimal("10.00")
             discount = Decimal(str(round(random.uniform(0, 0.25), 2)))  # up to 25%
@@ -109,7 +100,7 @@ class Command(BaseCommand):
                 order_id=order_id,
                 customer=cust,
                 product=prod,
-                time=time_dim,
+                time_id=time_keys[d],
                 order_amount=net,
                 quantity=qty,
                 discount_amount=discount_amount,
@@ -117,4 +108,7 @@ class Command(BaseCommand):
             )
             created_count += 1
 
+        # 5) Daily rollups of the seeded days
+        refresh_daily_rollups(rollup_dates(start, date.today()))
+
         self.stdout.write(self.style.SUCCESS(f"✅ Seed complete. Created {created_count} new orders."))
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:12
+
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+    UPDATE dim_time SET
+        iso_week = EXTRACT(WEEK FROM date)::int,
+        quarter = EXTRACT(QUARTER FROM date)::int,
+        day_of_week = EXTRACT(ISODOW FROM date)::int,
+        is_weekend = EXTRACT(ISODOW FROM date) >= 6;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dimtime",
+            name="iso_week",
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="dimtime",
+            name="quarter",
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="dimtime",
+            name="day_of_week",
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="dimtime",
+            name="is_weekend",
+            field=models.BooleanField(default=False),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BACKFILL_SQL = """
+    INSERT INTO agg_daily_sales (date, revenue, orders, quantity, unique_customers, refreshed_at)
+    SELECT
+        created_at::date, SUM(order_amount), COUNT(*), SUM(quantity),
+        COUNT(DISTINCT customer_key), NOW()
+    FROM fact_orders
+    GROUP BY 1;
+
+    INSERT INTO agg_daily_product_sales (
+        date, product_key, revenue, orders, quantity, refreshed_at
+    )
+    SELECT created_at::date, product_key, SUM(order_amount), COUNT(*), SUM(quantity), NOW()
+    FROM fact_orders
+    GROUP BY 1, 2;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0002_dimtime_calendar_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AggDailySales",
+            fields=[
+                ("date", models.DateField(primary_key=True, serialize=False)),
+                ("revenue", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("orders", models.IntegerField()),
+                ("quantity", models.BigIntegerField()),
+                ("unique_customers", models.IntegerField()),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "agg_daily_sales",
+            },
+        ),
+        migrations.CreateModel(
+            name="AggDailyProductSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("revenue", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("orders", models.IntegerField()),
+                ("quantity", models.BigIntegerField()),
+                ("refreshed_at", models.DateTimeField()),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_column="product_key",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="analytics.dimproduct",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "agg_daily_product_sales",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="aggdailyproductsales",
+            constraint=models.UniqueConstraint(
+                fields=("date", "product"), name="agg_daily_product_sales_uniq"
+            ),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0003_daily_rollups"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="factorder",
+            name="fact_orders_created_2a4b26_idx",
+        ),
+        migrations.AddIndex(
+            model_name="factorder",
+            index=models.Index(
+                fields=["created_at"],
+                include=("order_amount", "customer", "product", "quantity"),
+                name="fact_orders_created_cov_idx",
+            ),
+        ),
+    ]
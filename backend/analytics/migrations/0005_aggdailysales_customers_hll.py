@@ -0,0 +1,60 @@
+import zlib
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Frozen copies, as of this migration, of analytics.rollups.DAILY_CUSTOMER_REGISTERS_SQL
+# and the analytics.hll sketch format: 2**P one-byte registers, zlib-compressed.
+P = 14
+
+DAILY_CUSTOMER_REGISTERS_SQL = """
+    SELECT day, substring(h FROM 1 FOR %(p)s)::int AS register,
+           MAX(COALESCE(NULLIF(position(B'1' IN substring(h FROM %(p)s + 1)), 0), 65 - %(p)s))
+    FROM (
+        SELECT DISTINCT created_at::date AS day,
+               ('x' || substr(md5(customer_key::text), 1, 16))::bit(64) AS h
+        FROM fact_orders
+        WHERE created_at >= %(start)s::date
+          AND created_at < %(end)s::date
+          AND created_at::date = ANY(%(dates)s)
+    ) hashed
+    GROUP BY 1, 2;
+"""
+
+
+def backfill_sketches(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT MIN(date), MAX(date), ARRAY_AGG(date) FROM agg_daily_sales;")
+        start, end, dates = cursor.fetchone()
+        if not dates:
+            return
+
+        cursor.execute(
+            DAILY_CUSTOMER_REGISTERS_SQL,
+            {"dates": dates, "start": start, "end": end + timedelta(days=1), "p": P},
+        )
+        sketches = {}
+        for day, register, rank in cursor.fetchall():
+            registers = sketches.setdefault(day, bytearray(1 << P))
+            registers[register] = max(registers[register], rank)
+
+        cursor.executemany(
+            "UPDATE agg_daily_sales SET customers_hll = %s WHERE date = %s;",
+            [(zlib.compress(bytes(registers)), day) for day, registers in sketches.items()],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0004_fact_orders_covering_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aggdailysales",
+            name="customers_hll",
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(backfill_sketches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+BACKFILL_SQL = """
+    INSERT INTO customer_rfm_state (
+        customer_key, first_order_date, last_order_date, frequency, monetary, refreshed_at
+    )
+    SELECT
+        customer_key, MIN(created_at)::date, MAX(created_at)::date, COUNT(*),
+        SUM(order_amount), NOW()
+    FROM fact_orders
+    GROUP BY customer_key;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0005_aggdailysales_customers_hll"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerRfmState",
+            fields=[
+                (
+                    "customer",
+                    models.OneToOneField(
+                        db_column="customer_key",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="analytics.dimcustomer",
+                    ),
+                ),
+                ("first_order_date", models.DateField()),
+                ("last_order_date", models.DateField()),
+                ("frequency", models.IntegerField()),
+                ("monetary", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "customer_rfm_state",
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
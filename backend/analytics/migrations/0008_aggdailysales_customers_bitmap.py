@@ -0,0 +1,56 @@
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from django.db import migrations, models
+
+# Frozen copies, as of this migration, of analytics.rollups.DAILY_CUSTOMER_KEYS_SQL and the
+# analytics.bitmaps format: bit k set for customer_key k, little-endian, zlib-compressed.
+DAILY_CUSTOMER_KEYS_SQL = """
+    SELECT created_at::date, ARRAY_AGG(DISTINCT customer_key)
+    FROM fact_orders
+    WHERE created_at >= %(start)s::date
+      AND created_at < %(end)s::date
+      AND created_at::date = ANY(%(dates)s)
+    GROUP BY 1;
+"""
+
+
+def to_bytes(keys) -> bytes:
+    keys = np.fromiter(keys, dtype=np.int64)
+    bits = np.zeros(int(keys.max()) + 1 if len(keys) else 0, dtype=bool)
+    bits[keys] = True
+    return zlib.compress(np.packbits(bits, bitorder="little").tobytes())
+
+
+def backfill_bitmaps(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT MIN(date), MAX(date), ARRAY_AGG(date) FROM agg_daily_sales;")
+        start, end, dates = cursor.fetchone()
+        if not dates:
+            return
+
+        cursor.execute(
+            DAILY_CUSTOMER_KEYS_SQL,
+            {"dates": dates, "start": start, "end": end + timedelta(days=1)},
+        )
+        cursor.executemany(
+            "UPDATE agg_daily_sales SET customers_bitmap = %s WHERE date = %s;",
+            [(to_bytes(keys), day) for day, keys in cursor.fetchall()],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0007_fact_orders_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aggdailysales",
+            name="customers_bitmap",
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(backfill_bitmaps, migrations.RunPython.noop),
+    ]
@@ -49,7 +49,11 @@ class DimTime(models.Model):
     year = models.IntegerField()
     month = models.IntegerField()
     day = models.IntegerField()
-    week = models.IntegerField()
+    week = models.IntegerField()  # Monday-based, strftime("%W")
+    iso_week = models.IntegerField()
+    quarter = models.IntegerField()
+    day_of_week = models.IntegerField()  # ISO: 1 = Monday ... 7 = Sunday
+    is_weekend = models.BooleanField()
 
     class Meta:
         db_table = "dim_time"
@@ -80,10 +84,83 @@ class FactOrder(models.Model):
     class Meta:
         db_table = "fact_orders"
         indexes = [
-            models.Index(fields=["created_at"]),
+            # covers the date-range aggregates of analytics.queries (index-only scans) and
+            # orders the keyset pages of /api/v1/orders/ (created_at, order_key)
+            models.Index(
+                fields=["created_at", "order_key"],
+                include=["order_amount", "customer", "product", "quantity"],
+                name="fact_orders_created_key_idx",
+            ),
             models.Index(fields=["customer"]),
             models.Index(fields=["time"]),
         ]
 
     def __str__(self):
         return f"{self.order_id}"
+
+
+class AggDailySales(models.Model):
+    """
+    Daily rollup of fact_orders (by created_at::date), maintained by analytics.rollups.
+    """
+
+    date = models.DateField(primary_key=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    orders = models.IntegerField()
+    quantity = models.BigIntegerField()
+    unique_customers = models.IntegerField()
+    customers_hll = models.BinaryField(null=True)  # zlib'd HyperLogLog sketch, analytics.hll
+    customers_bitmap = models.BinaryField(null=True)  # zlib'd key bitmap, analytics.bitmaps
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "agg_daily_sales"
+
+    def __str__(self):
+        return str(self.date)
+
+
+class AggDailyProductSales(models.Model):
+    """
+    Daily rollup of fact_orders per product, maintained by analytics.rollups.
+    """
+
+    date = models.DateField()
+    product = models.ForeignKey(DimProduct, on_delete=models.CASCADE, db_column="product_key")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    orders = models.IntegerField()
+    quantity = models.BigIntegerField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "agg_daily_product_sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "product"], name="agg_daily_product_sales_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}"
+
+
+class CustomerRfmState(models.Model):
+    """
+    Lifetime RFM inputs per customer, maintained by analytics.rollups together with the
+    daily rollups (customers with orders on the refreshed days are recomputed).
+    """
+
+    customer = models.OneToOneField(
+        DimCustomer, on_delete=models.CASCADE, primary_key=True, db_column="customer_key"
+    )
+    first_order_date = models.DateField()
+    last_order_date = models.DateField()
+    frequency = models.IntegerField()
+    monetary = models.DecimalField(max_digits=14, decimal_places=2)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "customer_rfm_state"
+
+    def __str__(self):
+        return str(self.customer_id)
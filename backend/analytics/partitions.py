@@ -0,0 +1,311 @@
+"""
+Monthly range partitioning of fact_orders on created_at.
+
+A partitioned table cannot have a unique constraint on order_id alone (unique keys must
+contain the partition key), so converted tables keep order_id unique through the
+fact_order_ids registry: a BEFORE INSERT trigger claims the order_id there, and a taken
+one raises IntegrityError (unique_violation on fact_order_ids_pkey) as the unpartitioned
+table's constraint would. Loaders insert inside skip_loaded_orders(), where the trigger
+drops such rows instead (RETURN NULL), which is what their INSERT ... ON CONFLICT DO NOTHING
+/ bulk_create(ignore_conflicts=True) expects. Deleting a fact or TRUNCATE fact_orders
+releases its order_id; orders of detached partitions stay registered, so archived orders
+are not loaded again (truncate a single partition with DELETE for the same reason).
+
+Partitions are named fact_orders_pYYYYMM and hold one calendar month (in the connection
+time zone). fact_orders_default catches anything outside them.
+"""
+
+import re
+from contextlib import contextmanager
+from datetime import date
+
+from django.db import connection, transaction
+
+TABLE = "fact_orders"
+DEFAULT_PARTITION = "fact_orders_default"
+ARCHIVE_SCHEMA = "archive"
+PARTITION_NAME = re.compile(r"^fact_orders_p(\d{4})(\d{2})$")
+
+REGISTRY_SQL = """
+    CREATE TABLE fact_order_ids (
+        order_id varchar(64) PRIMARY KEY,
+        created_at timestamptz NOT NULL
+    );
+"""
+
+TRIGGERS_SQL = """
+    CREATE OR REPLACE FUNCTION fact_orders_claim_order_id() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF current_setting('fact_orders.moving_rows', true) = 'on' THEN
+            RETURN NEW;
+        END IF;
+        IF current_setting('fact_orders.skip_loaded', true) IS DISTINCT FROM 'on' THEN
+            -- unique_violation when the order_id is taken
+            INSERT INTO fact_order_ids (order_id, created_at)
+            VALUES (NEW.order_id, NEW.created_at);
+            RETURN NEW;
+        END IF;
+        INSERT INTO fact_order_ids (order_id, created_at)
+        VALUES (NEW.order_id, NEW.created_at)
+        ON CONFLICT (order_id) DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN NULL;  -- order_id already loaded: skip the row
+        END IF;
+        RETURN NEW;
+    END $$;
+
+    CREATE OR REPLACE FUNCTION fact_orders_release_order_id() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF current_setting('fact_orders.moving_rows', true) = 'on' THEN
+            RETURN OLD;
+        END IF;
+        DELETE FROM fact_order_ids WHERE order_id = OLD.order_id;
+        RETURN OLD;
+    END $$;
+
+    CREATE OR REPLACE FUNCTION fact_orders_release_truncated_order_ids() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        DELETE FROM fact_order_ids r USING fact_orders f WHERE r.order_id = f.order_id;
+        RETURN NULL;
+    END $$;
+
+    CREATE OR REPLACE TRIGGER fact_orders_claim_order_id
+        BEFORE INSERT ON fact_orders
+        FOR EACH ROW EXECUTE FUNCTION fact_orders_claim_order_id();
+
+    CREATE OR REPLACE TRIGGER fact_orders_release_order_id
+        AFTER DELETE ON fact_orders
+        FOR EACH ROW EXECUTE FUNCTION fact_orders_release_order_id();
+
+    CREATE OR REPLACE TRIGGER fact_orders_release_truncated_order_ids
+        BEFORE TRUNCATE ON fact_orders
+        FOR EACH STATEMENT EXECUTE FUNCTION fact_orders_release_truncated_order_ids();
+"""
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"fact_orders_p{month:%Y%m}"
+
+
+@contextmanager
+def skip_loaded_orders():
+    """
+    Inserts into fact_orders inside the block skip orders whose order_id is already loaded
+    instead of raising IntegrityError, on a partitioned table as on an unpartitioned one
+    with ON CONFLICT DO NOTHING. For loaders; runs in (or opens) a transaction.
+    """
+    with transaction.atomic(savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('fact_orders.skip_loaded', 'on', true);")
+        yield
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('fact_orders.skip_loaded', 'off', true);")
+
+
+def install_triggers() -> None:
+    """
+    (Re)creates the order_id registry triggers of a partitioned fact_orders.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TRIGGERS_SQL)
+
+
+def is_partitioned() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass;", [TABLE])
+        return cursor.fetchone()[0] == "p"
+
+
+def list_partitions() -> dict[date, str]:
+    """
+    month -> partition name of the monthly partitions currently attached.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass;
+            """,
+            [TABLE],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def create_partition(month: date) -> bool:
+    """
+    Creates the partition of month unless it exists. Rows of that month already sitting in
+    the default partition are moved into it. Returns whether a partition was created.
+    """
+    month = month_start(month)
+    if month in list_partitions():
+        return False
+
+    qn = connection.ops.quote_name
+    name, default = qn(partition_name(month)), qn(DEFAULT_PARTITION)
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        # ALTER TABLE refuses to run while deferred FK checks of this transaction are pending
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE;")
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s);",
+            bounds,
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s);",
+                bounds,
+            )
+            return True
+
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {default};")
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s);", bounds
+        )
+        cursor.execute("SELECT set_config('fact_orders.moving_rows', 'on', true);")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved;
+            """,
+            bounds,
+        )
+        cursor.execute("SELECT set_config('fact_orders.moving_rows', 'off', true);")
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {default} DEFAULT;")
+    return True
+
+
+def ensure_partitions(months_ahead: int, today: date | None = None) -> list[str]:
+    """
+    Creates the partitions of the current month and the next months_ahead months.
+    """
+    current = month_start(today or date.today())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(month):
+            created.append(partition_name(month))
+    return created
+
+
+def detach_partitions(before: date, drop: bool = False) -> list[str]:
+    """
+    Detaches the monthly partitions that end on or before `before` and moves them to the
+    archive schema (or drops them).
+    """
+    qn = connection.ops.quote_name
+    detached = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not drop:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA};")
+        for month, name in sorted(list_partitions().items()):
+            if add_months(month, 1) > before:
+                continue
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {qn(name)};")
+            if drop:
+                cursor.execute(f"DROP TABLE {qn(name)};")
+            else:
+                cursor.execute(f"ALTER TABLE {qn(name)} SET SCHEMA {ARCHIVE_SCHEMA};")
+            detached.append(name)
+    return detached
+
+
+def convert_to_partitioned(months_ahead: int) -> None:
+    """
+    Rebuilds fact_orders as a partitioned table in one transaction: monthly partitions for
+    every month with data plus months_ahead future months, the default partition, the
+    order_id registry and the same indexes / foreign keys (and names) as before. The
+    primary key becomes (order_key, created_at).
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE;")
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE;")
+        cursor.execute(
+            """
+            SELECT pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            WHERE i.indrelid = %s::regclass
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid);
+            """,
+            [TABLE],
+        )
+        index_sql = [definition for (definition,) in cursor.fetchall()]
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'f';
+            """,
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            f"SELECT DISTINCT DATE_TRUNC('month', created_at)::date FROM {TABLE} ORDER BY 1;"
+        )
+        months = [month for (month,) in cursor.fetchall()]
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO fact_orders_unpartitioned;")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE fact_orders_unpartitioned INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at);"
+        )
+        current = month_start(date.today())
+        months = sorted(set(months) | {add_months(current, i) for i in range(months_ahead + 1)})
+        for month in months:
+            cursor.execute(
+                f"CREATE TABLE {partition_name(month)} PARTITION OF {TABLE} "
+                "FOR VALUES FROM (%s) TO (%s);",
+                [month, add_months(month, 1)],
+            )
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT;")
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM fact_orders_unpartitioned;")
+        cursor.execute(f"SELECT COALESCE(MAX(order_key), 0) FROM {TABLE};")
+        max_key = cursor.fetchone()[0]
+        cursor.execute(REGISTRY_SQL)
+        cursor.execute(
+            f"INSERT INTO fact_order_ids (order_id, created_at) "
+            f"SELECT order_id, created_at FROM {TABLE};"
+        )
+        cursor.execute("DROP TABLE fact_orders_unpartitioned;")
+
+        # order_key keeps its sequence name; the identity column of the old table is gone
+        cursor.execute(
+            f"CREATE SEQUENCE fact_orders_order_key_seq OWNED BY {TABLE}.order_key;"
+            "SELECT setval('fact_orders_order_key_seq', %s, %s);"
+            f"ALTER TABLE {TABLE} ALTER COLUMN order_key "
+            "SET DEFAULT nextval('fact_orders_order_key_seq');",
+            [max(max_key, 1), max_key > 0],
+        )
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT fact_orders_pkey "
+            "PRIMARY KEY (order_key, created_at);"
+        )
+        for definition in index_sql:
+            cursor.execute(definition)
+        cursor.execute(f"CREATE INDEX fact_orders_order_id_idx ON {TABLE} (order_id);")
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition};")
+        install_triggers()
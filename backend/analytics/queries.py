@@ -1,11 +1,183 @@
-from datetime import date
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Generator
+from django.conf import settings
 from django.db import connection
+from django.db.backends.postgresql import base as postgresql_base
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
 
+from analytics import bitmaps, hll
 
-def fetch_kpis(date_from: date, date_to: date) -> dict:
+# Unions the daily customer bitmaps of agg_daily_sales per bucket (see analytics.bitmaps)
+CUSTOMER_BITMAPS_SQL = """
+    SELECT DATE_TRUNC(%s, date)::date AS bucket, customers_bitmap
+    FROM agg_daily_sales
+    WHERE date BETWEEN %s AND %s;
+"""
+
+# Merges the daily customer sketches of agg_daily_sales per bucket (see analytics.hll)
+CUSTOMER_SKETCHES_SQL = """
+    SELECT DATE_TRUNC(%s, date)::date AS bucket, customers_hll
+    FROM agg_daily_sales
+    WHERE date BETWEEN %s AND %s;
+"""
+
+RFM_FACT_SOURCE_SQL = """
+    SELECT
+        customer_key,
+        (%(date_to)s::date - MAX(created_at::date))::int AS recency_days,
+        COUNT(*) AS frequency,
+        SUM(order_amount) AS monetary
+    FROM fact_orders
+    WHERE created_at >= %(start)s AND created_at < %(end)s
+    GROUP BY customer_key
+"""
+
+RFM_STATE_SOURCE_SQL = """
+    SELECT
+        customer_key,
+        (%(date_to)s::date - last_order_date)::int AS recency_days,
+        frequency,
+        monetary
+    FROM customer_rfm_state
+"""
+
+# Scores are quintiles: 1 + the number of quintile boundaries below the value (recency is
+# negated so that recent customers score high). Ties always get the same score, unlike the
+# NTILE(5) this replaced: with many one-order customers, frequency scores bunch up instead of
+# forming five equal groups, so segment counts differ from the NTILE ones.
+RFM_SEGMENTS_SQL = """
+    WITH rfm_calc AS ({source}),
+    quintiles AS (
+        SELECT
+            percentile_disc(ARRAY[0.2, 0.4, 0.6, 0.8])
+                WITHIN GROUP (ORDER BY -recency_days) AS r,
+            percentile_disc(ARRAY[0.2, 0.4, 0.6, 0.8]) WITHIN GROUP (ORDER BY frequency) AS f,
+            percentile_disc(ARRAY[0.2, 0.4, 0.6, 0.8]) WITHIN GROUP (ORDER BY monetary) AS m
+        FROM rfm_calc
+    ),
+    rfm_scores AS (
+        SELECT
+            c.customer_key,
+            1 + (SELECT COUNT(*) FROM unnest(q.r) b WHERE b < -c.recency_days) AS r_score,
+            1 + (SELECT COUNT(*) FROM unnest(q.f) b WHERE b < c.frequency) AS f_score,
+            1 + (SELECT COUNT(*) FROM unnest(q.m) b WHERE b < c.monetary) AS m_score
+        FROM rfm_calc c
+        CROSS JOIN quintiles q
+    ),
+    labeled AS (
+        SELECT
+            customer_key,
+            r_score, f_score, m_score,
+            CASE
+                WHEN r_score >= 4 AND f_score >= 4 THEN 'Champions'
+                WHEN r_score >= 3 AND f_score >= 3 THEN 'Loyal Customers'
+                WHEN r_score >= 4 AND f_score <= 2 THEN 'New Customers'
+                WHEN r_score <= 2 AND f_score >= 3 THEN 'At Risk'
+                ELSE 'Other'
+            END AS segment
+        FROM rfm_scores
+    )
+    SELECT
+        segment,
+        COUNT(*) AS customers
+    FROM labeled
+    GROUP BY segment
+    ORDER BY customers DESC, segment;
+"""
+
+APPROX_INFO = {"unique_customers": True, "standard_error": round(hll.STANDARD_ERROR, 4)}
+
+# The queries below are written as generators that yield (sql, params) and are sent back the
+# rows of each statement, so the same logic runs on Django's connection (run_query) and on
+# the async pool of analytics.async_queries.
+QuerySteps = Generator[tuple[str, Any], list[tuple], Any]
+
+
+def run_query(steps: QuerySteps):
+    """
+    Executes the statements of a query on Django's connection and returns its result.
+    """
+    with query_cursor() as cursor:
+        try:
+            statement = next(steps)
+            while True:
+                cursor.execute(*statement)
+                statement = steps.send(cursor.fetchall())
+        except StopIteration as done:
+            return done.value
+
+
+def query_cursor():
+    """
+    A cursor of Django's connection that binds parameters server-side when it can.
+
+    Django's psycopg 3 cursors interpolate parameters client-side, so each statement is a
+    new text to PostgreSQL. With server-side binding the fixed SQL of this module is one
+    statement text per query shape, which psycopg prepares once the connection has run it
+    a few times (OPTIONS["prepare_threshold"], see settings.DB_PGBOUNCER); pooled
+    connections (config.postgresql_pool) then skip parsing and planning on most requests.
+    """
+    if not is_psycopg3 or connection.vendor != "postgresql":
+        return connection.cursor()
+    connection.ensure_connection()
+    raw_cursor = postgresql_base.ServerBindingCursor(connection.connection)
+    if connection.queries_logged:
+        return connection.make_debug_cursor(raw_cursor)
+    return connection.make_cursor(raw_cursor)
+
+
+def day_range(date_from: date, date_to: date) -> tuple[date, date]:
+    """
+    Half-open bounds [date_from, date_to + 1 day) for created_at. Unlike
+    created_at::date BETWEEN, the comparison can use the created_at index; dates are
+    compared as midnight in the session time zone, so the same orders match.
+    """
+    return date_from, date_to + timedelta(days=1)
+
+
+def approx_unique_customers(date_from: date, date_to: date, trunc_unit: str = "day") -> dict:
+    """
+    bucket -> HyperLogLog estimate of the distinct customers (relative standard error
+    hll.STANDARD_ERROR, ~0.81%). With trunc_unit=None the whole range is one bucket (None).
+    """
+    return run_query(approx_unique_customers_query(date_from, date_to, trunc_unit))
+
+
+def approx_unique_customers_query(
+    date_from: date, date_to: date, trunc_unit: str | None = "day"
+) -> QuerySteps:
+    rows = yield CUSTOMER_SKETCHES_SQL, [trunc_unit or "day", date_from, date_to]
+
+    sketches = defaultdict(list)
+    for bucket, sketch in rows:
+        sketches[bucket if trunc_unit else None].append(sketch)
+    return {bucket: hll.merge_all(blobs).count() for bucket, blobs in sketches.items()}
+
+
+def unique_customers_query(
+    date_from: date, date_to: date, trunc_unit: str | None = "day"
+) -> QuerySteps:
+    rows = yield CUSTOMER_BITMAPS_SQL, [trunc_unit or "day", date_from, date_to]
+
+    blobs = defaultdict(list)
+    for bucket, bitmap in rows:
+        blobs[bucket if trunc_unit else None].append(bitmap)
+    return {bucket: bitmaps.union_count(bucket_blobs) for bucket, bucket_blobs in blobs.items()}
+
+
+def fetch_kpis(date_from: date, date_to: date, approx: bool = False) -> dict:
     """
     Returns basic KPI metrics for orders between date_from and date_to (inclusive).
+    With approx, unique customers are estimated from the daily sketches (rollups only).
     """
+    return run_query(kpis_query(date_from, date_to, approx))
+
+
+def kpis_query(date_from: date, date_to: date, approx: bool = False) -> QuerySteps:
+    if settings.ANALYTICS_USE_ROLLUPS or approx:
+        return (yield from _kpis_from_rollups_query(date_from, date_to, approx))
+
     sql = """
         SELECT
             COALESCE(SUM(order_amount), 0) AS total_revenue,
@@ -13,12 +185,10 @@ def fetch_kpis(date_from: date, date_to: date) -> dict:
             COUNT(DISTINCT customer_key) AS unique_customers,
             COALESCE(AVG(order_amount), 0) AS avg_order_value
         FROM fact_orders
-        WHERE created_at::date BETWEEN %s AND %s;
+        WHERE created_at >= %s AND created_at < %s;
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [date_from, date_to])
-        row = cursor.fetchone()
+    (row,) = yield sql, day_range(date_from, date_to)
 
     return {
         "total_revenue": float(row[0]),
@@ -30,11 +200,58 @@ def fetch_kpis(date_from: date, date_to: date) -> dict:
     }
 
 
-def fetch_revenue_trends(date_from: date, date_to: date, granularity: str) -> list[dict]:
+def _kpis_from_rollups_query(date_from: date, date_to: date, approx: bool = False) -> QuerySteps:
+    """
+    Sums come from agg_daily_sales. Distinct customers cannot be added up across days, so
+    ranges longer than a day union the daily customer bitmaps (exact), or merge the daily
+    sketches with approx.
+    """
+    sql = """
+        SELECT
+            COALESCE(SUM(revenue), 0) AS total_revenue,
+            COALESCE(SUM(orders), 0) AS total_orders,
+            COALESCE(SUM(unique_customers), 0) AS unique_customers,
+            COALESCE(SUM(revenue) / NULLIF(SUM(orders), 0), 0) AS avg_order_value
+        FROM agg_daily_sales
+        WHERE date BETWEEN %s AND %s;
+    """
+
+    (row,) = yield sql, [date_from, date_to]
+    unique_customers = row[2]
+    if date_from != date_to and row[1]:
+        if approx:
+            counts = yield from approx_unique_customers_query(date_from, date_to, None)
+        else:
+            counts = yield from unique_customers_query(date_from, date_to, None)
+        unique_customers = counts.get(None, 0)
+
+    data = {
+        "total_revenue": float(row[0]),
+        "total_orders": int(row[1]),
+        "unique_customers": int(unique_customers),
+        "avg_order_value": float(row[3]),
+        "date_from": str(date_from),
+        "date_to": str(date_to),
+    }
+    if approx:
+        data["approx"] = dict(APPROX_INFO)
+    return data
+
+
+def fetch_revenue_trends(
+    date_from: date, date_to: date, granularity: str, approx: bool = False
+) -> list[dict]:
     """
     Returns revenue trend buckets between date_from and date_to.
     granularity: daily | weekly | monthly
+    With approx, weekly / monthly unique customers merge the daily sketches (rollups only).
     """
+    return run_query(revenue_trends_query(date_from, date_to, granularity, approx))
+
+
+def revenue_trends_query(
+    date_from: date, date_to: date, granularity: str, approx: bool = False
+) -> QuerySteps:
     granularity_map = {
         "daily": "day",
         "weekly": "week",
@@ -44,6 +261,10 @@ def fetch_revenue_trends(date_from: date, date_to: date, granularity: str) -> li
         raise ValueError("granularity must be one of: daily, weekly, monthly")
 
     trunc_unit = granularity_map[granularity]
+    if settings.ANALYTICS_USE_ROLLUPS or approx:
+        return (
+            yield from _revenue_trends_from_rollups_query(date_from, date_to, trunc_unit, approx)
+        )
 
     sql = """
         SELECT
@@ -52,14 +273,12 @@ def fetch_revenue_trends(date_from: date, date_to: date, granularity: str) -> li
             COUNT(*) AS orders,
             COUNT(DISTINCT customer_key) AS unique_customers
         FROM fact_orders
-        WHERE created_at::date BETWEEN %s AND %s
+        WHERE created_at >= %s AND created_at < %s
         GROUP BY 1
         ORDER BY 1;
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [trunc_unit, date_from, date_to])
-        rows = cursor.fetchall()
+    rows = yield sql, [trunc_unit, *day_range(date_from, date_to)]
 
     return [
         {
@@ -70,57 +289,66 @@ def fetch_revenue_trends(date_from: date, date_to: date, granularity: str) -> li
         }
         for r in rows
     ]
-def fetch_rfm_segments(date_from: date, date_to: date) -> dict:
+
+
+def _revenue_trends_from_rollups_query(
+    date_from: date, date_to: date, trunc_unit: str, approx: bool = False
+) -> QuerySteps:
     """
-    Returns RFM segments aggregated (counts per segment) within the date range.
-    Uses CTEs + NTILE window functions.
+    Daily buckets are rollup rows as they are. Weekly / monthly buckets add up the days;
+    their distinct customers union the days' bitmaps (or are estimated with approx).
     """
     sql = """
-        WITH rfm_calc AS (
-            SELECT
-                customer_key,
-                (CURRENT_DATE - MAX(created_at::date))::int AS recency_days,
-                COUNT(*) AS frequency,
-                SUM(order_amount) AS monetary
-            FROM fact_orders
-            WHERE created_at::date BETWEEN %s AND %s
-            GROUP BY customer_key
-        ),
-        rfm_scores AS (
-            SELECT
-                customer_key,
-                recency_days,
-                frequency,
-                monetary,
-                NTILE(5) OVER (ORDER BY recency_days DESC) AS r_score,
-                NTILE(5) OVER (ORDER BY frequency) AS f_score,
-                NTILE(5) OVER (ORDER BY monetary) AS m_score
-            FROM rfm_calc
-        ),
-        labeled AS (
-            SELECT
-                customer_key,
-                r_score, f_score, m_score,
-                CASE
-                    WHEN r_score >= 4 AND f_score >= 4 THEN 'Champions'
-                    WHEN r_score >= 3 AND f_score >= 3 THEN 'Loyal Customers'
-                    WHEN r_score >= 4 AND f_score <= 2 THEN 'New Customers'
-                    WHEN r_score <= 2 AND f_score >= 3 THEN 'At Risk'
-                    ELSE 'Other'
-                END AS segment
-            FROM rfm_scores
-        )
         SELECT
-            segment,
-            COUNT(*) AS customers
-        FROM labeled
-        GROUP BY segment
-        ORDER BY customers DESC;
+            DATE_TRUNC(%s, date)::date AS bucket,
+            SUM(revenue) AS revenue,
+            SUM(orders) AS orders,
+            SUM(unique_customers) AS unique_customers
+        FROM agg_daily_sales
+        WHERE date BETWEEN %s AND %s
+        GROUP BY 1
+        ORDER BY 1;
+    """
+
+    rows = yield sql, [trunc_unit, date_from, date_to]
+    customers = {r[0]: r[3] for r in rows}
+    if trunc_unit != "day" and rows:
+        if approx:
+            customers = yield from approx_unique_customers_query(date_from, date_to, trunc_unit)
+        else:
+            customers = yield from unique_customers_query(date_from, date_to, trunc_unit)
+
+    return [
+        {
+            "bucket": str(r[0]),
+            "revenue": float(r[1]),
+            "orders": int(r[2]),
+            "unique_customers": int(customers.get(r[0], 0)),
+        }
+        for r in rows
+    ]
+
+
+def fetch_rfm_segments(date_from: date, date_to: date) -> dict:
+    """
+    Returns RFM segments aggregated (counts per segment) within the date range.
+    Recency is measured at date_to. When the range covers every order, the inputs come from
+    customer_rfm_state instead of fact_orders. The state holds lifetime values, so it cannot
+    answer narrower ranges: those are aggregated from the orders in range.
     """
+    return run_query(rfm_segments_query(date_from, date_to))
+
+
+def rfm_segments_query(date_from: date, date_to: date) -> QuerySteps:
+    params = {"date_to": date_to}
+    if settings.ANALYTICS_USE_ROLLUPS and (yield from _rfm_state_covers_query(date_from, date_to)):
+        source = RFM_STATE_SOURCE_SQL
+    else:
+        source = RFM_FACT_SOURCE_SQL
+        params["start"], params["end"] = day_range(date_from, date_to)
+    sql = RFM_SEGMENTS_SQL.format(source=source)
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [date_from, date_to])
-        rows = cursor.fetchall()
+    rows = yield sql, params
 
     # Convert to a friendly response structure
     segments = [{"segment": r[0], "customers": int(r[1])} for r in rows]
@@ -133,11 +361,25 @@ def fetch_rfm_segments(date_from: date, date_to: date) -> dict:
         "segments": segments,
     }
 
+
+def _rfm_state_covers_query(date_from: date, date_to: date) -> QuerySteps:
+    """
+    The lifetime state answers a range only if no order falls outside of it. The order days
+    are read off the agg_daily_sales primary key.
+    """
+    ((first, last),) = yield "SELECT MIN(date), MAX(date) FROM agg_daily_sales;", None
+    return first is not None and date_from <= first and last <= date_to
+
+
 def fetch_top_products(date_from: date, date_to: date, metric: str, limit: int) -> dict:
     """
     Returns top products by revenue or quantity within the date range.
     metric: revenue | quantity
     """
+    return run_query(top_products_query(date_from, date_to, metric, limit))
+
+
+def top_products_query(date_from: date, date_to: date, metric: str, limit: int) -> QuerySteps:
     if metric not in {"revenue", "quantity"}:
         raise ValueError("metric must be one of: revenue, quantity")
 
@@ -146,25 +388,30 @@ def fetch_top_products(date_from: date, date_to: date, metric: str, limit: int)
 
     order_by = "revenue DESC" if metric == "revenue" else "quantity DESC"
 
+    if settings.ANALYTICS_USE_ROLLUPS:
+        source = "agg_daily_product_sales o"
+        revenue, date_filter = "o.revenue", "o.date >= %s AND o.date < %s"
+    else:
+        source = "fact_orders o"
+        revenue, date_filter = "o.order_amount", "o.created_at >= %s AND o.created_at < %s"
+
     sql = f"""
         SELECT
             p.product_id,
             COALESCE(p.name, '') AS name,
             COALESCE(p.category, '') AS category,
-            COALESCE(SUM(o.order_amount), 0) AS revenue,
+            COALESCE(SUM({revenue}), 0) AS revenue,
             COALESCE(SUM(o.quantity), 0) AS quantity
-        FROM fact_orders o
+        FROM {source}
         JOIN dim_products p
           ON o.product_key = p.product_key
-        WHERE o.created_at::date BETWEEN %s AND %s
+        WHERE {date_filter}
         GROUP BY p.product_id, p.name, p.category
         ORDER BY {order_by}
         LIMIT %s;
     """
 
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [date_from, date_to, limit])
-        rows = cursor.fetchall()
+    rows = yield sql, [*day_range(date_from, date_to), limit]
 
     items = [
         {
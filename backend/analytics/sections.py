@@ -0,0 +1,143 @@
+"""
+Cached sections behind the analytics endpoints: the cache key, TTL and computation of each,
+shared by the views, /api/v1/overview/ and the cache warmer run after ETL loads.
+
+Entries are versioned by date range (analytics.cache), so ranges that end before today are
+only recomputed when a load touches them and can be kept ANALYTICS_CACHE_HISTORICAL_TTL.
+"""
+
+from datetime import date
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+
+from analytics.cache import cached_fetch, cached_fetch_many, cached_fetch_many_async
+from analytics.queries import (
+    APPROX_INFO,
+    fetch_kpis,
+    fetch_revenue_trends,
+    fetch_rfm_segments,
+    fetch_top_products,
+)
+
+
+class Section(NamedTuple):
+    key: str
+    ttl: int
+    compute: Callable[[], dict]
+    date_from: date
+    date_to: date
+
+    def fetch(self) -> tuple[bytes, dict]:
+        return cached_fetch(*self.cache_request())
+
+    def cache_request(self) -> tuple:
+        return self.key, self.ttl, self.compute, (self.date_from, self.date_to)
+
+
+def fetch_cached(sections: list[Section]) -> list[tuple[bytes, dict] | None]:
+    """
+    The cached results of sections, None for those that have to be computed (see
+    analytics.cache.cached_fetch_many).
+    """
+    return cached_fetch_many([section.cache_request() for section in sections])
+
+
+async def fetch_async(sections: list[Section], computes: list) -> list[tuple[bytes, dict]]:
+    """
+    The results of sections for the async views, computing the missing ones with the
+    coroutine functions in computes (see analytics.cache.cached_fetch_many_async).
+    """
+    return await cached_fetch_many_async(
+        [section.cache_request() for section in sections], computes
+    )
+
+
+def ttl_for(date_to: date, ttl: int) -> int:
+    return ttl if date_to >= date.today() else settings.ANALYTICS_CACHE_HISTORICAL_TTL
+
+
+def default_range() -> tuple[date, date]:
+    """
+    The range of the endpoints (and dashboard) without dates: month to date.
+    """
+    today = date.today()
+    return today.replace(day=1), today
+
+
+def kpis(date_from: date, date_to: date, approx: bool = False) -> Section:
+    key = f"kpis:{date_from}:{date_to}" + (":approx" if approx else "")
+    return Section(
+        key,
+        ttl_for(date_to, 300),
+        lambda: fetch_kpis(date_from, date_to, approx),
+        date_from,
+        date_to,
+    )
+
+
+def revenue_trends(
+    date_from: date, date_to: date, granularity: str, approx: bool = False
+) -> Section:
+    key = f"revenue_trends:{granularity}:{date_from}:{date_to}" + (":approx" if approx else "")
+
+    def compute() -> dict:
+        points = fetch_revenue_trends(date_from, date_to, granularity, approx)
+        return revenue_trends_payload(date_from, date_to, granularity, approx, points)
+
+    return Section(key, ttl_for(date_to, 300), compute, date_from, date_to)
+
+
+def revenue_trends_payload(
+    date_from: date, date_to: date, granularity: str, approx: bool, points: list[dict]
+) -> dict:
+    payload = {
+        "granularity": granularity,
+        "date_from": str(date_from),
+        "date_to": str(date_to),
+        "points": points,
+    }
+    if approx:
+        payload["approx"] = dict(APPROX_INFO)
+    return payload
+
+
+def rfm_segments(date_from: date, date_to: date) -> Section:
+    return Section(
+        f"rfm_segments:{date_from}:{date_to}",
+        ttl_for(date_to, 600),
+        lambda: fetch_rfm_segments(date_from, date_to),
+        date_from,
+        date_to,
+    )
+
+
+def top_products(date_from: date, date_to: date, metric: str, limit: int) -> Section:
+    return Section(
+        f"top_products:{metric}:{limit}:{date_from}:{date_to}",
+        ttl_for(date_to, 300),
+        lambda: fetch_top_products(date_from, date_to, metric, limit),
+        date_from,
+        date_to,
+    )
+
+
+def dashboard_sections() -> list[Section]:
+    """
+    What the dashboard pages request when no dates are picked.
+    """
+    date_from, date_to = default_range()
+    return [
+        kpis(date_from, date_to),
+        revenue_trends(date_from, date_to, "daily"),
+        top_products(date_from, date_to, "revenue", 10),
+        rfm_segments(date_from, date_to),
+    ]
+
+
+def warm_dashboard_cache() -> dict:
+    """
+    Recomputes the default dashboard sections that are not cached (after a load bumped
+    their version). Returns key -> whether it was computed.
+    """
+    return {section.key: not section.fetch()[1]["hit"] for section in dashboard_sections()}
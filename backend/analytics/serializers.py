@@ -21,3 +21,40 @@ class FactOrderSerializer(serializers.ModelSerializer):
             "product_name",
             "product_category",
         ]
+
+
+# FactOrderSerializer's output fields and the fact_orders lookups they read
+ORDER_LIST_FIELDS = {
+    "order_id": "order_id",
+    "created_at": "created_at",
+    "order_amount": "order_amount",
+    "quantity": "quantity",
+    "discount_amount": "discount_amount",
+    "customer_id": "customer__customer_id",
+    "product_id": "product__product_id",
+    "product_name": "product__name",
+    "product_category": "product__category",
+}
+
+
+def order_list_rows(queryset):
+    """
+    The output columns of queryset as named tuples (plus order_key, for cursors): joins
+    dim_customers and dim_products only and builds no model instances.
+    """
+    return queryset.values_list(*ORDER_LIST_FIELDS.values(), "order_key", named=True)
+
+
+def serialize_order_rows(rows) -> list[dict]:
+    """
+    FactOrderSerializer(many=True).data for order_list_rows() rows. Decimals become strings
+    as in the serializer; datetimes are left to the JSON renderer, which writes them alike.
+    """
+    names = tuple(ORDER_LIST_FIELDS)
+    data = []
+    for row in rows:
+        item = dict(zip(names, row))  # zip drops the trailing order_key
+        item["order_amount"] = f"{item['order_amount']:f}"
+        item["discount_amount"] = f"{item['discount_amount']:f}"
+        data.append(item)
+    return data
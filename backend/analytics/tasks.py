@@ -0,0 +1,20 @@
+from celery import shared_task
+
+from analytics.dim_time import default_calendar_range, generate_calendar
+from analytics.sections import warm_dashboard_cache
+
+
+@shared_task
+def warm_dashboard_cache_task():
+    """
+    Recomputes the default dashboard ranges right after an ETL load invalidated them.
+    """
+    return warm_dashboard_cache()
+
+
+@shared_task
+def extend_calendar_task():
+    """
+    Keeps dim_time generated through default_calendar_range() (DIM_TIME_YEARS_AHEAD).
+    """
+    return generate_calendar(*default_calendar_range())
@@ -1,8 +1,80 @@
 
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from importlib import import_module
+from io import StringIO
+from operator import itemgetter
+from unittest import mock, skipIf, skipUnless
+
+import pyarrow.parquet as pq
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import (
+    AsyncClient,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from analytics import async_queries
+from analytics import cache as cache_module
+from analytics import export, hll
+from analytics import local_cache as local_cache_module
+from analytics import sections
+from analytics.async_queries import close_pool
+from analytics.cache import (
+    COUNTERS,
+    cache_stats,
+    cached_fetch,
+    cached_fetch_many,
+    invalidate_dates,
+    render_json,
+    reset_cache_stats,
+    with_cache_meta,
+)
+from analytics.dim_time import generate_calendar, time_keys_for
+from analytics.local_cache import ENTRY_OVERHEAD, LocalCache
+from analytics.models import AggDailySales, CustomerRfmState, DimTime, FactOrder
+from analytics.partitions import (
+    add_months,
+    create_partition,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    partition_name,
+    skip_loaded_orders,
+)
+from analytics.queries import (
+    fetch_kpis,
+    fetch_revenue_trends,
+    fetch_rfm_segments,
+    fetch_top_products,
+)
+from analytics.serializers import FactOrderSerializer, order_list_rows, serialize_order_rows
+from config import asgi
+from config.postgresql_pool import base as postgresql_pool
+from config.postgresql_pool.base import pool_stats
 
-from analytics.models import FactOrder
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+REDIS_CACHES = settings.CACHES
 
 
 class KPITestCase(TestCase):
@@ -26,3 +98,846 @@ class TopProductsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("items", response.json())
 
+
+class CalendarTestCase(TestCase):
+    def test_generate_calendar_matches_python_calendar(self):
+        start, end = date(2026, 12, 20), date(2027, 1, 10)
+        self.assertEqual(generate_calendar(start, end), 22)
+        self.assertEqual(generate_calendar(start, end), 0)
+
+        for row in DimTime.objects.filter(date__range=(start, end)):
+            d = row.date
+            self.assertEqual(
+                (row.year, row.month, row.day, row.week),
+                (d.year, d.month, d.day, int(d.strftime("%W"))),
+            )
+            self.assertEqual(row.iso_week, d.isocalendar().week)
+            self.assertEqual(row.quarter, (d.month - 1) // 3 + 1)
+            self.assertEqual(row.day_of_week, d.isoweekday())
+            self.assertEqual(row.is_weekend, d.isoweekday() >= 6)
+
+    def test_time_keys_for_adds_only_missing_days(self):
+        keys = time_keys_for([date(1999, 1, 3), date(1999, 1, 1), date(2999, 1, 1)])
+        self.assertEqual(sorted(keys), [date(1999, 1, 1), date(1999, 1, 3), date(2999, 1, 1)])
+        self.assertFalse(DimTime.objects.filter(date=date(1999, 1, 2)).exists())
+        self.assertEqual(DimTime.objects.filter(date__year__gt=2100).count(), 1)
+        self.assertEqual(time_keys_for(keys), keys)
+
+
+class RollupQueriesTestCase(TestCase):
+    def setUp(self):
+        call_command("seed", customers=20, products=10, orders=200, days=60, stdout=StringIO())
+        self.date_from = date.today() - timedelta(days=45)
+        self.date_to = date.today() - timedelta(days=3)
+
+    def assertSameResults(self, fetch, *args):
+        with override_settings(ANALYTICS_USE_ROLLUPS=False):
+            expected = fetch(*args)
+        with override_settings(ANALYTICS_USE_ROLLUPS=True):
+            actual = fetch(*args)
+        self.assertEqual(actual, expected)
+
+    def test_seed_refreshes_rollups(self):
+        self.assertEqual(
+            sum(AggDailySales.objects.values_list("orders", flat=True)), FactOrder.objects.count()
+        )
+
+    def test_rollups_answer_like_fact_table(self):
+        self.assertSameResults(fetch_kpis, self.date_from, self.date_to)
+        self.assertSameResults(fetch_kpis, self.date_to, self.date_to)
+        for granularity in ("daily", "weekly", "monthly"):
+            self.assertSameResults(fetch_revenue_trends, self.date_from, self.date_to, granularity)
+        # revenue / quantity ties make the order of equal products arbitrary: compare all
+        for metric in ("revenue", "quantity"):
+            with override_settings(ANALYTICS_USE_ROLLUPS=False):
+                expected = fetch_top_products(self.date_from, self.date_to, metric, 100)
+            with override_settings(ANALYTICS_USE_ROLLUPS=True):
+                actual = fetch_top_products(self.date_from, self.date_to, metric, 100)
+            by_id = itemgetter("product_id")
+            self.assertEqual(
+                sorted(actual["items"], key=by_id), sorted(expected["items"], key=by_id)
+            )
+
+    def test_rfm_state_answers_like_fact_table(self):
+        customers = FactOrder.objects.values("customer").distinct().count()
+        self.assertEqual(CustomerRfmState.objects.count(), customers)
+        everything = (date.today() - timedelta(days=90), date.today())
+        self.assertSameResults(fetch_rfm_segments, *everything)
+        partial = (self.date_from, self.date_to)
+        for date_range, source in ((everything, "customer_rfm_state"), (partial, "fact_orders")):
+            with CaptureQueriesContext(connection) as ctx:
+                data = fetch_rfm_segments(*date_range)
+            self.assertIn(f"FROM {source}", ctx.captured_queries[-1]["sql"])
+            self.assertGreater(data["total_customers_in_range"], 0)
+
+    def test_daily_sketches_match_python_sketches(self):
+        for day in AggDailySales.objects.values_list("date", flat=True)[:5]:
+            sketch = hll.HyperLogLog()
+            for key in FactOrder.objects.filter(created_at__date=day).values_list(
+                "customer_id", flat=True
+            ):
+                sketch.add(key)
+            stored = hll.HyperLogLog.from_bytes(
+                bytes(AggDailySales.objects.get(date=day).customers_hll)
+            )
+            self.assertTrue((stored.registers == sketch.registers).all())
+
+    def test_migration_backfills_the_same_sketches(self):
+        stored = dict(AggDailySales.objects.values_list("date", "customers_hll"))
+        AggDailySales.objects.update(customers_hll=None)
+        migration = import_module("analytics.migrations.0005_aggdailysales_customers_hll")
+        with connection.schema_editor() as schema_editor:
+            migration.backfill_sketches(django_apps, schema_editor)
+        backfilled = dict(AggDailySales.objects.values_list("date", "customers_hll"))
+        self.assertEqual(
+            {day: bytes(blob) for day, blob in backfilled.items()},
+            {day: bytes(blob) for day, blob in stored.items()},
+        )
+
+    def test_multi_day_unique_customers_come_from_the_rollup(self):
+        with (
+            override_settings(ANALYTICS_USE_ROLLUPS=True),
+            CaptureQueriesContext(connection) as ctx,
+        ):
+            fetch_kpis(self.date_from, self.date_to)
+            fetch_revenue_trends(self.date_from, self.date_to, "monthly")
+        self.assertFalse([q for q in ctx.captured_queries if "fact_orders" in q["sql"]])
+
+        stored = dict(AggDailySales.objects.values_list("date", "customers_bitmap"))
+        AggDailySales.objects.update(customers_bitmap=None)
+        migration = import_module("analytics.migrations.0008_aggdailysales_customers_bitmap")
+        with connection.schema_editor() as schema_editor:
+            migration.backfill_bitmaps(django_apps, schema_editor)
+        backfilled = dict(AggDailySales.objects.values_list("date", "customers_bitmap"))
+        self.assertEqual(
+            {day: bytes(blob) for day, blob in backfilled.items()},
+            {day: bytes(blob) for day, blob in stored.items()},
+        )
+
+    def test_approx_unique_customers_within_error_bound(self):
+        with override_settings(ANALYTICS_USE_ROLLUPS=False):
+            exact = fetch_kpis(self.date_from, self.date_to)
+            exact_trends = fetch_revenue_trends(self.date_from, self.date_to, "weekly")
+        approx = fetch_kpis(self.date_from, self.date_to, approx=True)
+        approx_trends = fetch_revenue_trends(self.date_from, self.date_to, "weekly", approx=True)
+
+        self.assertEqual(approx["approx"]["unique_customers"], True)
+        self.assertEqual(approx["total_revenue"], exact["total_revenue"])
+        bound = 3 * hll.STANDARD_ERROR
+        self.assertLessEqual(
+            abs(approx["unique_customers"] - exact["unique_customers"]),
+            bound * exact["unique_customers"] + 1,
+        )
+        self.assertEqual(len(approx_trends), len(exact_trends))
+        for a, e in zip(approx_trends, exact_trends):
+            self.assertEqual(a["bucket"], e["bucket"])
+            self.assertLessEqual(
+                abs(a["unique_customers"] - e["unique_customers"]),
+                bound * e["unique_customers"] + 1,
+            )
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_approx_kpis_are_cached_separately(self):
+        url = reverse("kpis")
+        params = {"date_from": self.date_from, "date_to": self.date_to}
+        cache.clear()
+        exact = self.client.get(url, params).json()
+        approx = self.client.get(url, {**params, "approx": "true"}).json()
+        self.assertNotIn("approx", exact)
+        self.assertEqual(approx["cache"]["hit"], False)
+        self.assertTrue(approx["cache"]["key"].endswith(":approx"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ANALYTICS_OVERVIEW_WORKERS=1)
+class OverviewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("seed", customers=20, products=10, orders=200, days=60, stdout=StringIO())
+        self.params = {
+            "date_from": date.today() - timedelta(days=30),
+            "date_to": date.today(),
+            "granularity": "weekly",
+        }
+
+    def test_sections_match_their_endpoints(self):
+        overview = self.client.get(reverse("overview"), self.params).json()
+        self.assertEqual([s["cache"]["hit"] for s in section_list(overview)], [False] * 3)
+
+        for name, url in (
+            ("kpis", "kpis"),
+            ("revenue_trends", "revenue-trends"),
+            ("top_products", "top-products"),
+        ):
+            # the endpoints share the section cache entries
+            data = self.client.get(reverse(url), self.params).json()
+            self.assertEqual(data["cache"], {**overview[name]["cache"], "hit": True})
+            self.assertEqual(data, {**overview[name], "cache": data["cache"]})
+
+    def test_cached_sections_are_not_recomputed(self):
+        self.client.get(reverse("kpis"), self.params)
+        overview = self.client.get(reverse("overview"), self.params).json()
+        self.assertEqual([s["cache"]["hit"] for s in section_list(overview)], [True, False, False])
+
+        no_threads = mock.patch("analytics.views.ThreadPoolExecutor")
+        with CaptureQueriesContext(connection) as ctx, no_threads as executor:
+            overview = self.client.get(reverse("overview"), self.params).json()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        executor.assert_not_called()  # hits are served without a thread pool
+        self.assertEqual([s["cache"]["hit"] for s in section_list(overview)], [True] * 3)
+
+    def test_invalid_granularity_is_rejected(self):
+        response = self.client.get(reverse("overview"), {**self.params, "granularity": "hourly"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ANALYTICS_OVERVIEW_WORKERS=3)
+class OverviewConcurrencyTestCase(TransactionTestCase):
+    def test_sections_are_computed_in_threads(self):
+        cache.clear()
+        call_command("seed", customers=10, products=5, orders=50, days=10, stdout=StringIO())
+        params = {"date_from": date.today() - timedelta(days=20), "date_to": date.today()}
+
+        overview = self.client.get(reverse("overview"), params).json()
+        self.assertEqual(overview["kpis"]["total_orders"], FactOrder.objects.count())
+        self.assertEqual(
+            sum(p["orders"] for p in overview["revenue_trends"]["points"]),
+            FactOrder.objects.count(),
+        )
+        self.assertGreater(len(overview["top_products"]["items"]), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ANALYTICS_CACHE_BACKGROUND_REFRESH=False)
+class AnalyticsCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {"value": self.calls}
+
+    def fetch(self, key="k"):
+        body, meta = cached_fetch(key, 60, self.compute)
+        return json.loads(body), meta
+
+    def envelope(self, value, expires_in: float) -> dict:
+        return {
+            "body": render_json(value),
+            "zlib": False,
+            "expires_at": time.time() + expires_in,
+            "delta": 0.5,
+        }
+
+    def test_miss_then_hit(self):
+        self.assertEqual(self.fetch()[0], {"value": 1})
+        value, meta = self.fetch()
+        self.assertEqual((value, meta["hit"], meta["stale"]), ({"value": 1}, True, False))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache_stats()["misses"], 1)
+        self.assertEqual(cache_stats()["hits"], 1)
+
+    def test_stale_entry_is_served_and_refreshed(self):
+        cache.set("k", self.envelope({"value": 0}, -1))
+        value, meta = self.fetch()
+        self.assertEqual((value, meta["stale"]), ({"value": 0}, True))
+        self.assertEqual(self.fetch()[0], {"value": 1})
+        self.assertEqual(cache_stats()["refreshes"], 1)
+
+    @override_settings(ANALYTICS_CACHE_XFETCH_BETA=1e9)
+    def test_entries_close_to_expiry_are_refreshed_early(self):
+        cache.set("k", self.envelope({"value": 0}, 30))
+        self.assertEqual(self.fetch()[0], {"value": 0})
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache_stats()["early_refreshes"], 1)
+
+    def test_concurrent_miss_waits_for_the_lock_holder(self):
+        cache.add("k:lock", 1)
+        timer = threading.Timer(0.2, cache.set, ["k", self.envelope({"value": 0}, 60)])
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        self.assertEqual(self.fetch()[0], {"value": 0})
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(cache_stats()["lock_waits"], 1)
+
+    def test_lock_taken_over_after_expiry_is_not_released(self):
+        for caches in (LOCMEM_CACHES, REDIS_CACHES):
+            with self.subTest(backend=caches["default"]["BACKEND"]), self.settings(CACHES=caches):
+                token = cache_module._acquire("k")
+                self.assertIsNone(cache_module._acquire("k"))
+                # the lock expired and another request took it
+                cache.delete("k:lock")
+                other = cache_module._acquire("k")
+                cache_module._release("k", token)
+                self.assertTrue(cache_module._locked("k"))
+                cache_module._release("k", other)
+                self.assertFalse(cache_module._locked("k"))
+
+    @override_settings(ANALYTICS_CACHE_STATS_FLUSH_SECONDS=3600)
+    def test_counters_are_batched_per_process(self):
+        january = cache_module.VERSION_PREFIX + "2026-01"
+        for caches in (LOCMEM_CACHES, REDIS_CACHES):
+            with self.subTest(backend=caches["default"]["BACKEND"]), self.settings(CACHES=caches):
+                cache.delete_many(["k", january])
+                reset_cache_stats()
+                self.fetch()
+                self.fetch()
+                invalidate_dates([date(2026, 1, 5)])
+                version = cache.get(january)
+                invalidate_dates([date(2026, 1, 6)])
+                self.assertEqual(cache.get(january), version + 1)
+
+                self.assertIsNone(cache.get(cache_module.STATS_PREFIX + "misses"))
+                stats = cache_stats()
+                self.assertEqual(
+                    (stats["misses"], stats["hits"], stats["invalidated_months"]), (1, 1, 2)
+                )
+                cache.delete(january)
+
+    @override_settings(ANALYTICS_CACHE_COMPRESS_MIN_BYTES=100)
+    def test_large_bodies_are_stored_compressed(self):
+        value = {"points": [{"bucket": f"2026-01-{d:02d}", "revenue": 1.5} for d in range(1, 29)]}
+        body, _ = cached_fetch("k", 60, lambda: value)
+        self.assertEqual(json.loads(body), value)
+        self.assertTrue(cache.get("k")["zlib"])
+        self.assertLess(len(cache.get("k")["body"]), len(body))
+        self.assertEqual(cached_fetch("k", 60, lambda: value)[0], body)
+
+    def test_cache_meta_is_spliced_into_the_body(self):
+        meta = {"hit": True, "key": "k"}
+        body = with_cache_meta(b'{"a":[1,{}]}', meta)
+        self.assertEqual(json.loads(body), {"a": [1, {}], "cache": meta})
+        self.assertEqual(json.loads(with_cache_meta(b"{}", meta)), {"cache": meta})
+
+    def test_invalidation_drops_only_ranges_of_changed_months(self):
+        january = (date(2026, 1, 1), date(2026, 1, 31))
+        quarter = (date(2026, 1, 1), date(2026, 3, 31))
+        february = (date(2026, 2, 1), date(2026, 2, 28))
+        for date_range in (january, quarter, february):
+            cached_fetch(f"k:{date_range[0]}", 60, self.compute, date_range)
+
+        invalidate_dates([date(2026, 2, 14), date(2026, 2, 15)])
+        hits = [
+            cached_fetch(f"k:{date_range[0]}", 60, self.compute, date_range)[1]["hit"]
+            for date_range in (january, quarter, february)
+        ]
+        self.assertEqual(hits, [True, False, False])
+        self.assertEqual(cache_stats()["invalidated_months"], 1)
+
+    def test_fetch_many_serves_hits_and_leaves_misses(self):
+        january = (date(2026, 1, 1), date(2026, 1, 31))
+        february = (date(2026, 2, 1), date(2026, 2, 28))
+        cached_fetch("a", 60, self.compute, january)
+        cached_fetch("b", 60, self.compute, february)
+        invalidate_dates([date(2026, 2, 14)])
+
+        requests = [(key, 60, self.compute, r) for key, r in (("a", january), ("b", february))]
+        requests.append(("c", 60, self.compute, None))
+        hit, *misses = cached_fetch_many(requests)
+        self.assertEqual(json.loads(hit[0]), {"value": 1})
+        self.assertEqual(hit[1], cached_fetch("a", 60, self.compute, january)[1])
+        self.assertEqual(misses, [None, None])
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(ANALYTICS_CACHE_HISTORICAL_TTL=86400)
+    def test_historical_ranges_are_kept_longer(self):
+        today = date.today()
+        self.assertEqual(sections.kpis(today.replace(day=1), today).ttl, 300)
+        self.assertEqual(sections.kpis(date(2025, 1, 1), date(2025, 1, 31)).ttl, 86400)
+
+    def test_stats_endpoint(self):
+        cached_fetch("k", 60, self.compute)
+        stats = self.client.get(reverse("cache-stats")).json()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(set(stats), {*COUNTERS, "local"})
+        self.assertIsNone(stats["local"])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    ANALYTICS_CACHE_BACKGROUND_REFRESH=False,
+    ANALYTICS_L1_TTL_SECONDS=30,
+    ANALYTICS_L1_MAX_BYTES=4096,
+)
+class LocalCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache_module._local = None
+        self.addCleanup(setattr, local_cache_module, "_local", None)
+
+    def test_lru_is_bounded_by_bytes(self):
+        local = LocalCache(max_bytes=3 * (100 + ENTRY_OVERHEAD), ttl=30)
+        for key in "abc":
+            local.put(key, key, 100)
+        local.get("a")  # b is now the least recently used
+        local.put("d", "d", 100)
+        self.assertEqual([local.get(key) for key in "abcd"], ["a", None, "c", "d"])
+        self.assertEqual(local.stats()["bytes"], 3 * (100 + ENTRY_OVERHEAD))
+        self.assertEqual(local.stats()["evictions"], 1)
+        local.put("huge", "x", local.max_bytes)  # never cached, evicts nothing
+        self.assertEqual(len(local), 3)
+
+    def test_entries_expire(self):
+        local = LocalCache(max_bytes=4096, ttl=0.01)
+        local.put("k", "v", 1)
+        time.sleep(0.02)
+        self.assertIsNone(local.get("k"))
+        self.assertEqual(local.stats()["bytes"], 0)
+
+    def test_hits_skip_the_shared_cache(self):
+        cached_fetch("k", 60, lambda: {"value": 1})
+        cache.clear()  # a lookup in the shared cache would miss and compute again
+        body, meta = cached_fetch("k", 60, lambda: {"value": 2})
+        self.assertEqual((json.loads(body), meta["local"]), ({"value": 1}, True))
+        self.assertEqual(cache_stats()["local"]["hits"], 1)
+
+    def test_invalidation_clears_it(self):
+        date_range = (date(2026, 1, 1), date(2026, 1, 31))
+        cached_fetch("k", 60, lambda: {"value": 1}, date_range)
+        invalidate_dates([date(2026, 1, 5)])
+        body, meta = cached_fetch("k", 60, lambda: {"value": 2}, date_range)
+        self.assertEqual((json.loads(body), meta["hit"]), ({"value": 2}, False))
+
+
+class OrdersListTestCase(TestCase):
+    params = {"date_from": "2000-01-01", "date_to": "2100-01-01", "page_size": 7}
+
+    def setUp(self):
+        call_command("seed", customers=10, products=5, orders=40, days=10, stdout=StringIO())
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("analyst"))
+        self.newest_first = list(
+            FactOrder.objects.order_by("-created_at", "-order_key").values_list(
+                "order_id", flat=True
+            )
+        )
+
+    def get(self, url, params=None) -> dict:
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+        return response.json()
+
+    def test_cursor_pages_walk_all_orders_both_ways(self):
+        page = self.get(reverse("orders"), {**self.params, "pagination": "cursor"})
+        self.assertIsNone(page["previous"])
+        pages = [page]
+        while page["next"]:
+            page = self.get(page["next"])
+            pages.append(page)
+        walked = [order["order_id"] for page in pages for order in page["results"]]
+        self.assertEqual(walked, self.newest_first)
+
+        backwards = [pages[-1]]
+        while backwards[-1]["previous"]:
+            backwards.append(self.get(backwards[-1]["previous"]))
+        self.assertEqual(
+            [[order["order_id"] for order in page["results"]] for page in reversed(backwards)],
+            [[order["order_id"] for order in page["results"]] for page in pages],
+        )
+
+    def test_pages_without_count(self):
+        page = self.get(reverse("orders"), {**self.params, "include_count": "false", "page": 2})
+        self.assertNotIn("count", page)
+        self.assertEqual([o["order_id"] for o in page["results"]], self.newest_first[7:14])
+        self.assertIn("page=3", page["next"])
+        self.assertNotIn("page=", page["previous"])
+
+    def test_page_numbers_still_count(self):
+        page = self.client.get(reverse("orders"), self.params).json()
+        self.assertEqual(page["count"], len(self.newest_first))
+
+    def test_lean_rows_match_the_model_serializer(self):
+        orders = FactOrder.objects.order_by("order_key")
+        with CaptureQueriesContext(connection) as ctx:
+            lean = render_json(serialize_order_rows(order_list_rows(orders)))
+        self.assertNotIn("dim_time", ctx.captured_queries[0]["sql"])
+        full = FactOrderSerializer(orders.select_related("customer", "product"), many=True).data
+        self.assertEqual(lean, JSONRenderer().render(full))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("orders"), {**self.params, "cursor": "bm90IGpzb24="})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrdersExportTestCase(TestCase):
+    params = {"date_from": "2000-01-01", "date_to": "2100-01-01"}
+
+    def setUp(self):
+        call_command("seed", customers=10, products=5, orders=40, days=10, stdout=StringIO())
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("analyst"))
+        self.order_ids = list(
+            FactOrder.objects.order_by("created_at", "order_key").values_list(
+                "order_id", flat=True
+            )
+        )
+
+    def export(self, **params) -> bytes:
+        response = self.client.get(reverse("orders-export"), {**self.params, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export().decode())))
+        self.assertEqual([row["order_id"] for row in rows], self.order_ids)
+        listed = self.client.get(reverse("orders"), {**self.params, "page_size": 200}).json()
+        by_id = {order["order_id"]: order for order in listed["results"]}
+        for row in rows[:5]:
+            for field, value in by_id[row["order_id"]].items():
+                self.assertEqual(row[field], str(value))
+        self.assertEqual(gzip.decompress(self.export(compression="gzip")), self.export())
+
+    def test_ndjson(self):
+        lines = self.export(file_format="ndjson").decode().splitlines()
+        self.assertEqual([json.loads(line)["order_id"] for line in lines], self.order_ids)
+
+    def test_parquet(self):
+        table = pq.read_table(io.BytesIO(self.export(file_format="parquet", compression="zstd")))
+        self.assertEqual(table.column("order_id").to_pylist(), self.order_ids)
+        self.assertEqual(str(table.schema.field("order_amount").type), "decimal128(10, 2)")
+
+    def test_export_streams_from_a_server_side_cursor(self):
+        params = {
+            "start": datetime(2000, 1, 1, tzinfo=timezone.utc),
+            "end": datetime(2100, 1, 1, tzinfo=timezone.utc),
+            "customer_id": None,
+        }
+        connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] = True
+        try:
+            batches = export._fetch_batches(params)
+            next(batches)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM pg_cursors WHERE name LIKE 'orders_export_%%';")
+                self.assertEqual(len(cursor.fetchall()), 1)
+            batches.close()
+        finally:
+            connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] = False
+
+    def test_empty_range_and_bad_arguments(self):
+        self.assertEqual(
+            self.export(date_from="2001-01-01", date_to="2001-01-31").decode().strip(),
+            ",".join(export.COLUMNS),
+        )
+        for params in ({"file_format": "xlsx"}, {"compression": "brotli"}):
+            response = self.client.get(reverse("orders-export"), {**self.params, **params})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(APIClient().get(reverse("orders-export")).status_code, 401)
+
+    async def test_asgi_export_is_sent_batch_by_batch(self):
+        user = await sync_to_async(User.objects.get)(username="analyst")
+        headers = {"authorization": f"Bearer {AccessToken.for_user(user)}"}
+        with mock.patch.object(export, "FETCH_ROWS", 10):
+            response = await AsyncClient().get(
+                reverse("orders-export"), self.params, headers=headers
+            )
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 4)  # 40 orders, not one buffered body
+        self.assertEqual(b"".join(chunks), await sync_to_async(self.export)())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ANALYTICS_CACHE_BACKGROUND_REFRESH=False)
+class AsyncViewsTestCase(TransactionTestCase):
+    """
+    The pool has connections of its own, which only see committed rows.
+    """
+
+    params = {"date_from": "2000-01-01", "date_to": "2100-01-01"}
+
+    def setUp(self):
+        cache.clear()
+        call_command("seed", customers=10, products=5, orders=60, days=40, stdout=StringIO())
+        date_from, date_to = date(2000, 1, 1), date(2100, 1, 1)
+        self.expected = {
+            "async-kpis": fetch_kpis(date_from, date_to),
+            "async-customer-segments": fetch_rfm_segments(date_from, date_to),
+            "async-top-products": fetch_top_products(date_from, date_to, "revenue", 10),
+        }
+        self.expected_points = fetch_revenue_trends(date_from, date_to, "weekly")
+
+    async def get(self, name: str, **params) -> tuple[int, dict]:
+        response = await AsyncClient().get(reverse(name), {**self.params, **params})
+        data = json.loads(response.content)
+        self.cache_hits = data.pop("cache", {}).get("hit")
+        return response.status_code, data
+
+    async def test_async_views_answer_like_the_sync_ones(self):
+        try:
+            for name, expected in self.expected.items():
+                self.assertEqual(await self.get(name), (200, expected))
+                self.assertFalse(self.cache_hits)
+
+            status_code, trends = await self.get("async-revenue-trends", granularity="weekly")
+            self.assertEqual(trends["points"], self.expected_points)
+
+            status_code, overview = await self.get("async-overview", granularity="weekly")
+            for section in overview.values():
+                if isinstance(section, dict):
+                    section.pop("cache")
+            self.assertEqual(overview["kpis"], self.expected["async-kpis"])
+            self.assertEqual(overview["revenue_trends"]["points"], self.expected_points)
+            self.assertEqual(overview["top_products"], self.expected["async-top-products"])
+
+            status_code, error = await self.get("async-overview", metric="price")
+            self.assertEqual(status_code, 400)
+        finally:
+            await close_pool()
+
+    async def test_async_views_share_the_cache_of_the_sync_ones(self):
+        try:
+            response = await sync_to_async(self.client.get)(reverse("kpis"), self.params)
+            self.assertFalse(json.loads(response.content)["cache"]["hit"])
+            self.assertEqual(await self.get("async-kpis"), (200, self.expected["async-kpis"]))
+            self.assertTrue(self.cache_hits)
+        finally:
+            await close_pool()
+
+    def test_async_views_are_not_served_over_wsgi(self):
+        for _ in range(3):
+            response = self.client.get(reverse("async-kpis"), self.params)
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(async_queries.pool_stats(), [])
+
+    async def test_lifespan_opens_and_closes_the_pool(self):
+        messages = asyncio.Queue()
+        for event in ("startup", "shutdown"):
+            messages.put_nowait({"type": f"lifespan.{event}"})
+        sent = []
+
+        async def send(message):
+            sent.append((message["type"], len(async_queries.pool_stats())))
+
+        await asgi.application({"type": "lifespan"}, messages.get, send)
+        self.assertEqual(
+            sent, [("lifespan.startup.complete", 1), ("lifespan.shutdown.complete", 0)]
+        )
+
+
+@skipUnless(settings.DB_POOL, "DB_POOL is off")
+class ConnectionPoolTestCase(TestCase):
+    def test_closed_connections_go_back_to_the_pool(self):
+        wrapper = connections.create_connection("default")
+        wrapper.ensure_connection()
+        pool, raw = wrapper.connection_pool, wrapper.connection
+        available = pool_stats()[pool.name]["pool_available"]
+
+        wrapper.close()
+        self.assertFalse(raw.closed)
+        stats = pool_stats()[pool.name]
+        self.assertEqual(stats["pool_available"], available + 1)
+        self.assertGreater(stats["requests_num"], 0)
+        self.assertTrue(0 <= stats["saturation"] <= 1)
+
+    def test_forked_children_open_pools_of_their_own(self):
+        connection.ensure_connection()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(int(bool(postgresql_pool._pools) or connection.connection is not None))
+        self.assertEqual(os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]), 0)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1;")
+
+    @skipIf(settings.DB_PGBOUNCER, "no prepared statements behind pgbouncer")
+    @override_settings(ANALYTICS_USE_ROLLUPS=False)
+    def test_analytics_statements_are_prepared_once_per_connection(self):
+        def prepared() -> list[str]:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT statement FROM pg_prepared_statements;")
+                return [statement for (statement,) in cursor.fetchall()]
+
+        for day in range(1, 7):  # prepared past psycopg's default prepare_threshold (5)
+            self.assertEqual(len([sql for sql in prepared() if "fact_orders" in sql]), 0)
+            fetch_top_products(date(2026, 1, day), date(2026, 1, 31), "revenue", 10)
+        statements = prepared()
+        self.assertEqual(len([sql for sql in statements if "fact_orders" in sql]), 1)
+
+        fetch_top_products(date(2025, 6, 1), date(2025, 12, 31), "revenue", 5)
+        self.assertEqual(prepared(), statements)
+
+    def test_stats_endpoint(self):
+        connection.ensure_connection()
+        response = APIClient().get(reverse("db-pool-stats"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(connection.connection_pool.name, response.data["sync"])
+        self.assertEqual(response.data["async"], [])
+
+
+def section_list(overview: dict) -> list[dict]:
+    return [overview["kpis"], overview["revenue_trends"], overview["top_products"]]
+
+
+class HyperLogLogTestCase(SimpleTestCase):
+    def test_estimate_within_error_bound(self):
+        for n in (100, 5_000, 200_000):
+            sketch = hll.HyperLogLog()
+            for i in range(n):
+                sketch.add(i)
+            self.assertLessEqual(abs(sketch.count() - n), 3 * hll.STANDARD_ERROR * n + 1)
+
+    def test_merged_sketches_equal_sketch_of_union(self):
+        a, b, union = hll.HyperLogLog(), hll.HyperLogLog(), hll.HyperLogLog()
+        for i in range(30_000):
+            a.add(i)
+            union.add(i)
+        for i in range(20_000, 60_000):
+            b.add(i)
+            union.add(i)
+        merged = hll.merge_all([a.to_bytes(), b.to_bytes()])
+        self.assertTrue((merged.registers == union.registers).all())
+        self.assertEqual(merged.count(), union.count())
+
+
+def index_conditions(plan: dict) -> list[str]:
+    conditions = [plan["Index Cond"]] if "Index Cond" in plan else []
+    for child in plan.get("Plans", []):
+        conditions += index_conditions(child)
+    return conditions
+
+
+class DateRangePlanTestCase(TestCase):
+    """
+    EXPLAIN evidence: with sequential scans discouraged, the old created_at::date predicate
+    still cannot be answered from the created_at index, the half-open range can.
+    """
+
+    def setUp(self):
+        # on an empty table every index scan costs the same and the planner may pick any
+        call_command("seed", customers=200, products=50, orders=2000, days=365, stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE fact_orders, dim_customers, dim_products;")
+
+    def explain(self, sql, params=None) -> dict:
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            return cursor.fetchone()[0][0]["Plan"]
+
+    def test_cast_predicate_cannot_use_the_index(self):
+        plan = self.explain(
+            "SELECT COUNT(*) FROM fact_orders WHERE created_at::date BETWEEN %s AND %s",
+            [date(2026, 1, 1), date(2026, 1, 31)],
+        )
+        self.assertFalse(any("created_at" in cond for cond in index_conditions(plan)))
+
+    @override_settings(ANALYTICS_USE_ROLLUPS=False)
+    def test_analytics_queries_use_the_created_at_index(self):
+        date_from, date_to = date(2026, 1, 1), date(2026, 1, 31)
+        with CaptureQueriesContext(connection) as ctx:
+            fetch_kpis(date_from, date_to)
+            fetch_revenue_trends(date_from, date_to, "weekly")
+            fetch_rfm_segments(date_from, date_to)
+            fetch_top_products(date_from, date_to, "revenue", 10)
+
+        statements = [q["sql"] for q in ctx.captured_queries if "fact_orders" in q["sql"]]
+        self.assertEqual(len(statements), 4)
+        for sql in statements:
+            with self.subTest(sql=sql):
+                plan = self.explain(sql)
+                self.assertTrue(any("created_at" in cond for cond in index_conditions(plan)))
+
+
+class FactOrderPartitioningTestCase(TestCase):
+    def setUp(self):
+        call_command("seed", customers=5, products=5, orders=60, days=70, stdout=StringIO())
+        self.orders = FactOrder.objects.count()
+        call_command("partition_fact_orders", "--convert", "--ahead", "2", stdout=StringIO())
+        self.current = month_start(date.today())
+
+    def partition_of(self, order_id: str) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM fact_orders WHERE order_id = %s;", [order_id]
+            )
+            return cursor.fetchone()[0]
+
+    def copy_order(self, order: FactOrder, order_id: str, created_at) -> FactOrder:
+        return FactOrder(
+            order_id=order_id,
+            customer_id=order.customer_id,
+            product_id=order.product_id,
+            time_id=order.time_id,
+            order_amount=order.order_amount,
+            quantity=order.quantity,
+            discount_amount=order.discount_amount,
+            created_at=created_at,
+        )
+
+    def test_conversion_keeps_orders_and_creates_months_ahead(self):
+        self.assertTrue(is_partitioned())
+        self.assertEqual(FactOrder.objects.count(), self.orders)
+        months = list_partitions()
+        for offset in range(3):
+            self.assertIn(add_months(self.current, offset), months)
+
+        order = FactOrder.objects.order_by("-created_at").first()
+        self.assertEqual(self.partition_of(order.order_id), partition_name(order.created_at.date()))
+
+        created = self.copy_order(order, "ORD-NEW", order.created_at)
+        created.save()
+        self.assertGreater(created.order_key, order.order_key)
+
+    def test_order_id_stays_unique_across_partitions(self):
+        order = FactOrder.objects.order_by("created_at").first()
+        later = add_months(self.current, 1)
+        duplicate = self.copy_order(order, order.order_id, order.created_at.replace(day=1))
+        duplicate.created_at = duplicate.created_at.replace(year=later.year, month=later.month)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save()
+        with skip_loaded_orders():
+            FactOrder.objects.bulk_create([duplicate], ignore_conflicts=True)
+        self.assertEqual(FactOrder.objects.filter(order_id=order.order_id).count(), 1)
+
+        order.delete()
+        with skip_loaded_orders():
+            FactOrder.objects.bulk_create([duplicate], ignore_conflicts=True)
+        self.assertEqual(self.partition_of(order.order_id), partition_name(later))
+
+    def test_truncate_releases_order_ids(self):
+        order = FactOrder.objects.order_by("created_at").first()
+        with connection.cursor() as cursor:
+            cursor.execute("TRUNCATE fact_orders;")
+        self.copy_order(order, order.order_id, order.created_at).save()
+        self.assertEqual(FactOrder.objects.count(), 1)
+
+    def test_range_queries_are_pruned_to_their_month(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with override_settings(ANALYTICS_USE_ROLLUPS=False):
+                fetch_kpis(self.current, date.today())
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN " + ctx.captured_queries[0]["sql"])
+            plan = "\n".join(line for (line,) in cursor.fetchall())
+        self.assertIn(partition_name(self.current), plan)
+        self.assertNotIn(partition_name(add_months(self.current, -1)), plan)
+        self.assertNotIn("fact_orders_default", plan)
+
+    def test_new_partition_takes_its_rows_from_default(self):
+        order = FactOrder.objects.first()
+        far = add_months(self.current, 12)
+        FactOrder.objects.bulk_create(
+            [
+                self.copy_order(
+                    order,
+                    "ORD-FUTURE",
+                    order.created_at.replace(year=far.year, month=far.month, day=1),
+                )
+            ]
+        )
+        self.assertEqual(self.partition_of("ORD-FUTURE"), "fact_orders_default")
+
+        self.assertTrue(create_partition(far))
+        self.assertEqual(self.partition_of("ORD-FUTURE"), partition_name(far))
+        self.assertEqual(FactOrder.objects.filter(order_id="ORD-FUTURE").count(), 1)
+
+    def test_old_partitions_are_archived(self):
+        out = StringIO()
+        call_command(
+            "partition_fact_orders", "--detach-before", str(self.current), stdout=out
+        )
+        self.assertTrue(all(month >= self.current for month in list_partitions()))
+        self.assertFalse(FactOrder.objects.filter(created_at__date__lt=self.current).exists())
+        self.assertIn("Archived", out.getvalue())
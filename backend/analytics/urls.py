@@ -1,10 +1,21 @@
 from django.urls import path
+from analytics.async_views import (
+    AsyncCustomerSegmentsView,
+    AsyncKPIView,
+    AsyncOverviewView,
+    AsyncRevenueTrendsView,
+    AsyncTopProductsView,
+)
 from analytics.views import (
+    CacheStatsView,
+    DBPoolStatsView,
     KPIView,
     RevenueTrendsView,
     CustomerSegmentsView,
     TopProductsView,
+    OrdersExportView,
     OrdersListView,
+    OverviewView,
 )
 
 urlpatterns = [
@@ -13,4 +24,17 @@ urlpatterns = [
     path("customers/segments/", CustomerSegmentsView.as_view(), name="customer-segments"),
     path("products/top-sellers/", TopProductsView.as_view(), name="top-products"),
     path("orders/", OrdersListView.as_view(), name="orders"),
+    path("orders/export/", OrdersExportView.as_view(), name="orders-export"),
+    path("overview/", OverviewView.as_view(), name="overview"),
+    path("cache/stats/", CacheStatsView.as_view(), name="cache-stats"),
+    path("db/pool/stats/", DBPoolStatsView.as_view(), name="db-pool-stats"),
+    path("async/kpis/", AsyncKPIView.as_view(), name="async-kpis"),
+    path("async/revenue/trends/", AsyncRevenueTrendsView.as_view(), name="async-revenue-trends"),
+    path(
+        "async/customers/segments/",
+        AsyncCustomerSegmentsView.as_view(),
+        name="async-customer-segments",
+    ),
+    path("async/products/top-sellers/", AsyncTopProductsView.as_view(), name="async-top-products"),
+    path("async/overview/", AsyncOverviewView.as_view(), name="async-overview"),
 ]
@@ -1,19 +1,28 @@
-from datetime import date, datetime
-
-from django.core.cache import cache
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from analytics import async_queries, sections
+from analytics.cache import cache_stats, render_json, with_cache_meta
+from analytics.export import AsyncChunks, export_content_type, export_filename, export_orders
 from analytics.models import FactOrder
-from analytics.serializers import FactOrderSerializer
+from analytics.serializers import order_list_rows, serialize_order_rows
 from rest_framework.permissions import IsAuthenticated
-from analytics.queries import (
-    fetch_kpis,
-    fetch_revenue_trends,
-    fetch_rfm_segments,
-    fetch_top_products,
-)
+from analytics.queries import day_range
+from config.postgresql_pool.base import pool_stats
 
 
 def parse_date(value: str | None, fallback: date) -> date:
@@ -28,9 +37,34 @@ def parse_date(value: str | None, fallback: date) -> date:
         raise ValueError("Invalid date format. Use YYYY-MM-DD.") from e
 
 
+def parse_bool(value: str | None) -> bool:
+    return (value or "").lower() in ("1", "true", "yes")
+
+
+def cached_response(section: sections.Section) -> HttpResponse:
+    """
+    The section's cached JSON body is returned as is, with its cache metadata spliced in.
+    """
+    body, cache_meta = section.fetch()
+    return HttpResponse(with_cache_meta(body, cache_meta), content_type="application/json")
+
+
+def bundle_body(date_from: date, date_to: date, results: dict) -> bytes:
+    """
+    The /overview/ body: the cached section bodies (name -> (body, cache metadata)) spliced
+    into the bundle without parsing them.
+    """
+    body = render_json({"date_from": str(date_from), "date_to": str(date_to)})
+    for name, (section_body, cache_meta) in results.items():
+        field = render_json(name) + b":" + with_cache_meta(section_body, cache_meta)
+        body = body[:-1] + b"," + field + b"}"
+    return body
+
+
 class KPIView(APIView):
     """
-    GET /api/v1/kpis/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+    GET /api/v1/kpis/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&approx=true
+    approx=true estimates unique_customers with HyperLogLog (~0.81% standard error).
     """
     authentication_classes = []  # add JWT later
     permission_classes = []      # add auth later
@@ -49,21 +83,16 @@ class KPIView(APIView):
         if date_from > date_to:
             return Response({"error": "date_from must be <= date_to"}, status=status.HTTP_400_BAD_REQUEST)
 
-        cache_key = f"kpis:{date_from}:{date_to}"
-        cached = cache.get(cache_key)
-        if cached:
-            cached["cache"] = {"hit": True, "key": cache_key, "ttl_seconds": 300}
-            return Response(cached, status=status.HTTP_200_OK)
+        approx = parse_bool(request.GET.get("approx"))
 
-        data = fetch_kpis(date_from, date_to)
-        cache.set(cache_key, data, timeout=300)
-        data["cache"] = {"hit": False, "key": cache_key, "ttl_seconds": 300}
-        return Response(data, status=status.HTTP_200_OK)
+        return cached_response(sections.kpis(date_from, date_to, approx))
 
 
 class RevenueTrendsView(APIView):
     """
-    GET /api/v1/revenue/trends/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&granularity=daily|weekly|monthly
+    GET /api/v1/revenue/trends/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+        &granularity=daily|weekly|monthly&approx=true
+    approx=true estimates weekly / monthly unique_customers with HyperLogLog.
     """
     authentication_classes = []
     permission_classes = []
@@ -83,33 +112,27 @@ class RevenueTrendsView(APIView):
             return Response({"error": "date_from must be <= date_to"}, status=status.HTTP_400_BAD_REQUEST)
 
         granularity = (request.GET.get("granularity") or "daily").lower()
-
-        cache_key = f"revenue_trends:{granularity}:{date_from}:{date_to}"
-        cached = cache.get(cache_key)
-        if cached:
-            cached["cache"] = {"hit": True, "key": cache_key, "ttl_seconds": 300}
-            return Response(cached, status=status.HTTP_200_OK)
+        approx = parse_bool(request.GET.get("approx"))
 
         try:
-            points = fetch_revenue_trends(date_from, date_to, granularity)
+            return cached_response(
+                sections.revenue_trends(date_from, date_to, granularity, approx)
+            )
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        payload = {
-            "granularity": granularity,
-            "date_from": str(date_from),
-            "date_to": str(date_to),
-            "points": points,
-        }
-        cache.set(cache_key, payload, timeout=300)
-        payload["cache"] = {"hit": False, "key": cache_key, "ttl_seconds": 300}
-        return Response(payload, status=status.HTTP_200_OK)
-
 
 class CustomerSegmentsView(APIView):
     """
     GET /api/v1/customers/segments/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
     Returns aggregated RFM segments counts.
+
+    Only a range containing every order (e.g. 2000-01-01 to today) is scored from the
+    customer_rfm_state rollup; any narrower range, the default current month included,
+    aggregates its orders from fact_orders, so its cost grows with the orders in range.
+
+    Scores are quintiles in which tied customers share a score, so segment sizes differ from
+    the earlier NTILE(5) scoring, which split ties across scores to keep five equal groups.
     """
     authentication_classes = []
     permission_classes = []
@@ -128,16 +151,7 @@ class CustomerSegmentsView(APIView):
         if date_from > date_to:
             return Response({"error": "date_from must be <= date_to"}, status=status.HTTP_400_BAD_REQUEST)
 
-        cache_key = f"rfm_segments:{date_from}:{date_to}"
-        cached = cache.get(cache_key)
-        if cached:
-            cached["cache"] = {"hit": True, "key": cache_key, "ttl_seconds": 600}
-            return Response(cached, status=status.HTTP_200_OK)
-
-        data = fetch_rfm_segments(date_from, date_to)
-        cache.set(cache_key, data, timeout=600)
-        data["cache"] = {"hit": False, "key": cache_key, "ttl_seconds": 600}
-        return Response(data, status=status.HTTP_200_OK)
+        return cached_response(sections.rfm_segments(date_from, date_to))
 
 
 class TopProductsView(APIView):
@@ -169,31 +183,249 @@ class TopProductsView(APIView):
         except ValueError:
             return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-        cache_key = f"top_products:{metric}:{limit}:{date_from}:{date_to}"
-        cached = cache.get(cache_key)
-        if cached:
-            cached["cache"] = {"hit": True, "key": cache_key, "ttl_seconds": 300}
-            return Response(cached, status=status.HTTP_200_OK)
+        try:
+            return cached_response(sections.top_products(date_from, date_to, metric, limit))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class OverviewView(APIView):
+    """
+    GET /api/v1/overview/?date_from=...&date_to=...&granularity=daily&metric=revenue&limit=10
+    KPIs, revenue trends and top products in one response (approx=true as for /kpis/). Each
+    section is cached under the same key as its own endpoint; cached sections are read
+    together (one get_many) and only the missing ones are computed, concurrently.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        today = date.today()
+        date_from_default = today.replace(day=1)
+        date_to_default = today
 
         try:
-            data = fetch_top_products(date_from, date_to, metric, limit)
+            date_from = parse_date(request.GET.get("date_from"), date_from_default)
+            date_to = parse_date(request.GET.get("date_to"), date_to_default)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        cache.set(cache_key, data, timeout=300)
-        data["cache"] = {"hit": False, "key": cache_key, "ttl_seconds": 300}
-        return Response(data, status=status.HTTP_200_OK)
+        if date_from > date_to:
+            return Response(
+                {"error": "date_from must be <= date_to"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        granularity = (request.GET.get("granularity") or "daily").lower()
+        metric = (request.GET.get("metric") or "revenue").lower()
+        approx = parse_bool(request.GET.get("approx"))
+        try:
+            limit = int(request.GET.get("limit", "10"))
+        except ValueError:
+            return Response(
+                {"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bundle = {
+            "kpis": sections.kpis(date_from, date_to, approx),
+            "revenue_trends": sections.revenue_trends(date_from, date_to, granularity, approx),
+            "top_products": sections.top_products(date_from, date_to, metric, limit),
+        }
+        bundle_sections = list(bundle.values())
+        results = sections.fetch_cached(bundle_sections)
+        missing = [i for i, result in enumerate(results) if result is None]
+        try:
+            computed = self.compute([bundle_sections[i].fetch for i in missing])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for i, result in zip(missing, computed):
+            results[i] = result
+
+        body = bundle_body(date_from, date_to, dict(zip(bundle, results)))
+        return HttpResponse(body, content_type="application/json")
+
+    @staticmethod
+    def compute(fetches: list) -> list:
+        workers = min(settings.ANALYTICS_OVERVIEW_WORKERS, len(fetches))
+        if workers <= 1:
+            return [fetch() for fetch in fetches]
+
+        def fetch_in_thread(fetch):
+            try:
+                return fetch()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(fetch_in_thread, fetches))
+
+
+class CacheStatsView(APIView):
+    """
+    GET /api/v1/cache/stats/
+    Hit / miss / refresh counters of the analytics cache layer (analytics.cache).
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
+
+class DBPoolStatsView(APIView):
+    """
+    GET /api/v1/db/pool/stats/
+    Usage, saturation and wait times of the database connection pools of the serving
+    process: "sync" (config.postgresql_pool, by "alias:dbname") and "async" (the pools of
+    analytics.async_queries).
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response(
+            {"sync": pool_stats(), "async": async_queries.pool_stats()},
+            status=status.HTTP_200_OK,
+        )
 
 
 class OrdersPagination(PageNumberPagination):
+    """
+    Page numbers, with ?include_count=false skipping the COUNT(*) of the filtered orders:
+    one extra row is fetched to know whether there is a next page, and "count" is left out.
+    """
     page_size = 25
     page_size_query_param = "page_size"
     max_page_size = 200
 
+    def paginate_queryset(self, queryset, request, view=None):
+        self.include_count = parse_bool(request.query_params.get("include_count", "true"))
+        if self.include_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.number = 0
+        if self.number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=self.number, message=""))
+
+        offset = (self.number - 1) * page_size
+        rows = list(queryset[offset : offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.include_count:
+            return super().get_paginated_response(data)
+
+        url = self.request.build_absolute_uri()
+        next_url = previous_url = None
+        if self.has_next:
+            next_url = replace_query_param(url, self.page_query_param, self.number + 1)
+        if self.number == 2:
+            previous_url = remove_query_param(url, self.page_query_param)
+        elif self.number > 2:
+            previous_url = replace_query_param(url, self.page_query_param, self.number - 1)
+        return Response({"next": next_url, "previous": previous_url, "results": data})
+
+
+class OrdersCursorPagination(BasePagination):
+    """
+    Keyset pages on (created_at, order_key), newest first: each page is a range scan of
+    fact_orders_created_key_idx starting after the cursor, with neither COUNT(*) nor OFFSET.
+    Cursors are opaque (base64 of the boundary row's key and the direction).
+    """
+    page_size = 25
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, self.reverse = decode_cursor(request.query_params.get(self.cursor_query_param))
+        self.has_position = position is not None
+
+        if position is None:
+            queryset = queryset.order_by("-created_at", "-order_key")
+        elif self.reverse:
+            created_at, order_key = position
+            queryset = (
+                queryset.filter(created_at__gte=created_at)
+                .filter(Q(created_at__gt=created_at) | Q(order_key__gt=order_key))
+                .order_by("created_at", "order_key")
+            )
+        else:
+            created_at, order_key = position
+            queryset = (
+                queryset.filter(created_at__lte=created_at)
+                .filter(Q(created_at__lt=created_at) | Q(order_key__lt=order_key))
+                .order_by("-created_at", "-order_key")
+            )
+
+        rows = list(queryset[: page_size + 1])
+        self.has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if self.reverse:
+            rows.reverse()
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        has_next = self.has_position if self.reverse else self.has_more
+        has_previous = self.has_more if self.reverse else self.has_position
+        next_url = previous_url = None
+        if self.page and has_next:
+            next_url = self._link(self.page[-1], reverse=False)
+        if self.page and has_previous:
+            previous_url = self._link(self.page[0], reverse=True)
+        return Response({"next": next_url, "previous": previous_url, "results": data})
+
+    def get_page_size(self, request) -> int:
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def _link(self, order, reverse: bool) -> str:
+        cursor = encode_cursor(order.created_at, order.order_key, reverse)
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+
+def encode_cursor(created_at: datetime, order_key: int, reverse: bool) -> str:
+    raw = json.dumps([created_at.isoformat(), order_key, reverse], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> tuple[tuple[datetime, int] | None, bool]:
+    """
+    ((created_at, order_key), reverse) of a cursor; (None, False) for the first page.
+    """
+    if not cursor:
+        return None, False
+    try:
+        created_at, order_key, reverse = json.loads(base64.urlsafe_b64decode(cursor))
+        return (datetime.fromisoformat(created_at), int(order_key)), bool(reverse)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
 
 class OrdersListView(APIView):
     """
     GET /api/v1/orders/?page=1&page_size=25&date_from=...&date_to=...&customer_id=...
+    GET /api/v1/orders/?pagination=cursor&page_size=25&...  (then follow "next" / "previous")
+
+    Page numbers count the filtered orders unless include_count=false; cursor pages never
+    count and cost the same at any depth.
     """
     permission_classes = [IsAuthenticated]
 
@@ -212,18 +444,70 @@ class OrdersListView(APIView):
         if date_from > date_to:
             return Response({"error": "date_from must be <= date_to"}, status=status.HTTP_400_BAD_REQUEST)
 
-        qs = (
-            FactOrder.objects.select_related("customer", "product", "time")
-            .filter(created_at__date__gte=date_from, created_at__date__lte=date_to)
-            .order_by("-created_at")
+        # half-open range on the column itself so the created_at index can be used
+        start, end = (
+            timezone.make_aware(datetime.combine(day, time.min))
+            for day in day_range(date_from, date_to)
+        )
+        qs = FactOrder.objects.filter(created_at__gte=start, created_at__lt=end).order_by(
+            "-created_at", "-order_key"
         )
 
         customer_id = request.GET.get("customer_id")
         if customer_id:
             qs = qs.filter(customer__customer_id=customer_id)
 
-        paginator = OrdersPagination()
-        page = paginator.paginate_queryset(qs, request)
+        if request.GET.get("pagination") == "cursor" or request.GET.get("cursor"):
+            paginator = OrdersCursorPagination()
+        else:
+            paginator = OrdersPagination()
+        try:
+            page = paginator.paginate_queryset(order_list_rows(qs), request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return paginator.get_paginated_response(serialize_order_rows(page))
+
+
+class OrdersExportView(APIView):
+    """
+    GET /api/v1/orders/export/?date_from=...&date_to=...&file_format=csv|ndjson|parquet
+        &compression=gzip|zstd&customer_id=...
+    Streams every order of the range with its customer and product (analytics.export).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        date_from, date_to = sections.default_range()
+        try:
+            date_from = parse_date(request.GET.get("date_from"), date_from)
+            date_to = parse_date(request.GET.get("date_to"), date_to)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = FactOrderSerializer(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        if date_from > date_to:
+            return Response(
+                {"error": "date_from must be <= date_to"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file_format = request.GET.get("file_format", "csv")
+        compression = request.GET.get("compression") or None
+        start, end = (
+            timezone.make_aware(datetime.combine(day, time.min))
+            for day in day_range(date_from, date_to)
+        )
+        try:
+            chunks = export_orders(
+                start, end, file_format, compression, request.GET.get("customer_id") or None
+            )
+        except (ValueError, ImportError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if isinstance(request._request, ASGIRequest):
+            chunks = AsyncChunks(chunks)
+        response = StreamingHttpResponse(
+            chunks, content_type=export_content_type(file_format, compression)
+        )
+        filename = export_filename(f"orders_{date_from}_{date_to}", file_format, compression)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -13,4 +13,30 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from analytics.async_queries import close_pool, get_pool  # noqa: E402 (needs the app registry)
+
+
+async def application(scope, receive, send):
+    """
+    Django, plus the ASGI lifespan events Django 4.2 does not handle: the async pool of the
+    analytics views (analytics.async_queries) is opened at startup and closed at shutdown,
+    on the server's event loop.
+    """
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await get_pool()
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,126 @@
+"""
+PostgreSQL backend (psycopg 3) taking its connections from a psycopg_pool.ConnectionPool.
+
+Django 4.2 has no connection pooling, so with CONN_MAX_AGE every thread keeps (and, past
+the age, re-opens) a connection of its own, and every Celery task opens a new one. Here
+closing a connection returns it to a pool of the process (after a rollback if needed) and
+opening one takes an idle connection from it; both gunicorn / uvicorn workers and Celery
+workers hold at most OPTIONS["pool"]["max_size"] connections each. Requests past that wait
+up to OPTIONS["pool"]["timeout"] seconds. A pgbouncer in front of PostgreSQL is what
+shares connections between processes (settings.DB_PGBOUNCER).
+
+Pool options follow Django 5.1's OPTIONS["pool"] (a dict of ConnectionPool arguments).
+pool_stats() reports the usage, saturation and wait times of every pool of the process.
+A forked child (Celery prefork, gunicorn --preload) starts without pools and opens its own.
+"""
+
+import os
+import threading
+
+from django.db import connections
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseDatabaseCreation
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+DEFAULT_POOL_OPTIONS = {"min_size": 2, "max_size": 10, "timeout": 10.0}
+
+_pools = {}  # (alias, dbname) -> ConnectionPool
+_pools_lock = threading.Lock()
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # a database with (idle) connections cannot be dropped
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    connection_pool = None  # the pool self.connection was taken from
+
+    def get_new_connection(self, conn_params):
+        if self.settings_dict["NAME"] is None:
+            # connections to the "postgres" database (creating / dropping test databases)
+            self.connection_pool = None
+            return super().get_new_connection(conn_params)
+
+        self.connection_pool = self.pool(conn_params)
+        connection = self.connection_pool.getconn()
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        self.isolation_level = IsolationLevel(isolation_level or IsolationLevel.READ_COMMITTED)
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.connection_pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.connection_pool.putconn(self.connection)
+
+    def pool(self, conn_params: dict) -> ConnectionPool:
+        key = self.alias, self.settings_dict["NAME"]
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    options = {
+                        **DEFAULT_POOL_OPTIONS,
+                        **self.settings_dict["OPTIONS"].get("pool", {}),
+                    }
+                    pool = ConnectionPool(
+                        kwargs=conn_params, name=":".join(key), open=True, **options
+                    )
+                    _pools[key] = pool
+        return pool
+
+
+def pool_stats() -> dict:
+    """
+    "alias:dbname" -> pool_counters() of every pool of the process.
+    """
+    return {pool.name: pool_counters(pool) for pool in list(_pools.values())}
+
+
+def pool_counters(pool) -> dict:
+    """
+    psycopg_pool counters (pool_size, pool_available, requests_waiting, requests_wait_ms,
+    ...) plus "saturation": the share of pool_max connections in use.
+    """
+    counters = pool.get_stats()
+    in_use = counters.get("pool_size", 0) - counters.get("pool_available", 0)
+    counters["saturation"] = round(in_use / counters["pool_max"], 3)
+    return counters
+
+
+def close_pools(dbname: str | None = None) -> None:
+    with _pools_lock:
+        for key in [key for key in _pools if dbname is None or key[1] == dbname]:
+            _pools.pop(key).close()
+
+
+def _forget_pools() -> None:
+    """
+    In a forked child: the inherited pools' connections share their sockets with the parent
+    and their worker threads did not survive the fork. Drop them without closing anything
+    (psycopg only closes connections in the process that opened them).
+    """
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+    for wrapper in connections.all(initialized_only=True):
+        if wrapper.connection_pool is not None:
+            wrapper.connection = None
+            wrapper.connection_pool = None
+
+
+os.register_at_fork(after_in_child=_forget_pools)
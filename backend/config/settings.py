@@ -21,7 +21,11 @@ CELERY_BEAT_SCHEDULE = {
     "load-csv-orders-every-5-min": {
         "task": "etl.tasks.load_csv_orders_task",
         "schedule": crontab(minute="*/5"),
-    }
+    },
+    "extend-calendar-daily": {
+        "task": "analytics.tasks.extend_calendar_task",
+        "schedule": crontab(hour=0, minute=30),
+    },
 }
 
 
@@ -97,12 +101,33 @@ REST_FRAMEWORK = {
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_POOL: connections come from a pool per process (config.postgresql_pool) and are
+# returned to it at the end of each request / task, instead of being kept per thread.
+# DB_PGBOUNCER: a pgbouncer in transaction mode sits in front of PostgreSQL, which rules
+# out prepared statements and server-side cursors outside transactions (QuerySet.iterator()
+# in autocommit); the orders export declares its own inside one.
+DB_POOL = os.getenv("DB_POOL", "1") == "1"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+
 DATABASES = {
     "default": dj_database_url.config(
         default=os.getenv("DATABASE_URL"),
-        conn_max_age=60,
+        conn_max_age=0 if DB_POOL else 60,
     )
 }
+if DATABASES["default"].get("ENGINE") == "django.db.backends.postgresql":
+    DATABASES["default"].setdefault("OPTIONS", {})
+    if DB_POOL:
+        DATABASES["default"]["ENGINE"] = "config.postgresql_pool"
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+    # Django disables prepared statements; psycopg's own default prepares a statement once
+    # a connection has run it 5 times (server-side binding cursors, analytics.queries)
+    DATABASES["default"]["OPTIONS"]["prepare_threshold"] = None if DB_PGBOUNCER else 5
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = DB_PGBOUNCER
 
 CACHES = {
     "default": {
@@ -115,6 +140,32 @@ CACHES = {
     }
 }
 
+# Answer KPI / trend / top-product queries from the daily rollup tables (analytics.rollups)
+ANALYTICS_USE_ROLLUPS = os.getenv("ANALYTICS_USE_ROLLUPS", "1") == "1"
+
+# analytics.cache: how long expired entries are still served while they are refreshed, the
+# XFetch early-refresh factor, and whether refreshes run in a background thread
+ANALYTICS_CACHE_STALE_SECONDS = int(os.getenv("ANALYTICS_CACHE_STALE_SECONDS", "300"))
+ANALYTICS_CACHE_XFETCH_BETA = float(os.getenv("ANALYTICS_CACHE_XFETCH_BETA", "1.0"))
+ANALYTICS_CACHE_BACKGROUND_REFRESH = os.getenv("ANALYTICS_CACHE_BACKGROUND_REFRESH", "1") == "1"
+# Cached JSON bodies from this size on are stored zlib-compressed
+ANALYTICS_CACHE_COMPRESS_MIN_BYTES = int(os.getenv("ANALYTICS_CACHE_COMPRESS_MIN_BYTES", "1024"))
+# TTL of ranges that end before today; loads invalidate them through month versions
+ANALYTICS_CACHE_HISTORICAL_TTL = int(os.getenv("ANALYTICS_CACHE_HISTORICAL_TTL", "86400"))
+# Seconds each process batches its cache counters before adding them to the shared ones
+ANALYTICS_CACHE_STATS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_CACHE_STATS_FLUSH_SECONDS", "5"))
+
+# Per-process L1 in front of the shared cache (analytics.local_cache); 0 disables it
+ANALYTICS_L1_TTL_SECONDS = float(os.getenv("ANALYTICS_L1_TTL_SECONDS", "0"))
+ANALYTICS_L1_MAX_BYTES = int(os.getenv("ANALYTICS_L1_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# psycopg 3 connection pool of the async views (analytics.async_queries), per process
+ANALYTICS_ASYNC_POOL_MIN_SIZE = int(os.getenv("ANALYTICS_ASYNC_POOL_MIN_SIZE", "2"))
+ANALYTICS_ASYNC_POOL_MAX_SIZE = int(os.getenv("ANALYTICS_ASYNC_POOL_MAX_SIZE", "10"))
+
+# Threads computing the uncached sections of /api/v1/overview/ (1 = on the request thread)
+ANALYTICS_OVERVIEW_WORKERS = int(os.getenv("ANALYTICS_OVERVIEW_WORKERS", "3"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import ETLRun
+from .models import ETLFileManifest, ETLRun, ETLSourceState
 
 admin.site.register(ETLRun)
+admin.site.register(ETLSourceState)
+admin.site.register(ETLFileManifest)
@@ -0,0 +1,268 @@
+"""
+Set-based loading of order batches into the warehouse.
+
+Each batch resolves its dimensions once (one SELECT + bulk insert/update per dimension),
+maps business ids to surrogate keys in memory and inserts facts with a single
+bulk_create(ignore_conflicts=True).
+
+With a DimensionCaches (etl.jobs.dim_cache), dimension rows already seen by the job are
+resolved and compared from memory; only unseen business ids are SELECTed.
+
+load_orders_frame loads a whole frame in one transaction without deadlocking against
+loaders running concurrently (see etl.tasks.plan_csv_orders_task): its dimensions are
+upserted in a single pass, rows inserted and locked in business/primary key order, and its
+facts are inserted in order_id order, so every transaction takes its locks in the same
+global order. Dimension rows are locked FOR NO KEY UPDATE, which does not block the
+foreign key checks of other loaders' fact inserts.
+"""
+
+from datetime import date
+
+import pandas as pd
+
+from analytics.dim_time import time_keys_for
+from analytics.models import DimCustomer, DimProduct, FactOrder
+from analytics.partitions import skip_loaded_orders
+from etl.jobs.dim_cache import DimensionCaches, DimensionKeyCache
+from etl.jobs.transform import cents_to_decimal
+
+CUSTOMER_ATTRS = ["email", "country", "city"]
+PRODUCT_ATTRS = {"product_name": "name", "category": "category", "price": "price"}
+
+
+def _present(value) -> bool:
+    """
+    Mirrors the row loader: only non-empty values overwrite dimension attributes.
+    """
+    if value is None:
+        return False
+    if isinstance(value, float) and pd.isna(value):
+        return False
+    return bool(value)
+
+
+def _latest_values(batch: pd.DataFrame, key: str, columns: list[str]) -> dict[str, dict]:
+    """
+    For every business id, returns the last non-empty value of each column in batch order
+    (falling back to the first row's value), i.e. what the row loader ends up writing.
+    """
+    latest = {}
+    for record in batch[[key] + columns].to_dict(orient="records"):
+        current = latest.setdefault(record[key], {c: record[c] for c in columns})
+        for column in columns:
+            if _present(record[column]):
+                current[column] = record[column]
+    return latest
+
+
+def _clean(value):
+    return value if _present(value) else None
+
+
+def _cached(cache: DimensionKeyCache | None, business_ids) -> dict:
+    if cache is None:
+        return {}
+    found = {}
+    for business_id in business_ids:
+        value = cache.get(business_id)
+        if value is not None:
+            found[business_id] = value
+    return found
+
+
+def _lock_in_order(model, objs: list) -> None:
+    """
+    Row-locks objs in primary key order before a bulk_update touches them.
+    """
+    pks = sorted(obj.pk for obj in objs)
+    list(
+        model.objects.select_for_update(no_key=True)
+        .filter(pk__in=pks)
+        .order_by("pk")
+        .values_list("pk")
+    )
+
+
+def resolve_time_keys(
+    batch: pd.DataFrame, cache: DimensionKeyCache | None = None
+) -> dict[date, int]:
+    """
+    Returns a date -> time_key map for the batch's order dates. Dates are normally in the
+    pre-generated calendar (and the cache); missing ones are generated on the spot.
+    """
+    dates = sorted(set(batch["order_date"]))
+    keys = _cached(cache, dates)
+    missing = [d for d in dates if d not in keys]
+    if missing:
+        keys.update(time_keys_for(missing))
+        if cache is not None:
+            cache.update(keys.items())
+    return keys
+
+
+def upsert_customers(batch: pd.DataFrame, cache: DimensionKeyCache | None = None) -> dict[str, int]:
+    """
+    Inserts new customers, updates changed attributes of existing ones and returns a
+    customer_id -> customer_key map for the batch.
+    """
+    latest = _latest_values(batch, "customer_id", CUSTOMER_ATTRS)
+    first_seen = batch.groupby("customer_id", sort=False)["created_at"].first()
+    existing = _cached(cache, latest)
+    uncached = [customer_id for customer_id in latest if customer_id not in existing]
+    if uncached:
+        existing.update(
+            (c.customer_id, c) for c in DimCustomer.objects.filter(customer_id__in=uncached)
+        )
+
+    to_create, to_update = [], []
+    for customer_id, values in sorted(latest.items()):
+        customer = existing.get(customer_id)
+        if customer is None:
+            to_create.append(
+                DimCustomer(
+                    customer_id=customer_id,
+                    email=_clean(values["email"]),
+                    country=_clean(values["country"]),
+                    city=_clean(values["city"]),
+                    created_at=first_seen[customer_id].to_pydatetime(),
+                )
+            )
+            continue
+
+        updated = False
+        for field in CUSTOMER_ATTRS:
+            val = values[field]
+            if _present(val) and getattr(customer, field) != val:
+                setattr(customer, field, val)
+                updated = True
+        if updated:
+            to_update.append(customer)
+
+    if to_update:
+        _lock_in_order(DimCustomer, to_update)
+        DimCustomer.objects.bulk_update(to_update, CUSTOMER_ATTRS)
+
+    if to_create:
+        DimCustomer.objects.bulk_create(to_create, ignore_conflicts=True)
+        existing.update(
+            (c.customer_id, c)
+            for c in DimCustomer.objects.filter(customer_id__in=[c.customer_id for c in to_create])
+        )
+    if cache is not None:
+        cache.update(existing.items())
+    return {customer_id: c.customer_key for customer_id, c in existing.items()}
+
+
+def upsert_products(batch: pd.DataFrame, cache: DimensionKeyCache | None = None) -> dict[str, int]:
+    """
+    Inserts new products, updates changed name/category/price of existing ones and returns a
+    product_id -> product_key map for the batch.
+    """
+    latest = _latest_values(batch, "product_id", ["product_name", "category", "price_cents"])
+    for values in latest.values():
+        values["price"] = cents_to_decimal(values.pop("price_cents"))
+    existing = _cached(cache, latest)
+    uncached = [product_id for product_id in latest if product_id not in existing]
+    if uncached:
+        existing.update(
+            (p.product_id, p) for p in DimProduct.objects.filter(product_id__in=uncached)
+        )
+
+    to_create, to_update = [], []
+    for product_id, values in sorted(latest.items()):
+        product = existing.get(product_id)
+        if product is None:
+            to_create.append(
+                DimProduct(
+                    product_id=product_id,
+                    name=_clean(values["product_name"]),
+                    category=_clean(values["category"]),
+                    price=values["price"],
+                )
+            )
+            continue
+
+        updated = False
+        for column, field in PRODUCT_ATTRS.items():
+            val = values[column]
+            if _present(val) and getattr(product, field) != val:
+                setattr(product, field, val)
+                updated = True
+        if updated:
+            to_update.append(product)
+
+    if to_update:
+        _lock_in_order(DimProduct, to_update)
+        DimProduct.objects.bulk_update(to_update, list(PRODUCT_ATTRS.values()))
+
+    if to_create:
+        DimProduct.objects.bulk_create(to_create, ignore_conflicts=True)
+        existing.update(
+            (p.product_id, p)
+            for p in DimProduct.objects.filter(product_id__in=[p.product_id for p in to_create])
+        )
+    if cache is not None:
+        cache.update(existing.items())
+    return {product_id: p.product_key for product_id, p in existing.items()}
+
+
+def insert_facts(
+    batch: pd.DataFrame,
+    customer_keys: dict[str, int],
+    product_keys: dict[str, int],
+    time_keys: dict[date, int],
+) -> int:
+    """
+    Inserts orders that are not in the warehouse yet and returns how many were new.
+    """
+    batch = batch.drop_duplicates(subset=["order_id"], keep="first").sort_values("order_id")
+    order_ids = batch["order_id"].tolist()
+    known = set(FactOrder.objects.filter(order_id__in=order_ids).values_list("order_id", flat=True))
+    batch = batch[~batch["order_id"].isin(known)]
+
+    batch = batch.assign(
+        customer_key=batch["customer_id"].map(customer_keys),
+        product_key=batch["product_id"].map(product_keys),
+        time_key=batch["order_date"].map(time_keys),
+    )
+
+    facts = [
+        FactOrder(
+            order_id=row.order_id,
+            customer_id=row.customer_key,
+            product_id=row.product_key,
+            time_id=row.time_key,
+            order_amount=cents_to_decimal(row.net_cents),
+            quantity=row.quantity,
+            discount_amount=cents_to_decimal(row.discount_cents),
+            created_at=row.created_at.to_pydatetime(),
+        )
+        for row in batch.itertuples(index=False)
+    ]
+
+    with skip_loaded_orders():
+        FactOrder.objects.bulk_create(facts, ignore_conflicts=True)
+    return len(facts)
+
+
+def load_orders_frame(
+    frame: pd.DataFrame, batch_size: int | None = None, caches: DimensionCaches | None = None
+) -> int:
+    """
+    Loads a cleaned frame (see clean_orders_frame) and returns the number of new orders:
+    its dimensions in one pass, then its facts in order_id order, batch_size per INSERT.
+    """
+    if frame.empty:
+        return 0
+
+    caches = caches or DimensionCaches()
+    time_keys = resolve_time_keys(frame, caches.dates)
+    customer_keys = upsert_customers(frame, caches.customers)
+    product_keys = upsert_products(frame, caches.products)
+
+    facts = frame.drop_duplicates(subset=["order_id"], keep="first").sort_values("order_id")
+    batch_size = batch_size or len(facts)
+    return sum(
+        insert_facts(facts.iloc[start : start + batch_size], customer_keys, product_keys, time_keys)
+        for start in range(0, len(facts), batch_size)
+    )
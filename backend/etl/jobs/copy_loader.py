@@ -0,0 +1,177 @@
+"""
+COPY-based loading: the CSV is streamed into an UNLOGGED staging table with
+COPY FROM STDIN and merged into the warehouse with set-based INSERT ... ON CONFLICT.
+
+The merge reproduces the pandas cleaning rules (see transform.clean_orders_frame) with the
+etl_try_* SQL helpers, so it produces the same rows as the row and bulk engines.
+"""
+
+from django.db import connection
+
+from analytics.dim_time import add_calendar_days
+from analytics.partitions import skip_loaded_orders
+from analytics.rollups import refresh_daily_rollups
+from etl.jobs.readers import open_data_rows
+
+COPY_BUFFER_BYTES = 1024 * 1024
+
+CLEAN_SQL = """
+    CREATE UNLOGGED TABLE {clean} AS
+    SELECT *
+    FROM (
+        SELECT
+            seq,
+            NULLIF(order_id, '') AS order_id,
+            NULLIF(customer_id, '') AS customer_id,
+            NULLIF(email, '') AS email,
+            NULLIF(country, '') AS country,
+            NULLIF(city, '') AS city,
+            NULLIF(product_id, '') AS product_id,
+            NULLIF(product_name, '') AS product_name,
+            NULLIF(category, '') AS category,
+            COALESCE(etl_round_cents(etl_try_numeric(price)), 0) AS price,
+            COALESCE(TRUNC(etl_try_numeric(quantity))::int, 1) AS quantity,
+            COALESCE(etl_round_cents(etl_try_numeric(discount_amount)), 0) AS discount_amount,
+            etl_try_timestamptz(created_at) AS created_at
+        FROM {stage}
+    ) typed
+    WHERE order_id IS NOT NULL
+      AND customer_id IS NOT NULL
+      AND product_id IS NOT NULL
+      AND created_at IS NOT NULL;
+"""
+
+DAYS_SQL = """
+    SELECT COALESCE(ARRAY_AGG(DISTINCT created_at::date), '{{}}') FROM {clean};
+"""
+
+MERGE_CUSTOMERS_SQL = """
+    INSERT INTO dim_customers (
+        customer_id, email, country, city, created_at, valid_from, is_current
+    )
+    SELECT
+        customer_id,
+        (ARRAY_AGG(email ORDER BY seq DESC) FILTER (WHERE email IS NOT NULL))[1],
+        (ARRAY_AGG(country ORDER BY seq DESC) FILTER (WHERE country IS NOT NULL))[1],
+        (ARRAY_AGG(city ORDER BY seq DESC) FILTER (WHERE city IS NOT NULL))[1],
+        (ARRAY_AGG(created_at ORDER BY seq))[1],
+        NOW(),
+        TRUE
+    FROM {clean}
+    GROUP BY customer_id
+    ORDER BY customer_id
+    ON CONFLICT (customer_id) DO UPDATE SET
+        email = COALESCE(EXCLUDED.email, dim_customers.email),
+        country = COALESCE(EXCLUDED.country, dim_customers.country),
+        city = COALESCE(EXCLUDED.city, dim_customers.city)
+    WHERE (dim_customers.email, dim_customers.country, dim_customers.city)
+        IS DISTINCT FROM (
+            COALESCE(EXCLUDED.email, dim_customers.email),
+            COALESCE(EXCLUDED.country, dim_customers.country),
+            COALESCE(EXCLUDED.city, dim_customers.city)
+        );
+"""
+
+MERGE_PRODUCTS_SQL = """
+    INSERT INTO dim_products (product_id, name, category, price)
+    SELECT
+        product_id,
+        (ARRAY_AGG(product_name ORDER BY seq DESC) FILTER (WHERE product_name IS NOT NULL))[1],
+        (ARRAY_AGG(category ORDER BY seq DESC) FILTER (WHERE category IS NOT NULL))[1],
+        COALESCE(
+            (ARRAY_AGG(price ORDER BY seq DESC) FILTER (WHERE price <> 0))[1],
+            (ARRAY_AGG(price ORDER BY seq))[1]
+        )
+    FROM {clean}
+    GROUP BY product_id
+    ORDER BY product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        name = COALESCE(EXCLUDED.name, dim_products.name),
+        category = COALESCE(EXCLUDED.category, dim_products.category),
+        price = CASE WHEN EXCLUDED.price <> 0 THEN EXCLUDED.price ELSE dim_products.price END
+    WHERE (dim_products.name, dim_products.category, dim_products.price)
+        IS DISTINCT FROM (
+            COALESCE(EXCLUDED.name, dim_products.name),
+            COALESCE(EXCLUDED.category, dim_products.category),
+            CASE WHEN EXCLUDED.price <> 0 THEN EXCLUDED.price ELSE dim_products.price END
+        );
+"""
+
+MERGE_FACTS_SQL = """
+    INSERT INTO fact_orders (
+        order_id, customer_key, product_key, time_key,
+        order_amount, quantity, discount_amount, created_at, ingested_at
+    )
+    SELECT
+        o.order_id,
+        c.customer_key,
+        p.product_key,
+        t.time_key,
+        GREATEST(o.price * o.quantity - o.discount_amount, 0),
+        o.quantity,
+        o.discount_amount,
+        o.created_at,
+        NOW()
+    FROM (
+        SELECT DISTINCT ON (order_id) *
+        FROM {clean}
+        ORDER BY order_id, seq
+    ) o
+    JOIN dim_customers c ON c.customer_id = o.customer_id
+    JOIN dim_products p ON p.product_id = o.product_id
+    JOIN dim_time t ON t.date = o.created_at::date
+    ORDER BY o.order_id
+    ON CONFLICT DO NOTHING;
+"""
+
+
+def copy_from_stream(cursor, sql: str, stream) -> None:
+    """
+    COPY ... FROM STDIN fed from a binary stream, with psycopg 3 or psycopg2.
+    """
+    if hasattr(cursor, "copy_expert"):  # psycopg2
+        cursor.copy_expert(sql, stream)
+        return
+    with cursor.copy(sql) as copy:
+        while data := stream.read(COPY_BUFFER_BYTES):
+            copy.write(data)
+
+
+def load_csv_with_copy(
+    csv_path: str, run_id: int, byte_range: tuple[int, int] | None = None
+) -> tuple[int, int]:
+    """
+    Stages the CSV (or byte_range of it) with COPY, merges it into dims + fact and
+    refreshes the daily rollups of the days it touched.
+    Must run inside a transaction; returns (rows_extracted, rows_loaded).
+    """
+    qn = connection.ops.quote_name
+    stage = qn(f"etl_stage_orders_{run_id}")
+    clean = qn(f"etl_stage_orders_{run_id}_clean")
+
+    with connection.cursor() as cursor, open_data_rows(csv_path, byte_range) as (header, stream):
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {stage} (seq BIGSERIAL, "
+            + ", ".join(f"{qn(c)} TEXT" for c in header)
+            + ");"
+        )
+        columns = ", ".join(qn(c) for c in header)
+        copy_from_stream(cursor, f"COPY {stage} ({columns}) FROM STDIN WITH (FORMAT csv)", stream)
+        rows_extracted = cursor.rowcount
+
+        cursor.execute(CLEAN_SQL.format(stage=stage, clean=clean))
+        cursor.execute(DAYS_SQL.format(clean=clean))
+        days = cursor.fetchone()[0]
+        add_calendar_days(days)
+        cursor.execute(MERGE_CUSTOMERS_SQL.format(clean=clean))
+        cursor.execute(MERGE_PRODUCTS_SQL.format(clean=clean))
+        with skip_loaded_orders():
+            cursor.execute(MERGE_FACTS_SQL.format(clean=clean))
+            rows_loaded = cursor.rowcount
+
+        if rows_loaded:
+            refresh_daily_rollups(days)
+
+        cursor.execute(f"DROP TABLE {clean}, {stage};")
+
+    return rows_extracted, rows_loaded
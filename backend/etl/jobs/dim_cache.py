@@ -0,0 +1,99 @@
+"""
+In-process caches of dimension rows for one ETL job.
+
+Business ids map to the dimension row last written by this job (surrogate key plus the
+attribute values), so repeated customers, products and dates resolve without a query and
+attribute changes are detected without a SELECT. Each cache is an LRU bounded to max_size
+entries and can be warmed with the rows of the ids a chunk is about to load (warm_for).
+
+The caches only see this job's writes. A concurrent loader changing the same row is not
+noticed; as before, the last writer of an attribute wins.
+"""
+
+import os
+from collections import OrderedDict
+
+from analytics.models import DimCustomer, DimProduct, DimTime
+
+DEFAULT_MAX_SIZE = int(os.getenv("ETL_DIM_CACHE_SIZE", "100000"))
+
+
+class DimensionKeyCache:
+    """
+    LRU map of business id -> cached value (a model instance, or a time_key for dates).
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, business_id) -> bool:
+        return business_id in self._entries
+
+    def get(self, business_id):
+        value = self._entries.get(business_id)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(business_id)
+        return value
+
+    def put(self, business_id, value) -> None:
+        self._entries[business_id] = value
+        self._entries.move_to_end(business_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def update(self, items) -> None:
+        for business_id, value in items:
+            self.put(business_id, value)
+
+
+class DimensionCaches:
+    """
+    The customer, product and date caches of one job.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.customers = DimensionKeyCache(max_size)
+        self.products = DimensionKeyCache(max_size)
+        self.dates = DimensionKeyCache(max_size)
+
+    def warm_for(self, frame) -> "DimensionCaches":
+        """
+        Loads the dimension rows of the frame's customer_id, product_id and order_date
+        values that are not cached yet, one query per dimension: the row engine then
+        resolves every order of the chunk from memory. Unknown ids stay uncached.
+        """
+        customer_ids = [c for c in set(frame["customer_id"]) if c not in self.customers]
+        if customer_ids:
+            self.customers.update(
+                (c.customer_id, c)
+                for c in DimCustomer.objects.only(
+                    "customer_key", "customer_id", "email", "country", "city"
+                ).filter(customer_id__in=customer_ids)
+            )
+
+        product_ids = [p for p in set(frame["product_id"]) if p not in self.products]
+        if product_ids:
+            self.products.update(
+                (p.product_id, p)
+                for p in DimProduct.objects.only(
+                    "product_key", "product_id", "name", "category", "price"
+                ).filter(product_id__in=product_ids)
+            )
+
+        dates = [d for d in set(frame["order_date"]) if d not in self.dates]
+        if dates:
+            self.dates.update(
+                DimTime.objects.filter(date__in=dates).values_list("date", "time_key")
+            )
+        return self
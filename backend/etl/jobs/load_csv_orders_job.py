@@ -1,66 +1,242 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from decimal import Decimal
 
 import pandas as pd
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils import timezone
 
-from analytics.models import DimCustomer, DimProduct, DimTime, FactOrder
-from etl.models import ETLRun
+from analytics.dim_time import time_keys_for
+from analytics.models import DimCustomer, DimProduct, FactOrder
+from analytics.rollups import refresh_daily_rollups
+from etl.jobs.bulk_loader import load_orders_frame
+from etl.jobs.copy_loader import load_csv_with_copy
+from etl.jobs.dim_cache import DimensionCaches
+from etl.jobs.manifest import claim_file, resolve_source_files
+from etl.jobs.partitioning import finalize_partitioned_run
+from etl.jobs.readers import detect_format, iter_order_frames
+from etl.jobs.transform import cents_to_decimal, clean_orders_frame
+from etl.jobs.watermark import commit_increment, plan_increment
+from etl.models import ETLFileManifest, ETLRun
 
+ENGINES = ("row", "bulk", "copy")
+# the row engine upserts dimensions one order at a time in file order, so concurrent row
+# loads of overlapping customers / products can deadlock
+CONCURRENT_ENGINES = ("bulk", "copy")
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_FILE_WORKERS = 4
 
-def to_decimal(x) -> Decimal:
-    try:
-        return Decimal(str(x)).quantize(Decimal("0.01"))
-    except Exception:
-        return Decimal("0.00")
 
+def run_load_csv_orders(
+    csv_path: str,
+    source: str = "csv",
+    job_name: str = "load_csv_orders",
+    engine: str = "row",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    chunk_size: int | None = None,
+    incremental: bool = False,
+    byte_range: tuple[int, int] | None = None,
+    parent: ETLRun | None = None,
+) -> ETLRun:
+    """
+    Loads an orders file into the warehouse and records the run in ETLRun.
+    The input format (CSV, Parquet or Arrow IPC) is detected from the extension; columnar
+    files are loaded whole (no incremental / byte_range) by the row or bulk engine.
+    engine: row (one order at a time) | bulk (set-based, dimensions once per chunk and
+            batch_size orders per round trip) | copy (PostgreSQL COPY into a staging table
+            + SQL merge). byte_range loads run concurrently and need bulk or copy.
+    chunk_size: stream the file chunk_size rows at a time; each chunk is committed on its own
+                and the run counters are updated as it goes (row/bulk engines, COPY already
+                streams).
+    incremental: only load complete lines appended since the last incremental run of this
+                 file (see etl.jobs.watermark).
+    byte_range: only load the lines in this (start, end) byte range, as planned by
+                etl.jobs.partitioning for parallel loads; parent is the run it belongs to.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of: {', '.join(ENGINES)}")
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    if incremental and byte_range is not None:
+        raise ValueError("incremental and byte_range cannot be combined")
+    if byte_range is not None and engine not in CONCURRENT_ENGINES:
+        raise ValueError(f"byte_range loads need one of: {', '.join(CONCURRENT_ENGINES)}")
+    input_format = detect_format(csv_path)
+    if input_format != "csv":
+        if engine == "copy":
+            raise ValueError(f"the copy engine reads CSV only, not {input_format}")
+        if incremental or byte_range is not None:
+            raise ValueError(f"incremental and byte_range loads need CSV input, not {input_format}")
 
-@transaction.atomic
-def run_load_csv_orders(csv_path: str, source: str = "csv", job_name: str = "load_csv_orders") -> ETLRun:
-    run = ETLRun.objects.create(source=source, job_name=job_name, status=ETLRun.Status.RUNNING)
+    run = ETLRun.objects.create(
+        source=source,
+        job_name=job_name,
+        engine=engine,
+        parent=parent,
+        status=ETLRun.Status.RUNNING,
+    )
+    started = time.monotonic()
 
     try:
         if not os.path.exists(csv_path):
-            raise FileNotFoundError(f"CSV not found at: {csv_path}")
-
-        df = pd.read_csv(csv_path)
-        run.rows_extracted = len(df)
-
-        required_cols = {
-            "order_id", "customer_id", "email", "country", "city",
-            "product_id", "product_name", "category", "price",
-            "quantity", "discount_amount", "created_at"
-        }
-        missing = required_cols - set(df.columns)
-        if missing:
-            raise ValueError(f"Missing columns: {sorted(list(missing))}")
-
-        df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
-        df = df.dropna(subset=["order_id", "customer_id", "product_id", "created_at"])
-        df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(1).astype(int)
-        df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0.0)
-        df["discount_amount"] = pd.to_numeric(df["discount_amount"], errors="coerce").fillna(0.0)
-
-        loaded = 0
-
-        for row in df.to_dict(orient="records"):
-            created_at: datetime = row["created_at"].to_pydatetime()
-            if timezone.is_naive(created_at):
-                created_at = timezone.make_aware(created_at)
-
-            d = created_at.date()
-            time_dim, _ = DimTime.objects.get_or_create(
-                date=d,
-                defaults={
-                    "year": d.year,
-                    "month": d.month,
-                    "day": d.day,
-                    "week": int(d.strftime("%W")),
-                },
+            raise FileNotFoundError(f"Orders file not found at: {csv_path}")
+
+        if incremental:
+            state, byte_range, version = plan_increment(csv_path)
+
+        if byte_range is not None and byte_range[0] == byte_range[1]:
+            loaded = 0
+        elif engine == "copy":
+            with transaction.atomic():
+                run.rows_extracted, loaded = load_csv_with_copy(csv_path, run.run_id, byte_range)
+        else:
+            loaded = 0
+            caches = DimensionCaches()
+            for chunk in iter_order_frames(csv_path, chunk_size, byte_range):
+                run.rows_extracted += len(chunk)
+                df = clean_orders_frame(chunk)
+                with transaction.atomic():
+                    chunk_loaded = _load_frame(df, engine, batch_size, caches)
+                    if chunk_loaded:
+                        refresh_daily_rollups(_touched_days(df))
+                loaded += chunk_loaded
+                if chunk_size is not None:
+                    run.rows_loaded = loaded
+                    run.save(update_fields=["rows_extracted", "rows_loaded"])
+
+        if incremental:
+            commit_increment(state, byte_range[1], version, run, csv_path)
+
+        elapsed = time.monotonic() - started
+        run.status = ETLRun.Status.SUCCESS
+        run.rows_loaded = loaded
+        run.rows_per_second = round(run.rows_extracted / elapsed, 2) if elapsed > 0 else None
+        run.finished_at = timezone.now()
+        run.save(
+            update_fields=[
+                "status",
+                "rows_extracted",
+                "rows_loaded",
+                "rows_per_second",
+                "finished_at",
+            ]
+        )
+        return run
+
+    except Exception as e:
+        run.status = ETLRun.Status.FAILED
+        run.error_message = str(e)
+        run.finished_at = timezone.now()
+        run.save(
+            update_fields=[
+                "status",
+                "error_message",
+                "finished_at",
+                "rows_extracted",
+                "rows_loaded",
+            ]
+        )
+        raise
+
+
+def run_load_csv_order_files(
+    path: str,
+    workers: int = DEFAULT_FILE_WORKERS,
+    source: str = "csv",
+    job_name: str = "load_csv_order_files",
+    **options,
+) -> ETLRun:
+    """
+    Loads every orders file (CSV, Parquet, Arrow) of a directory or glob pattern that is not
+    in the manifest yet, with up to `workers` files in flight. Each file gets a child run of
+    the returned parent run; options are passed on to run_load_csv_orders. Files loaded
+    concurrently (workers > 1) use the bulk engine instead of the row engine.
+    """
+    if workers < 1:
+        raise ValueError("workers must be >= 1")
+    if workers > 1 and options.get("engine", "row") not in CONCURRENT_ENGINES:
+        options["engine"] = "bulk"
+
+    parent = ETLRun.objects.create(
+        source=source,
+        job_name=job_name,
+        engine=options.get("engine", "row"),
+        status=ETLRun.Status.RUNNING,
+    )
+
+    def load_file(file_path: str) -> None:
+        manifest = claim_file(file_path, parent)
+        if manifest is None:
+            return
+
+        try:
+            run = run_load_csv_orders(
+                file_path, source=source, job_name=job_name, parent=parent, **options
             )
+        except Exception:
+            # the failed child run (and its error) stays visible under the parent run
+            manifest.status = ETLFileManifest.Status.FAILED
+        else:
+            manifest.status = ETLFileManifest.Status.LOADED
+            manifest.run = run
+        manifest.save(update_fields=["status", "run", "updated_at"])
+
+    def load_file_in_thread(file_path: str) -> None:
+        try:
+            load_file(file_path)
+        finally:
+            connection.close()
 
+    try:
+        files = resolve_source_files(path)
+        if workers == 1:
+            for file_path in files:
+                load_file(file_path)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(load_file_in_thread, files))
+    except Exception as e:
+        parent.status = ETLRun.Status.FAILED
+        parent.error_message = str(e)
+        parent.finished_at = timezone.now()
+        parent.save(update_fields=["status", "error_message", "finished_at"])
+        raise
+
+    return finalize_partitioned_run(parent.run_id)
+
+
+def _load_frame(df: pd.DataFrame, engine: str, batch_size: int, caches: DimensionCaches) -> int:
+    if engine == "bulk":
+        return load_orders_frame(df, batch_size, caches)
+    return _load_rows(df, caches)
+
+
+def _touched_days(df: pd.DataFrame) -> set:
+    """
+    Order days as the rollup SQL sees them (created_at::date in the connection time zone).
+    """
+    return set(df["created_at"].dt.tz_convert(connection.timezone).dt.date)
+
+
+def _load_rows(df: pd.DataFrame, caches: DimensionCaches) -> int:
+    loaded = 0
+    caches.warm_for(df)
+
+    for row in df.to_dict(orient="records"):
+        created_at: datetime = row["created_at"].to_pydatetime()
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+
+        time_key = caches.dates.get(row["order_date"])
+        if time_key is None:
+            time_key = time_keys_for([row["order_date"]])[row["order_date"]]
+            caches.dates.put(row["order_date"], time_key)
+
+        customer = caches.customers.get(row["customer_id"])
+        if customer is None:
             customer, _ = DimCustomer.objects.get_or_create(
                 customer_id=row["customer_id"],
                 defaults={
@@ -70,71 +246,56 @@ def run_load_csv_orders(csv_path: str, source: str = "csv", job_name: str = "loa
                     "created_at": created_at,
                 },
             )
+            caches.customers.put(row["customer_id"], customer)
 
-            updated = False
-            for field in ["email", "country", "city"]:
-                val = row.get(field)
-                if val and getattr(customer, field) != val:
-                    setattr(customer, field, val)
-                    updated = True
-            if updated:
-                customer.save(update_fields=["email", "country", "city"])
+        updated = False
+        for field in ["email", "country", "city"]:
+            val = row.get(field)
+            if val and getattr(customer, field) != val:
+                setattr(customer, field, val)
+                updated = True
+        if updated:
+            customer.save(update_fields=["email", "country", "city"])
 
+        product = caches.products.get(row["product_id"])
+        if product is None:
             product, _ = DimProduct.objects.get_or_create(
                 product_id=row["product_id"],
                 defaults={
                     "name": row.get("product_name"),
                     "category": row.get("category"),
-                    "price": to_decimal(row.get("price")),
+                    "price": cents_to_decimal(row["price_cents"]),
                 },
             )
+            caches.products.put(row["product_id"], product)
 
-            prod_updated = False
-            if row.get("product_name") and product.name != row.get("product_name"):
-                product.name = row.get("product_name")
-                prod_updated = True
-            if row.get("category") and product.category != row.get("category"):
-                product.category = row.get("category")
-                prod_updated = True
-            price_dec = to_decimal(row.get("price"))
-            if price_dec and product.price != price_dec:
-                product.price = price_dec
-                prod_updated = True
-            if prod_updated:
-                product.save(update_fields=["name", "category", "price"])
-
-            if FactOrder.objects.filter(order_id=row["order_id"]).exists():
-                continue
-
-            qty = int(row.get("quantity", 1))
-            price = to_decimal(row.get("price"))
-            discount_amount = to_decimal(row.get("discount_amount"))
-            gross = (price * qty).quantize(Decimal("0.01"))
-            net = (gross - discount_amount).quantize(Decimal("0.01"))
-            if net < 0:
-                net = Decimal("0.00")
-
-            FactOrder.objects.create(
-                order_id=row["order_id"],
-                customer=customer,
-                product=product,
-                time=time_dim,
-                order_amount=net,
-                quantity=qty,
-                discount_amount=discount_amount,
-                created_at=created_at,
-            )
-            loaded += 1
+        prod_updated = False
+        if row.get("product_name") and product.name != row.get("product_name"):
+            product.name = row.get("product_name")
+            prod_updated = True
+        if row.get("category") and product.category != row.get("category"):
+            product.category = row.get("category")
+            prod_updated = True
+        price_dec = cents_to_decimal(row["price_cents"])
+        if price_dec and product.price != price_dec:
+            product.price = price_dec
+            prod_updated = True
+        if prod_updated:
+            product.save(update_fields=["name", "category", "price"])
 
-        run.status = ETLRun.Status.SUCCESS
-        run.rows_loaded = loaded
-        run.finished_at = timezone.now()
-        run.save(update_fields=["status", "rows_extracted", "rows_loaded", "finished_at"])
-        return run
+        if FactOrder.objects.filter(order_id=row["order_id"]).exists():
+            continue
 
-    except Exception as e:
-        run.status = ETLRun.Status.FAILED
-        run.error_message = str(e)
-        run.finished_at = timezone.now()
-        run.save(update_fields=["status", "error_message", "finished_at", "rows_extracted"])
-        raise
+        FactOrder.objects.create(
+            order_id=row["order_id"],
+            customer=customer,
+            product=product,
+            time_id=time_key,
+            order_amount=cents_to_decimal(row["net_cents"]),
+            quantity=row["quantity"],
+            discount_amount=cents_to_decimal(row["discount_cents"]),
+            created_at=created_at,
+        )
+        loaded += 1
+
+    return loaded
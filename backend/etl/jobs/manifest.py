@@ -0,0 +1,117 @@
+"""
+Source file discovery and the manifest of already-ingested files.
+"""
+
+import glob
+import hashlib
+import os
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from etl.jobs.readers import FORMAT_EXTENSIONS
+from etl.jobs.watermark import file_version
+from etl.models import ETLFileManifest, ETLRun
+
+SOURCE_EXTENSIONS = tuple(FORMAT_EXTENSIONS)
+HASH_BLOCK_BYTES = 1024 * 1024
+# a LOADING row untouched for this long is taken to belong to a worker that died
+STALE_LOADING_SECONDS = int(os.getenv("ETL_MANIFEST_STALE_SECONDS", str(6 * 3600)))
+
+
+def is_file_set(path: str) -> bool:
+    """
+    True when path names several files: a directory or a glob pattern.
+    """
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def resolve_source_files(path: str) -> list[str]:
+    if os.path.isdir(path):
+        candidates = glob.glob(os.path.join(path, "*"))
+    elif glob.has_magic(path):
+        candidates = glob.glob(path)
+    else:
+        candidates = [path]
+    return sorted(
+        os.path.abspath(p)
+        for p in candidates
+        if os.path.isfile(p) and p.lower().endswith(SOURCE_EXTENSIONS)
+    )
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def claim_file(path: str, run: ETLRun | None = None) -> ETLFileManifest | None:
+    """
+    Registers this version of the file as loading by run. Returns None when it is already
+    loaded or being loaded by another worker. Failed loads can be claimed again, and so
+    can loads left LOADING by a worker that died: their run is no longer running, or they
+    have not been updated for STALE_LOADING_SECONDS.
+
+    Files are only hashed when their path, size and mtime do not match a loaded version,
+    so unchanged files cost one stat() per run.
+    """
+    version = file_version(path)
+    if ETLFileManifest.objects.filter(
+        path=path,
+        file_size=version.size,
+        file_mtime=version.mtime,
+        status=ETLFileManifest.Status.LOADED,
+    ).exists():
+        return None
+
+    content_hash = file_sha256(path)
+    try:
+        with transaction.atomic():
+            return ETLFileManifest.objects.create(
+                path=path,
+                content_hash=content_hash,
+                file_size=version.size,
+                file_mtime=version.mtime,
+                run=run,
+            )
+    except IntegrityError:
+        pass
+
+    manifest = ETLFileManifest.objects.select_related("run").get(
+        path=path, content_hash=content_hash
+    )
+    if manifest.status == ETLFileManifest.Status.LOADED:
+        # same contents with a new mtime (touched, copied): skip the hash next time
+        ETLFileManifest.objects.filter(pk=manifest.pk).update(
+            file_size=version.size, file_mtime=version.mtime
+        )
+        return None
+    if not _reclaimable(manifest):
+        return None
+
+    # only one worker wins: the row must still be the version this one looked at
+    claimed = ETLFileManifest.objects.filter(
+        pk=manifest.pk, status=manifest.status, updated_at=manifest.updated_at
+    ).update(
+        status=ETLFileManifest.Status.LOADING,
+        run=run,
+        file_size=version.size,
+        file_mtime=version.mtime,
+        updated_at=timezone.now(),
+    )
+    if not claimed:
+        return None
+    manifest.refresh_from_db()
+    return manifest
+
+
+def _reclaimable(manifest: ETLFileManifest) -> bool:
+    if manifest.status == ETLFileManifest.Status.FAILED:
+        return True
+    if manifest.run is not None and manifest.run.status != ETLRun.Status.RUNNING:
+        return True
+    return manifest.updated_at < timezone.now() - timedelta(seconds=STALE_LOADING_SECONDS)
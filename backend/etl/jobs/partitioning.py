@@ -0,0 +1,113 @@
+"""
+Splits a CSV into record-aligned byte ranges that can be loaded independently, and folds
+the partition runs back into their parent ETLRun.
+"""
+
+import os
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from etl.jobs.readers import read_csv_header
+from etl.jobs.watermark import FileVersion, commit_increment
+from etl.models import ETLRun, ETLSourceState
+
+
+def data_byte_range(csv_path: str) -> tuple[int, int]:
+    _, data_start = read_csv_header(csv_path)
+    return data_start, max(data_start, os.path.getsize(csv_path))
+
+
+READ_BLOCK = 1 << 20
+
+
+def split_byte_range(csv_path: str, byte_range: tuple[int, int], partitions: int) -> list:
+    """
+    Cuts byte_range into at most `partitions` contiguous ranges that each start on a record
+    boundary: a newline outside double quotes, so a quoted field spanning lines is never
+    cut. byte_range must start on a record boundary. Empty ranges are dropped.
+    """
+    start, end = byte_range
+    bounds = [start]
+    pos = start
+    quotes = 0  # '"' read since start: odd inside a quoted field ("" escapes count twice)
+    with open(csv_path, "rb") as f:
+        for i in range(1, partitions):
+            target = start + (end - start) * i // partitions
+            if target <= pos:
+                continue
+            quotes += _count_quotes(f, pos, target - 1)
+            pos, quotes = _next_record_start(f, target - 1, end, quotes)
+            if pos >= end:
+                break
+            bounds.append(pos)
+    bounds.append(end)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _count_quotes(f, start: int, end: int) -> int:
+    f.seek(start)
+    quotes = 0
+    while start < end:
+        block = f.read(min(READ_BLOCK, end - start))
+        if not block:
+            break
+        quotes += block.count(b'"')
+        start += len(block)
+    return quotes
+
+
+def _next_record_start(f, pos: int, end: int, quotes: int) -> tuple[int, int]:
+    """
+    The offset after the first newline outside quotes from pos on (end if there is none),
+    and the quotes counted up to it.
+    """
+    f.seek(pos)
+    while pos < end:
+        block = f.read(min(READ_BLOCK, end - pos))
+        if not block:
+            break
+        i = 0
+        while (newline := block.find(b"\n", i)) != -1:
+            quotes += block.count(b'"', i, newline)
+            if quotes % 2 == 0:
+                return pos + newline + 1, quotes
+            i = newline + 1
+        quotes += block.count(b'"', i)
+        pos += len(block)
+    return end, quotes
+
+
+def finalize_partitioned_run(
+    parent_run_id: int,
+    source_state_id: int | None = None,
+    watermark: int | None = None,
+    csv_path: str | None = None,
+    version: FileVersion | None = None,
+) -> ETLRun:
+    """
+    Aggregates the child runs into the parent run. The watermark of an incremental load is
+    only advanced when every partition succeeded, to the file version it was planned from.
+    """
+    parent = ETLRun.objects.get(run_id=parent_run_id)
+    children = parent.children.all()
+    totals = children.aggregate(extracted=Sum("rows_extracted"), loaded=Sum("rows_loaded"))
+    failed = children.exclude(status=ETLRun.Status.SUCCESS)
+
+    parent.rows_extracted = totals["extracted"] or 0
+    parent.rows_loaded = totals["loaded"] or 0
+    parent.finished_at = timezone.now()
+    elapsed = (parent.finished_at - parent.started_at).total_seconds()
+    parent.rows_per_second = round(parent.rows_extracted / elapsed, 2) if elapsed > 0 else None
+
+    if failed.exists():
+        parent.status = ETLRun.Status.FAILED
+        parent.error_message = "; ".join(f"run {run.run_id}: {run.error_message}" for run in failed)
+    else:
+        parent.status = ETLRun.Status.SUCCESS
+        if source_state_id is not None:
+            state = ETLSourceState.objects.get(pk=source_state_id)
+            commit_increment(state, watermark, version, parent, csv_path)
+
+    parent.save()
+    return parent
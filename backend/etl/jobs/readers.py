@@ -0,0 +1,183 @@
+import csv
+import io
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+import pandas as pd
+
+from etl.jobs.transform import REQUIRED_COLUMNS, validate_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # columnar input is optional
+    pa = None
+    pq = None
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+ID_COLUMNS = ["order_id", "customer_id", "product_id"]
+
+# Everything is read as text and coerced in clean_orders_frame; this skips pandas' type
+# inference and keeps business ids such as "00123" intact.
+ORDER_DTYPES = {column: str for column in REQUIRED_COLUMNS}
+
+
+class ByteRangeReader(io.RawIOBase):
+    """
+    Read-only view of a binary file that stops at byte `end`.
+    """
+
+    def __init__(self, f: BinaryIO, end: int):
+        self._f = f
+        self._end = end
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._end - self._f.tell())
+        if size <= 0:
+            return 0
+        data = self._f.read(size)
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def read_csv_header(csv_path: str) -> tuple[list[str], int]:
+    """
+    Returns the header columns and the byte offset where the data rows start.
+    """
+    with open(csv_path, "rb") as f:
+        line = f.readline()
+    columns = next(csv.reader([line.decode("utf-8-sig")]), [])
+    return columns, len(line)
+
+
+@contextmanager
+def open_data_rows(csv_path: str, byte_range: tuple[int, int] | None = None):
+    """
+    Opens the CSV positioned on its first data row (or on byte_range[0]) and limited to
+    byte_range[1]. Yields (header, binary stream without header line).
+    """
+    header, data_start = read_csv_header(csv_path)
+    validate_columns(header)
+    start, end = byte_range or (data_start, None)
+
+    with open(csv_path, "rb") as f:
+        f.seek(max(start, data_start))
+        yield header, (f if end is None else io.BufferedReader(ByteRangeReader(f, end)))
+
+
+def iter_order_chunks(
+    csv_path: str,
+    chunk_size: int | None = None,
+    byte_range: tuple[int, int] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the required order columns of a CSV as raw DataFrames.
+    With chunk_size, at most chunk_size rows are held in memory at a time; without it the
+    whole file (or byte_range of it) is yielded as one frame.
+    """
+    with open_data_rows(csv_path, byte_range) as (header, stream):
+        options = {
+            "header": None,
+            "names": header,
+            "usecols": sorted(REQUIRED_COLUMNS),
+            "dtype": ORDER_DTYPES,
+        }
+        if chunk_size is None:
+            yield pd.read_csv(stream, **options)
+            return
+
+        with pd.read_csv(stream, chunksize=chunk_size, **options) as reader:
+            yield from reader
+
+
+def detect_format(path: str) -> str:
+    """
+    csv | parquet | arrow, from the file extension. Unknown extensions are read as CSV.
+    """
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def iter_order_frames(
+    path: str,
+    chunk_size: int | None = None,
+    byte_range: tuple[int, int] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Like iter_order_chunks, for any supported input format. Parquet and Arrow columns keep
+    their types, so clean_orders_frame has no strings left to parse. byte_range only
+    applies to CSV.
+    """
+    input_format = detect_format(path)
+    if input_format == "csv":
+        yield from iter_order_chunks(path, chunk_size, byte_range)
+        return
+
+    if byte_range is not None:
+        raise ValueError(f"byte ranges are only supported for CSV input, not {input_format}")
+    if pa is None:
+        raise ImportError(f"reading {input_format} files requires pyarrow (pip install pyarrow)")
+
+    if input_format == "parquet":
+        yield from _iter_parquet_chunks(path, chunk_size)
+    else:
+        yield from _iter_arrow_chunks(path, chunk_size)
+
+
+def _iter_parquet_chunks(path: str, chunk_size: int | None) -> Iterator[pd.DataFrame]:
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    validate_columns(parquet_file.schema_arrow.names)
+    columns = sorted(REQUIRED_COLUMNS)
+
+    if chunk_size is None:
+        yield _arrow_to_frame(parquet_file.read(columns=columns))
+        return
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield _arrow_to_frame(batch)
+
+
+def _iter_arrow_chunks(path: str, chunk_size: int | None) -> Iterator[pd.DataFrame]:
+    """
+    Arrow IPC file or stream format. The file is memory-mapped, so record batches are read
+    without copying and only the chunk being converted to pandas is materialized.
+    """
+    with pa.memory_map(path) as source:
+        try:
+            table = pa.ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            source.seek(0)
+            table = pa.ipc.open_stream(source).read_all()
+
+        validate_columns(table.column_names)
+        table = table.select(sorted(REQUIRED_COLUMNS))
+
+        if chunk_size is None:
+            yield _arrow_to_frame(table)
+            return
+        for batch in table.to_batches(max_chunksize=chunk_size):
+            yield _arrow_to_frame(batch)
+
+
+def _arrow_to_frame(data) -> pd.DataFrame:
+    """
+    Business ids are strings in the warehouse; integer ids are cast in Arrow (nulls stay
+    null) rather than in pandas, where they would turn into floats.
+    """
+    if isinstance(data, pa.RecordBatch):
+        data = pa.Table.from_batches([data])
+    for column in ID_COLUMNS:
+        index = data.schema.get_field_index(column)
+        field_type = data.schema.field(index).type
+        if not (pa.types.is_string(field_type) or pa.types.is_large_string(field_type)):
+            data = data.set_column(index, column, data.column(index).cast(pa.string()))
+    return data.to_pandas()
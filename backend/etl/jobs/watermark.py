@@ -0,0 +1,87 @@
+"""
+Byte-offset watermarks for append-only CSV sources.
+
+Each source file remembers the end of the last line it loaded. The next run only reads
+the complete lines appended since then. If the file shrank or its head changed
+(rotation or rewrite), the watermark resets and the whole file is re-read; order_id
+dedupe keeps that idempotent.
+"""
+
+import hashlib
+import os
+from typing import NamedTuple
+
+from etl.jobs.readers import read_csv_header
+from etl.models import ETLRun, ETLSourceState
+
+HEAD_CHECKSUM_BYTES = 64 * 1024
+TAIL_SCAN_BYTES = 64 * 1024
+
+
+def head_checksum(path: str, length: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(min(length, HEAD_CHECKSUM_BYTES))).hexdigest()
+
+
+def last_line_end(path: str, size: int) -> int:
+    """
+    Returns the offset just past the last newline, so a line still being written is left
+    for the next run.
+    """
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - TAIL_SCAN_BYTES)
+            f.seek(start)
+            block = f.read(pos - start)
+            idx = block.rfind(b"\n")
+            if idx != -1:
+                return start + idx + 1
+            pos = start
+    return 0
+
+
+class FileVersion(NamedTuple):
+    """
+    Size and mtime of a source file as one stat() saw them.
+    """
+
+    size: int
+    mtime: float
+
+
+def file_version(path: str) -> FileVersion:
+    stat = os.stat(path)
+    return FileVersion(stat.st_size, stat.st_mtime)
+
+
+def plan_increment(csv_path: str) -> tuple[ETLSourceState, tuple[int, int], FileVersion]:
+    """
+    Returns the source state, the (start, end) byte range that still has to be loaded and
+    the file version the range was planned from. start == end means there is nothing new.
+    The version is what commit_increment stores: lines appended while the range loads
+    change the file, so the next run picks them up.
+    """
+    state, _ = ETLSourceState.objects.get_or_create(source_key=os.path.abspath(csv_path))
+    _, data_start = read_csv_header(csv_path)
+    version = file_version(csv_path)
+
+    start = state.byte_offset
+    if start and version == (state.file_size, state.file_mtime):
+        return state, (start, start), version
+    if start and (version.size < start or head_checksum(csv_path, start) != state.head_checksum):
+        start = 0
+
+    start = max(start, data_start)
+    end = max(start, last_line_end(csv_path, version.size))
+    return state, (start, end), version
+
+
+def commit_increment(
+    state: ETLSourceState, end: int, version: FileVersion, run: ETLRun, csv_path: str
+) -> None:
+    state.byte_offset = end
+    state.file_size, state.file_mtime = version
+    state.head_checksum = head_checksum(csv_path, end)
+    state.last_run = run
+    state.save()
@@ -1,6 +1,15 @@
 import os
 from django.core.management.base import BaseCommand
-from etl.jobs.load_csv_orders_job import run_load_csv_orders
+
+from analytics.sections import warm_dashboard_cache
+from etl.jobs.load_csv_orders_job import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_FILE_WORKERS,
+    ENGINES,
+    run_load_csv_order_files,
+    run_load_csv_orders,
+)
+from etl.jobs.manifest import is_file_set
 
 
 class Command(BaseCommand):
@@ -11,20 +20,60 @@ class Command(BaseCommand):
             "--path",
             type=str,
             default=os.path.join("..", "data", "raw", "orders.csv"),
-            help="Path to orders CSV file",
+            help="Path to an orders file (.csv, .parquet or Arrow .arrow/.feather/.ipc), "
+            "or a directory / glob of them",
         )
         parser.add_argument("--source", type=str, default="csv")
         parser.add_argument("--job", type=str, default="load_csv_orders")
+        parser.add_argument(
+            "--engine",
+            choices=ENGINES,
+            default="row",
+            help="row = one order at a time, bulk = set-based batches, "
+            "copy = PostgreSQL COPY staging + SQL merge",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Stream the file this many rows at a time (bounded memory)",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only load lines appended since the last incremental run of this file (CSV only)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=DEFAULT_FILE_WORKERS,
+            help="Files loaded concurrently when --path is a directory or glob",
+        )
 
     def handle(self, *args, **options):
-        run = run_load_csv_orders(
-            csv_path=options["path"],
-            source=options["source"],
-            job_name=options["job"],
-        )
+        load_options = {
+            "source": options["source"],
+            "job_name": options["job"],
+            "engine": options["engine"],
+            "batch_size": options["batch_size"],
+            "chunk_size": options["chunk_size"],
+        }
+        if is_file_set(options["path"]):
+            run = run_load_csv_order_files(
+                options["path"], workers=options["workers"], **load_options
+            )
+        else:
+            run = run_load_csv_orders(
+                csv_path=options["path"], incremental=options["incremental"], **load_options
+            )
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"✅ ETL {run.status}. Extracted={run.rows_extracted}, Loaded={run.rows_loaded}"
+                f"✅ ETL {run.status}. Extracted={run.rows_extracted}, Loaded={run.rows_loaded}, "
+                f"Rows/s={run.rows_per_second}"
             )
         )
+        if run.rows_loaded:
+            warmed = warm_dashboard_cache()
+            self.stdout.write(f"Dashboard cache: {sum(warmed.values())} sections recomputed")
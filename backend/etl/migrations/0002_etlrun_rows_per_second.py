@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="etlrun",
+            name="rows_per_second",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0002_etlrun_rows_per_second"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="etlrun",
+            name="engine",
+            field=models.CharField(default="row", max_length=16),
+        ),
+    ]
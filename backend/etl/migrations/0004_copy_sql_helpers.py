@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:50
+
+from django.db import migrations
+
+# Lenient casts used by the COPY engine to mirror pandas' errors="coerce" behaviour.
+HELPERS_SQL = """
+CREATE OR REPLACE FUNCTION etl_try_numeric(value text) RETURNS numeric
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    result numeric;
+BEGIN
+    result := NULLIF(value, '')::numeric;
+    IF result IN ('NaN'::numeric, 'Infinity'::numeric, '-Infinity'::numeric) THEN
+        RETURN NULL;
+    END IF;
+    RETURN result;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION etl_try_timestamptz(value text) RETURNS timestamptz
+LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    RETURN NULLIF(value, '')::timestamptz;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+-- Round half to even on cents, like Decimal.quantize in the Python loaders.
+CREATE OR REPLACE FUNCTION etl_round_cents(value numeric) RETURNS numeric
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT (SIGN(value) * CASE
+        WHEN ABS(value) * 100 - FLOOR(ABS(value) * 100) = 0.5
+             AND MOD(FLOOR(ABS(value) * 100), 2) = 0
+            THEN FLOOR(ABS(value) * 100) / 100
+        ELSE ROUND(ABS(value), 2)
+    END)::numeric(12, 2);
+$$;
+"""
+
+DROP_HELPERS_SQL = """
+DROP FUNCTION IF EXISTS etl_try_numeric(text);
+DROP FUNCTION IF EXISTS etl_try_timestamptz(text);
+DROP FUNCTION IF EXISTS etl_round_cents(numeric);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0003_etlrun_engine"),
+    ]
+
+    operations = [
+        migrations.RunSQL(HELPERS_SQL, DROP_HELPERS_SQL),
+    ]
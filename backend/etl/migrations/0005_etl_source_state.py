@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0004_copy_sql_helpers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ETLSourceState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("source_key", models.CharField(max_length=512, unique=True)),
+                ("byte_offset", models.BigIntegerField(default=0)),
+                ("file_size", models.BigIntegerField(default=0)),
+                ("file_mtime", models.FloatField(blank=True, null=True)),
+                ("head_checksum", models.CharField(blank=True, default="", max_length=64)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "last_run",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="etl.etlrun",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "etl_source_state",
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0005_etl_source_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="etlrun",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="children",
+                to="etl.etlrun",
+            ),
+        ),
+    ]
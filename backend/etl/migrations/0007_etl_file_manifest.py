@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0006_etlrun_parent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ETLFileManifest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("path", models.CharField(max_length=512)),
+                ("content_hash", models.CharField(max_length=64)),
+                ("file_size", models.BigIntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("loading", "Loading"),
+                            ("loaded", "Loaded"),
+                            ("failed", "Failed"),
+                        ],
+                        default="loading",
+                        max_length=16,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="etl.etlrun",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "etl_file_manifest",
+                "indexes": [models.Index(fields=["status"], name="etl_file_ma_status_779741_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="etlfilemanifest",
+            constraint=models.UniqueConstraint(
+                fields=("path", "content_hash"), name="etl_file_manifest_uniq"
+            ),
+        ),
+    ]
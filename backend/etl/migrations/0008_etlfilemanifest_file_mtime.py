@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0007_etl_file_manifest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="etlfilemanifest",
+            name="file_mtime",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,103 @@
+from django.db import migrations
+
+# The lenient casts of 0004 caught cast errors in a plpgsql EXCEPTION block, which opens a
+# subtransaction per call, i.e. per staged row. These check the input first and only cast
+# what PostgreSQL accepts (pg_input_is_valid would do, but needs PostgreSQL 16).
+HELPERS_SQL = r"""
+CREATE OR REPLACE FUNCTION etl_try_numeric(value text) RETURNS numeric
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE
+        WHEN value ~ '^\s*[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]{1,4})?\s*$'
+            THEN value::numeric
+    END;
+$$;
+
+CREATE FUNCTION etl_is_date(y int, m int, d int) RETURNS boolean
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE
+        WHEN y < 1 OR m NOT BETWEEN 1 AND 12 OR d NOT BETWEEN 1 AND 31 THEN false
+        WHEN d <= 28 THEN true
+        ELSE d <= extract(day FROM make_date(y, m, 1) + interval '1 month - 1 day')
+    END;
+$$;
+
+-- YYYY-MM-DD( |T)HH:MM:SS, the CSV feeds' and the exports' own, is checked field by field
+-- since a regular expression over the whole value costs several times the cast itself. Any
+-- other value must look like
+-- [YYYY-MM-DD | YYYY/MM/DD][( |T)HH:MM[:SS[.fraction]]][Z | +HH[[:]MM]] on a calendar day.
+CREATE OR REPLACE FUNCTION etl_try_timestamptz(value text) RETURNS timestamptz
+LANGUAGE sql STABLE AS $$
+    SELECT CASE
+        WHEN translate(left(value, 19), '0123456789T', '9999999999 ') = '9999-99-99 99:99:99'
+            THEN CASE
+                WHEN etl_is_date(substr(value, 1, 4)::int, substr(value, 6, 2)::int,
+                                 substr(value, 9, 2)::int)
+                     AND substr(value, 12, 2)::int < 24
+                     AND substr(value, 15, 2)::int < 60
+                     AND substr(value, 18, 2)::int < 60
+                     AND (length(value) = 19 OR substr(value, 20) ~ (
+                         '^(?:\.[0-9]+)?\s*(?:Z|[+-](?:0[0-9]|1[0-5])(?::?[0-5][0-9])?)?\s*$'
+                     ))
+                    THEN value::timestamptz
+            END
+        WHEN value ~ (
+            '^\s*[0-9]{4}[-/](?:0?[1-9]|1[0-2])[-/](?:0?[1-9]|[12][0-9]|3[01])'
+            '(?:[ T](?:[01][0-9]|2[0-3]):[0-5][0-9](?::[0-5][0-9](?:\.[0-9]+)?)?)?'
+            '\s*(?:Z|[+-](?:0[0-9]|1[0-5])(?::?[0-5][0-9])?)?\s*$'
+        ) THEN
+            CASE
+                WHEN etl_is_date(
+                    split_part(translate(btrim(value), '/T', '- '), '-', 1)::int,
+                    split_part(translate(btrim(value), '/T', '- '), '-', 2)::int,
+                    left(split_part(translate(btrim(value), '/T', '- '), '-', 3), 2)::int
+                ) THEN value::timestamptz
+            END
+    END;
+$$;
+"""
+
+# 0004's definitions
+EXCEPTION_HELPERS_SQL = """
+DROP FUNCTION etl_try_numeric(text);
+DROP FUNCTION etl_try_timestamptz(text);
+DROP FUNCTION etl_is_date(int, int, int);
+
+CREATE FUNCTION etl_try_numeric(value text) RETURNS numeric
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    result numeric;
+BEGIN
+    result := NULLIF(value, '')::numeric;
+    IF result IN ('NaN'::numeric, 'Infinity'::numeric, '-Infinity'::numeric) THEN
+        RETURN NULL;
+    END IF;
+    RETURN result;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION etl_try_timestamptz(value text) RETURNS timestamptz
+LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    RETURN NULLIF(value, '')::timestamptz;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("etl", "0008_etlfilemanifest_file_mtime"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "DROP FUNCTION etl_try_numeric(text);\n"
+            "DROP FUNCTION etl_try_timestamptz(text);\n" + HELPERS_SQL,
+            EXCEPTION_HELPERS_SQL,
+        ),
+    ]
@@ -10,6 +10,7 @@ class ETLRun(models.Model):
     run_id = models.BigAutoField(primary_key=True)
     source = models.CharField(max_length=64)  # e.g. "csv", "mock_api"
     job_name = models.CharField(max_length=128)  # e.g. "load_orders"
+    engine = models.CharField(max_length=16, default="row")  # row | bulk | copy
     status = models.CharField(max_length=16, choices=Status.choices, default=Status.RUNNING)
 
     started_at = models.DateTimeField(auto_now_add=True)
@@ -17,9 +18,15 @@ class ETLRun(models.Model):
 
     rows_extracted = models.IntegerField(default=0)
     rows_loaded = models.IntegerField(default=0)
+    rows_per_second = models.FloatField(blank=True, null=True)  # extract throughput
 
     error_message = models.TextField(blank=True, null=True)
 
+    # set on partition runs of a parallel load (see etl.tasks.plan_csv_orders_task)
+    parent = models.ForeignKey(
+        "self", on_delete=models.CASCADE, blank=True, null=True, related_name="children"
+    )
+
     class Meta:
         db_table = "etl_runs"
         indexes = [
@@ -30,3 +37,62 @@ class ETLRun(models.Model):
 
     def __str__(self):
         return f"{self.job_name} ({self.status})"
+
+
+class ETLSourceState(models.Model):
+    """
+    High-water mark of an append-only source file, used by incremental loads.
+    """
+
+    source_key = models.CharField(max_length=512, unique=True)  # absolute file path
+    byte_offset = models.BigIntegerField(default=0)  # end of the last loaded line
+    file_size = models.BigIntegerField(default=0)
+    file_mtime = models.FloatField(blank=True, null=True)
+    head_checksum = models.CharField(max_length=64, blank=True, default="")  # sha256
+
+    last_run = models.ForeignKey(
+        ETLRun, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "etl_source_state"
+
+    def __str__(self):
+        return f"{self.source_key} @ {self.byte_offset}"
+
+
+class ETLFileManifest(models.Model):
+    """
+    One row per ingested source file version, so a file is never loaded twice.
+    """
+
+    class Status(models.TextChoices):
+        LOADING = "loading", "Loading"
+        LOADED = "loaded", "Loaded"
+        FAILED = "failed", "Failed"
+
+    path = models.CharField(max_length=512)  # absolute file path
+    content_hash = models.CharField(max_length=64)  # sha256 of the file contents
+    file_size = models.BigIntegerField(default=0)
+    file_mtime = models.FloatField(blank=True, null=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.LOADING)
+
+    # the run loading the file (its parent run) while LOADING, the file's own run once LOADED
+    run = models.ForeignKey(
+        ETLRun, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "etl_file_manifest"
+        constraints = [
+            models.UniqueConstraint(fields=["path", "content_hash"], name="etl_file_manifest_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.path} ({self.status})"
@@ -9,10 +9,13 @@ class ETLRunSerializer(serializers.ModelSerializer):
             "run_id",
             "source",
             "job_name",
+            "engine",
             "status",
             "started_at",
             "finished_at",
             "rows_extracted",
             "rows_loaded",
+            "rows_per_second",
             "error_message",
+            "parent",
         ]
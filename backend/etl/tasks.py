@@ -1,19 +1,169 @@
 import os
-from celery import shared_task
-from etl.jobs.load_csv_orders_job import run_load_csv_orders
+from celery import chord, shared_task
+from django.utils import timezone
+
+from analytics.tasks import warm_dashboard_cache_task
+from etl.jobs.load_csv_orders_job import (
+    CONCURRENT_ENGINES,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_FILE_WORKERS,
+    run_load_csv_order_files,
+    run_load_csv_orders,
+)
+from etl.jobs.manifest import is_file_set
+from etl.jobs.partitioning import data_byte_range, finalize_partitioned_run, split_byte_range
+from etl.jobs.readers import detect_format
+from etl.jobs.watermark import FileVersion, plan_increment
+from etl.models import ETLRun
+
+
+def _load_options() -> dict:
+    chunk_size = os.getenv("ETL_CHUNK_SIZE")
+    return {
+        "engine": os.getenv("ETL_ENGINE", "row"),
+        "batch_size": int(os.getenv("ETL_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        "chunk_size": int(chunk_size) if chunk_size else None,
+    }
+
+
+def _warm_cache_after(run: ETLRun) -> ETLRun:
+    # the load invalidated the cached ranges of its days: re-warm the dashboard defaults
+    if run.status == ETLRun.Status.SUCCESS and run.rows_loaded:
+        warm_dashboard_cache_task.delay()
+    return run
+
+
+def _run_summary(run: ETLRun) -> dict:
+    return {
+        "run_id": run.run_id,
+        "status": run.status,
+        "rows_extracted": run.rows_extracted,
+        "rows_loaded": run.rows_loaded,
+        "rows_per_second": run.rows_per_second,
+    }
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def load_csv_orders_task(self):
     """
     Scheduled ETL task: loads CSV orders into warehouse.
+    Incremental by default (ETL_INCREMENTAL=0 re-reads the whole file every run).
+    With ETL_PARTITIONS > 1 the load is fanned out over workers (plan_csv_orders_task).
+    ETL_CSV_ORDERS_PATH may also be a directory or glob: new files are then loaded with
+    ETL_FILE_WORKERS concurrent loaders and recorded in the file manifest.
+    Parquet / Arrow files (by extension) are always loaded whole by a single worker.
     Retries automatically on failure.
     """
     csv_path = os.getenv("ETL_CSV_ORDERS_PATH", "../data/raw/orders.csv")
-    run = run_load_csv_orders(csv_path=csv_path, source="csv", job_name="celery_load_csv_orders")
-    return {
-        "run_id": run.run_id,
-        "status": run.status,
-        "rows_extracted": run.rows_extracted,
-        "rows_loaded": run.rows_loaded,
-    }
+    is_csv = detect_format(csv_path) == "csv"
+    incremental = is_csv and os.getenv("ETL_INCREMENTAL", "1") == "1"
+
+    if is_file_set(csv_path):
+        run = run_load_csv_order_files(
+            csv_path,
+            workers=int(os.getenv("ETL_FILE_WORKERS", DEFAULT_FILE_WORKERS)),
+            source="csv",
+            job_name="celery_load_csv_order_files",
+            **_load_options(),
+        )
+        return _run_summary(_warm_cache_after(run))
+
+    partitions = int(os.getenv("ETL_PARTITIONS", "1"))
+    if partitions > 1 and is_csv:
+        return plan_csv_orders_task(csv_path, partitions, incremental)
+
+    run = run_load_csv_orders(
+        csv_path=csv_path,
+        source="csv",
+        job_name="celery_load_csv_orders",
+        incremental=incremental,
+        **_load_options(),
+    )
+    return _run_summary(_warm_cache_after(run))
+
+
+@shared_task
+def plan_csv_orders_task(csv_path: str, partitions: int, incremental: bool = False):
+    """
+    Planner: splits the file (or its new, incremental part) into line-aligned byte ranges
+    and loads them in parallel with a chord. The callback aggregates the partition runs
+    into the parent run and advances the watermark. Partitions load concurrently, so the
+    row engine is replaced by the bulk engine (see CONCURRENT_ENGINES).
+    """
+    options = _load_options()
+    if options["engine"] not in CONCURRENT_ENGINES:
+        options["engine"] = "bulk"
+    parent = ETLRun.objects.create(
+        source="csv",
+        job_name="celery_load_csv_orders_parallel",
+        engine=options["engine"],
+        status=ETLRun.Status.RUNNING,
+    )
+
+    state_id = version = None
+    try:
+        if incremental:
+            state, byte_range, version = plan_increment(csv_path)
+            state_id = state.pk
+        else:
+            byte_range = data_byte_range(csv_path)
+        ranges = split_byte_range(csv_path, byte_range, partitions)
+    except Exception as e:
+        parent.status = ETLRun.Status.FAILED
+        parent.error_message = str(e)
+        parent.finished_at = timezone.now()
+        parent.save(update_fields=["status", "error_message", "finished_at"])
+        raise
+
+    callback = finalize_csv_orders_run.s(parent.run_id, state_id, byte_range[1], csv_path, version)
+    if not ranges:
+        callback.delay([])
+    else:
+        chord(
+            load_csv_orders_partition_task.s(parent.run_id, csv_path, start, end, options)
+            for start, end in ranges
+        )(callback)
+
+    return {"run_id": parent.run_id, "partitions": len(ranges)}
+
+
+@shared_task
+def load_csv_orders_partition_task(
+    parent_run_id: int, csv_path: str, start: int, end: int, options: dict
+):
+    """
+    Loads one byte range of the file. Failures are recorded on the partition run and
+    reported to the chord callback instead of being raised, so the parent is always closed.
+    """
+    parent = ETLRun.objects.get(run_id=parent_run_id)
+    try:
+        run = run_load_csv_orders(
+            csv_path=csv_path,
+            source="csv",
+            job_name="celery_load_csv_orders_partition",
+            byte_range=(start, end),
+            parent=parent,
+            **options,
+        )
+    except Exception as e:
+        return {"parent_run_id": parent_run_id, "status": ETLRun.Status.FAILED, "error": str(e)}
+    return _run_summary(run)
+
+
+@shared_task
+def finalize_csv_orders_run(
+    results,
+    parent_run_id: int,
+    source_state_id,
+    watermark: int,
+    csv_path: str,
+    version=None,
+):
+    """
+    Chord callback: sums the partition counts into the parent run. version is the
+    (size, mtime) of the file when the load was planned.
+    """
+    if version is not None:
+        version = FileVersion(*version)  # a list once serialized
+    run = finalize_partitioned_run(parent_run_id, source_state_id, watermark, csv_path, version)
+    return _run_summary(_warm_cache_after(run))
@@ -0,0 +1,573 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+from math import inf
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from config.celery import app as celery_app
+
+from analytics.models import (
+    AggDailyProductSales,
+    AggDailySales,
+    CustomerRfmState,
+    DimCustomer,
+    DimProduct,
+    FactOrder,
+)
+from analytics.sections import kpis, warm_dashboard_cache
+from etl.jobs.dim_cache import DimensionKeyCache
+from etl.jobs.load_csv_orders_job import run_load_csv_order_files, run_load_csv_orders
+from etl.jobs.manifest import STALE_LOADING_SECONDS, claim_file, file_sha256
+from etl.jobs.partitioning import data_byte_range, finalize_partitioned_run, split_byte_range
+from etl.jobs.transform import clean_orders_frame
+from etl.jobs.watermark import commit_increment, plan_increment
+from etl.models import ETLFileManifest, ETLRun, ETLSourceState
+from etl.tasks import finalize_csv_orders_run, plan_csv_orders_task
+
+HEADER = (
+    "order_id,customer_id,email,country,city,product_id,product_name,category,"
+    "price,quantity,discount_amount,created_at"
+)
+
+ROWS = [
+    "ORD-1,CUST-1,a@x.io,DE,Berlin,PROD-1,Mouse,Electronics,19.99,2,1.00,2026-01-10 10:15:00",
+    "ORD-2,CUST-2,b@x.io,DE,Hamburg,PROD-2,Notebook,Books,7.50,3,0.00,2026-01-11 14:20:00",
+    "ORD-3,CUST-1,a2@x.io,,Munich,PROD-1,Mouse Pro,,21.00,1,30.00,2026-01-11 09:05:00",
+    "ORD-2,CUST-2,b@x.io,DE,Hamburg,PROD-2,Notebook,Books,7.50,3,0.00,2026-01-11 14:20:00",
+    "ORD-4,CUST-3,,FR,Paris,PROD-3,Bottle,Sports,12.00,,0.50,2026-01-12 18:10:00",
+    "ORD-5,,x@x.io,ES,Madrid,PROD-3,Bottle,Sports,12.00,1,0.00,2026-01-12 18:10:00",
+]
+
+
+def write_csv(rows, directory, name="orders.csv"):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write("\n".join([HEADER] + rows) + "\n")
+    return path
+
+
+def warehouse_snapshot():
+    customers = sorted(DimCustomer.objects.values_list("customer_id", "email", "country", "city"))
+    products = sorted(DimProduct.objects.values_list("product_id", "name", "category", "price"))
+    orders = sorted(
+        FactOrder.objects.values_list(
+            "order_id",
+            "customer__customer_id",
+            "product__product_id",
+            "time__date",
+            "order_amount",
+            "quantity",
+            "discount_amount",
+            "created_at",
+        )
+    )
+    return customers, products, orders
+
+
+class CleanOrdersFrameTestCase(SimpleTestCase):
+    def test_amounts_are_exact_cents_and_net_is_clamped(self):
+        df = pd.DataFrame(
+            {
+                "order_id": ["A", "B", "C"],
+                "customer_id": ["C1", "C1", "C1"],
+                "product_id": ["P1", "P1", "P1"],
+                "email": [None] * 3,
+                "country": [None] * 3,
+                "city": [None] * 3,
+                "product_name": [None] * 3,
+                "category": [None] * 3,
+                "price": ["19.995", "0.1", "inf"],
+                "quantity": ["3", None, "1"],
+                "discount_amount": ["0.005", "5", "0"],
+                "created_at": ["2026-01-01 10:00:00"] * 3,
+            }
+        )
+        cleaned = clean_orders_frame(df)
+        self.assertEqual(cleaned["price_cents"].tolist(), [2000, 10, 0])
+        self.assertEqual(cleaned["discount_cents"].tolist(), [0, 500, 0])
+        self.assertEqual(cleaned["net_cents"].tolist(), [6000, 0, 0])
+
+    def test_calendar_columns_match_strftime(self):
+        days = pd.date_range("2026-01-01", "2028-12-31", freq="D")
+        df = pd.DataFrame({column: ["x"] * len(days) for column in HEADER.split(",")})
+        df["created_at"] = days.astype(str)
+        cleaned = clean_orders_frame(df)
+        expected = [int(d.strftime("%W")) for d in days]
+        self.assertEqual(cleaned["week"].tolist(), expected)
+        self.assertEqual(cleaned["order_date"].tolist(), [d.date() for d in days])
+        self.assertEqual(cleaned["year"].tolist(), [d.year for d in days])
+
+
+class DimensionKeyCacheTestCase(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = DimensionKeyCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertEqual([cache.get("a"), cache.get("c"), cache.get("b")], [1, 3, None])
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+class LoadCsvOrdersTestCase(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = write_csv(ROWS, self.tmp.name)
+
+    def load(self, **kwargs):
+        return run_load_csv_orders(csv_path=self.path, **kwargs)
+
+    def test_bulk_engine_matches_row_engine(self):
+        run = self.load(engine="row")
+        expected = warehouse_snapshot()
+        self.assertEqual(run.rows_loaded, 4)
+
+        FactOrder.objects.all().delete()
+        DimCustomer.objects.all().delete()
+        DimProduct.objects.all().delete()
+
+        run = self.load(engine="bulk", batch_size=2)
+        self.assertEqual(run.status, ETLRun.Status.SUCCESS)
+        self.assertEqual(run.rows_extracted, 6)
+        self.assertEqual(run.rows_loaded, 4)
+        self.assertIsNotNone(run.rows_per_second)
+        self.assertEqual(warehouse_snapshot(), expected)
+
+    def test_copy_engine_matches_row_engine(self):
+        self.load(engine="row")
+        expected = warehouse_snapshot()
+
+        FactOrder.objects.all().delete()
+        DimCustomer.objects.all().delete()
+        DimProduct.objects.all().delete()
+
+        run = self.load(engine="copy")
+        self.assertEqual(run.status, ETLRun.Status.SUCCESS)
+        self.assertEqual(run.engine, "copy")
+        self.assertEqual(run.rows_extracted, 6)
+        self.assertEqual(run.rows_loaded, 4)
+        self.assertEqual(warehouse_snapshot(), expected)
+        self.assertEqual(self.load(engine="copy").rows_loaded, 0)
+
+    def test_copy_casts_coerce_like_pandas_without_subtransactions(self):
+        numbers = ["1", " 2.5 ", "+.5", "1E-2", "", "abc", "NaN", "inf", "1_000", "12,5"]
+        timestamps = [
+            "2026-01-10 10:15:00",
+            "2026/1/5 09:05",
+            "2026-01-10T10:15:00.123+05:30",
+            "2026-01-10T10:15:00+00:00",
+            "2026-01-10 10:15:60",
+            "2024-02-29",
+            "2026-02-29 10:00:00",
+            "2026-04-31",
+            "2026-01-10 24:00:00",
+            "not a date",
+        ]
+        with connection.cursor() as cursor:
+            for function, values, parse in (
+                ("etl_try_numeric", numbers, pd.to_numeric),
+                ("etl_try_timestamptz", timestamps, pd.to_datetime),
+            ):
+                cursor.execute(f"SELECT {function}(v) FROM unnest(%s::text[]) v;", [values])
+                cast = [value is not None for (value,) in cursor.fetchall()]
+                # one at a time: pandas infers a single format for a whole column
+                parsed = [parse(pd.Series([value]), errors="coerce")[0] for value in values]
+                valid = [pd.notna(value) and value not in (inf, -inf) for value in parsed]
+                self.assertEqual(cast, valid, function)
+
+            cursor.execute("SELECT prosrc FROM pg_proc WHERE proname LIKE 'etl_%%';")
+            self.assertFalse([src for (src,) in cursor.fetchall() if "EXCEPTION" in src.upper()])
+
+    def test_streaming_chunks_match_single_pass(self):
+        self.load(engine="bulk")
+        expected = warehouse_snapshot()
+
+        FactOrder.objects.all().delete()
+        DimCustomer.objects.all().delete()
+        DimProduct.objects.all().delete()
+
+        run = self.load(engine="bulk", chunk_size=2)
+        self.assertEqual(run.rows_extracted, 6)
+        self.assertEqual(run.rows_loaded, 4)
+        self.assertEqual(warehouse_snapshot(), expected)
+
+    def test_columnar_files_match_csv(self):
+        self.load(engine="row")
+        expected = warehouse_snapshot()
+
+        df = pd.read_csv(self.path, parse_dates=["created_at"])
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        self.assertTrue(pa.types.is_timestamp(table.schema.field("created_at").type))
+        parquet_path = os.path.join(self.tmp.name, "orders.parquet")
+        pq.write_table(table, parquet_path)
+        arrow_path = os.path.join(self.tmp.name, "orders.arrow")
+        with pa.OSFile(arrow_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=2)
+
+        for path in (parquet_path, arrow_path):
+            for chunk_size in (None, 4):
+                with self.subTest(path=path, chunk_size=chunk_size):
+                    FactOrder.objects.all().delete()
+                    DimCustomer.objects.all().delete()
+                    DimProduct.objects.all().delete()
+
+                    run = run_load_csv_orders(path, engine="bulk", chunk_size=chunk_size)
+                    self.assertEqual(run.rows_extracted, 6)
+                    self.assertEqual(run.rows_loaded, 4)
+                    self.assertEqual(warehouse_snapshot(), expected)
+
+        with self.assertRaises(ValueError):
+            run_load_csv_orders(parquet_path, engine="copy")
+
+    def test_incremental_runs_only_read_appended_lines(self):
+        for engine in ("bulk", "copy"):
+            with self.subTest(engine=engine):
+                FactOrder.objects.all().delete()
+                path = write_csv(ROWS[:3], self.tmp.name, f"{engine}.csv")
+                self.assertEqual(
+                    run_load_csv_orders(path, engine=engine, incremental=True).rows_extracted, 3
+                )
+
+                with open(path, "a") as f:
+                    f.write(ROWS[4] + "\n" + ROWS[5][:20])  # last line still being written
+                run = run_load_csv_orders(path, engine=engine, incremental=True)
+                self.assertEqual((run.rows_extracted, run.rows_loaded), (1, 1))
+
+                run = run_load_csv_orders(path, engine=engine, incremental=True)
+                self.assertEqual(run.rows_extracted, 0)
+
+                state = ETLSourceState.objects.get(source_key=os.path.abspath(path))
+                with open(path, "rb") as f:
+                    self.assertEqual(state.byte_offset, len(f.read()) - 20)
+
+    def test_lines_appended_during_a_load_are_left_for_the_next_run(self):
+        state, byte_range, version = plan_increment(self.path)
+        with open(self.path, "a") as f:
+            f.write(ROWS[0].replace("ORD-1", "ORD-6") + "\n")
+        os.utime(self.path, (version.mtime + 5, version.mtime + 5))
+        run = ETLRun.objects.create(source="csv", job_name="load_csv_orders")
+        commit_increment(state, byte_range[1], version, run, self.path)
+
+        state, (start, end), _ = plan_increment(self.path)
+        self.assertEqual((start, end), (byte_range[1], os.path.getsize(self.path)))
+        run = run_load_csv_orders(self.path, engine="bulk", incremental=True)
+        self.assertEqual((run.rows_extracted, run.rows_loaded), (1, 1))
+
+    def test_partitioned_runs_store_the_file_version_they_planned_from(self):
+        state, byte_range, version = plan_increment(self.path)
+        with open(self.path, "a") as f:
+            f.write(ROWS[0].replace("ORD-1", "ORD-6") + "\n")
+        os.utime(self.path, (version.mtime + 5, version.mtime + 5))
+        parent = ETLRun.objects.create(source="csv", job_name="load_csv_orders_parallel")
+        finalize_csv_orders_run(
+            [], parent.run_id, state.pk, byte_range[1], self.path, list(version)
+        )
+
+        _, (start, end), _ = plan_increment(self.path)
+        self.assertEqual((start, end), (byte_range[1], os.path.getsize(self.path)))
+
+    def test_byte_ranges_are_line_aligned_and_cover_the_file(self):
+        byte_range = data_byte_range(self.path)
+        ranges = split_byte_range(self.path, byte_range, 4)
+        self.assertEqual(ranges[0][0], byte_range[0])
+        self.assertEqual(ranges[-1][1], byte_range[1])
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for start, end in ranges:
+            self.assertEqual(data[start - 1 : start], b"\n")
+        self.assertEqual(sum(data[a:b].count(b"\n") for a, b in ranges), len(ROWS))
+
+    def test_byte_ranges_keep_quoted_newlines_together(self):
+        description = '"Mouse\n' + 'with a ""long""\ndescription\n' * 5 + '",'
+        rows = [row.replace("Mouse,", description) for row in ROWS * 20]  # 40 span 12 lines
+        path = write_csv(rows, self.tmp.name, "quoted.csv")
+        ranges = split_byte_range(path, data_byte_range(path), 16)
+        self.assertGreater(len(ranges), 8)
+        with open(path, "rb") as f:
+            data = f.read()
+        header = data[: data_byte_range(path)[0]]
+        records = [
+            record
+            for start, end in ranges
+            for record in csv.DictReader(StringIO((header + data[start:end]).decode()))
+        ]
+        self.assertEqual(len(records), len(rows))
+        self.assertEqual(records[0]["product_name"].count('"long"'), 5)
+
+    def test_failed_plan_closes_the_parent_run(self):
+        with self.assertRaises(FileNotFoundError):
+            plan_csv_orders_task(os.path.join(self.tmp.name, "missing.csv"), 3)
+        parent = ETLRun.objects.get()
+        self.assertEqual(parent.status, ETLRun.Status.FAILED)
+        self.assertIsNotNone(parent.finished_at)
+
+    def test_parallel_load_aggregates_partitions_into_parent(self):
+        self.load(engine="bulk")
+        expected = warehouse_snapshot()
+        FactOrder.objects.all().delete()
+
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", False)
+        plan = plan_csv_orders_task(self.path, 3, incremental=True)
+
+        parent = ETLRun.objects.get(run_id=plan["run_id"])
+        self.assertEqual(parent.status, ETLRun.Status.SUCCESS)
+        self.assertEqual(parent.engine, "bulk")  # ETL_ENGINE defaults to row
+        self.assertEqual(parent.children.count(), plan["partitions"])
+        self.assertEqual((parent.rows_extracted, parent.rows_loaded), (6, 4))
+        self.assertEqual(warehouse_snapshot(), expected)
+        state = ETLSourceState.objects.get(source_key=os.path.abspath(self.path))
+        self.assertEqual(state.byte_offset, os.path.getsize(self.path))
+
+    def test_loads_refresh_daily_rollups(self):
+        for engine in ("row", "bulk", "copy"):
+            with self.subTest(engine=engine):
+                FactOrder.objects.all().delete()
+                AggDailySales.objects.all().delete()
+                AggDailyProductSales.objects.all().delete()
+
+                self.load(engine=engine)
+                daily = sorted(AggDailySales.objects.values_list("date", "orders", "revenue"))
+                self.assertEqual(
+                    daily,
+                    [
+                        (date(2026, 1, 10), 1, Decimal("38.98")),
+                        (date(2026, 1, 11), 2, Decimal("22.50")),
+                        (date(2026, 1, 12), 1, Decimal("11.50")),
+                    ],
+                )
+                self.assertEqual(AggDailyProductSales.objects.count(), 4)
+                rfm = sorted(
+                    CustomerRfmState.objects.values_list(
+                        "customer__customer_id",
+                        "first_order_date",
+                        "last_order_date",
+                        "frequency",
+                        "monetary",
+                    )
+                )
+                self.assertEqual(
+                    rfm,
+                    [
+                        ("CUST-1", date(2026, 1, 10), date(2026, 1, 11), 2, Decimal("38.98")),
+                        ("CUST-2", date(2026, 1, 11), date(2026, 1, 11), 1, Decimal("22.50")),
+                        ("CUST-3", date(2026, 1, 12), date(2026, 1, 12), 1, Decimal("11.50")),
+                    ],
+                )
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_loads_invalidate_cached_ranges_of_their_days(self):
+        cache.clear()
+        january = kpis(date(2026, 1, 1), date(2026, 1, 31))
+        december = kpis(date(2025, 12, 1), date(2025, 12, 31))
+        self.assertEqual(json.loads(january.fetch()[0])["total_orders"], 0)
+        december.fetch()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load(engine="bulk")
+
+        body, meta = january.fetch()
+        self.assertEqual((json.loads(body)["total_orders"], meta["hit"]), (4, False))
+        self.assertTrue(december.fetch()[1]["hit"])
+        warmed = warm_dashboard_cache()
+        self.assertEqual(warm_dashboard_cache(), dict.fromkeys(warmed, False))
+
+    def test_loads_into_partitioned_fact_table(self):
+        self.load(engine="row")
+        expected = warehouse_snapshot()
+        FactOrder.objects.all().delete()
+        call_command("partition_fact_orders", "--convert", stdout=StringIO())
+
+        for engine in ("bulk", "copy", "row"):
+            with self.subTest(engine=engine):
+                self.assertEqual(self.load(engine=engine).rows_loaded, 4)
+                self.assertEqual(self.load(engine=engine).rows_loaded, 0)
+                self.assertEqual(warehouse_snapshot(), expected)
+                FactOrder.objects.all().delete()
+
+    def test_bulk_engine_is_idempotent(self):
+        self.load(engine="bulk")
+        run = self.load(engine="bulk")
+        self.assertEqual(run.rows_loaded, 0)
+        self.assertEqual(FactOrder.objects.count(), 4)
+
+    def test_bulk_chunks_resolve_seen_dimensions_from_the_caches(self):
+        changed = ROWS[0].replace("a@x.io", "new@x.io").replace("ORD-1", "ORD-9")
+        path = write_csv([ROWS[0], ROWS[1], changed], self.tmp.name, "changed.csv")
+        with CaptureQueriesContext(connection) as ctx:
+            run = run_load_csv_orders(csv_path=path, engine="bulk", chunk_size=2)
+        self.assertEqual(run.rows_loaded, 3)
+
+        lookups = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT")
+            and 'FROM "dim_customers"' in q["sql"]
+            and "FOR NO KEY UPDATE" not in q["sql"]
+        ]
+        # first chunk only: the uncached ids, then the keys of the inserted rows
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual(DimCustomer.objects.get(customer_id="CUST-1").email, "new@x.io")
+
+    def test_row_engine_looks_up_each_dimension_once_per_chunk(self):
+        self.load(engine="row")
+        rows = [row.replace("ORD-", "ORD-1") for row in ROWS]
+        path = write_csv(rows, self.tmp.name, "more.csv")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(run_load_csv_orders(csv_path=path, engine="row").rows_loaded, 4)
+
+        lookups = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        for table in ("dim_customers", "dim_products", "dim_time"):
+            self.assertEqual(len([sql for sql in lookups if f'FROM "{table}"' in sql]), 1)
+
+    def test_missing_file_is_recorded_as_failed(self):
+        with self.assertRaises(FileNotFoundError):
+            run_load_csv_orders(csv_path=os.path.join(self.tmp.name, "missing.csv"))
+        self.assertEqual(ETLRun.objects.get().status, ETLRun.Status.FAILED)
+
+
+class ConcurrentPartitionsTestCase(TransactionTestCase):
+    """
+    Two partitions of one file loaded at the same time, with the same customers, products
+    and order ids in opposite orders: per-batch upserts would lock them in opposite orders.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for i in range(0, 30, 2):  # existing customers whose city changes
+            DimCustomer.objects.create(
+                customer_id=f"CUST-{i:02d}", city="Old", created_at=timezone.now()
+            )
+        lines = [
+            f"ORD-{i:02d},CUST-{i:02d},c{i}@x.io,DE,Berlin,PROD-{i % 7},Mouse,Electronics,"
+            f"19.99,1,0.00,2026-01-{1 + i % 28:02d} 10:00:00"
+            for i in range(30)
+        ]
+        self.path = write_csv(lines + lines[::-1], self.tmp.name)
+        start, end = data_byte_range(self.path)
+        middle = start + sum(len(line) + 1 for line in lines)
+        self.ranges = [(start, middle), (middle, end)]
+
+    def test_overlapping_partitions_load_concurrently(self):
+        parent = ETLRun.objects.create(source="csv", job_name="load_csv_orders_parallel")
+        barrier = threading.Barrier(len(self.ranges))
+        errors = []
+
+        def load(byte_range):
+            try:
+                barrier.wait()
+                run_load_csv_orders(
+                    self.path, engine="bulk", batch_size=1, byte_range=byte_range, parent=parent
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=load, args=(r,)) for r in self.ranges]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(finalize_partitioned_run(parent.run_id).status, ETLRun.Status.SUCCESS)
+        self.assertEqual(FactOrder.objects.count(), 30)
+        self.assertEqual(DimCustomer.objects.count(), 30)
+        self.assertFalse(DimCustomer.objects.filter(city="Old").exists())
+
+    def test_byte_range_loads_refuse_the_row_engine(self):
+        with self.assertRaises(ValueError):
+            run_load_csv_orders(self.path, engine="row", byte_range=self.ranges[0])
+
+
+class LoadCommitTestCase(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = write_csv(ROWS, self.tmp.name)
+
+    def test_cache_errors_after_commit_do_not_fail_the_load(self):
+        down = mock.patch("analytics.rollups.invalidate_dates", side_effect=ConnectionError)
+        with down as invalidate, self.assertLogs("django.db.backends.base", "ERROR"):
+            run = run_load_csv_orders(self.path, engine="bulk")
+        invalidate.assert_called()
+        self.assertEqual(ETLRun.objects.get(pk=run.pk).status, ETLRun.Status.SUCCESS)
+        self.assertEqual(FactOrder.objects.count(), 4)
+
+
+class LoadCsvOrderFilesTestCase(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        write_csv(ROWS[:2], self.tmp.name, "orders_01.csv")
+        write_csv(ROWS[2:], self.tmp.name, "orders_02.csv")
+        write_csv(ROWS, self.tmp.name, "ignored.txt")
+
+    def test_directory_files_are_loaded_once_in_parallel(self):
+        parent = run_load_csv_order_files(self.tmp.name, workers=2, engine="bulk")
+        self.assertEqual(parent.status, ETLRun.Status.SUCCESS)
+        self.assertEqual(parent.children.count(), 2)
+        self.assertEqual((parent.rows_extracted, parent.rows_loaded), (6, 4))
+        self.assertEqual(
+            ETLFileManifest.objects.filter(status=ETLFileManifest.Status.LOADED).count(), 2
+        )
+
+        parent = run_load_csv_order_files(os.path.join(self.tmp.name, "orders_*.csv"))
+        self.assertEqual(parent.children.count(), 0)
+
+        write_csv(ROWS[:3], self.tmp.name, "orders_01.csv")  # new content, new version
+        parent = run_load_csv_order_files(self.tmp.name, workers=2, engine="bulk")
+        self.assertEqual((parent.rows_extracted, parent.rows_loaded), (3, 0))
+        self.assertEqual(FactOrder.objects.count(), 4)
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        run_load_csv_order_files(self.tmp.name, workers=1, engine="bulk")
+        with mock.patch("etl.jobs.manifest.file_sha256", wraps=file_sha256) as sha256:
+            parent = run_load_csv_order_files(self.tmp.name, workers=1, engine="bulk")
+            self.assertEqual(parent.children.count(), 0)
+            self.assertEqual(sha256.call_count, 0)
+
+            path = os.path.join(self.tmp.name, "orders_01.csv")
+            os.utime(path, (os.path.getmtime(path) + 5,) * 2)  # touched, same contents
+            parent = run_load_csv_order_files(self.tmp.name, workers=1, engine="bulk")
+            self.assertEqual(parent.children.count(), 0)
+            self.assertEqual(sha256.call_count, 1)
+
+    def test_loads_left_loading_by_a_dead_worker_are_reclaimed(self):
+        path = os.path.join(self.tmp.name, "orders_01.csv")
+        dead = ETLRun.objects.create(source="csv", job_name="load_csv_order_files")
+        manifest = claim_file(path, dead)
+        self.assertIsNone(claim_file(path))  # its run is still running
+
+        ETLFileManifest.objects.filter(pk=manifest.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=STALE_LOADING_SECONDS + 1)
+        )
+        self.assertEqual(claim_file(path).pk, manifest.pk)
+        self.assertIsNone(claim_file(path))
+
+        ETLRun.objects.filter(pk=dead.pk).update(status=ETLRun.Status.FAILED)
+        ETLFileManifest.objects.filter(pk=manifest.pk).update(run=dead)
+        parent = run_load_csv_order_files(path, workers=1, engine="bulk")
+        self.assertEqual(parent.children.count(), 1)
+        self.assertEqual(ETLFileManifest.objects.get(pk=manifest.pk).status, "loaded")
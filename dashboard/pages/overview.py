@@ -176,13 +176,15 @@ def register_callbacks(app):
             if end_date:
                 params["date_to"] = end_date
 
-            # KPIs (if this fails, we catch it below)
-            kpis = api_get("/kpis/", params=params)
+            # KPIs, revenue trends and top products in one request (if this fails, we catch it below)
+            overview = api_get(
+                "/overview/",
+                params={**params, "granularity": granularity, "metric": "revenue", "limit": 10},
+            )
+            kpis = overview["kpis"]
 
             # Revenue trends
-            trend_params = dict(params)
-            trend_params["granularity"] = granularity
-            trends = api_get("/revenue/trends/", params=trend_params)
+            trends = overview["revenue_trends"]
             df_trend = pd.DataFrame(trends.get("points", []))
 
             if not df_trend.empty:
@@ -201,7 +203,7 @@ def register_callbacks(app):
             )
 
             # Top products
-            top = api_get("/products/top-sellers/", params={**params, "metric": "revenue", "limit": 10})
+            top = overview["top_products"]
             df_top = pd.DataFrame(top.get("items", []))
 
             fig_top = go.Figure()
@@ -220,7 +222,11 @@ def register_callbacks(app):
             orders_error = ""
 
             try:
-                orders = api_get("/orders/", params={**params, "page_size": 15}, token=jwt_token)
+                orders = api_get(
+                    "/orders/",
+                    params={**params, "page_size": 15, "include_count": "false"},
+                    token=jwt_token,
+                )
                 df_orders = pd.DataFrame(orders.get("results", []))
 
                 if not df_orders.empty: